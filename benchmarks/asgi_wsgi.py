@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Сравнение производительности одного процесса под WSGI и ASGI.
+
+Запускает gunicorn с одним процессом сначала с синхронным воркером
+(stackoverflow.wsgi), затем с воркером uvicorn (stackoverflow.asgi),
+и выполняет одинаковую нагрузку: `--requests` GET-запросов к каждому
+из адресов `--path` в `--concurrency` соединений. Выводит количество
+запросов в секунду и 95-й процентиль времени ответа.
+
+Переменные окружения (DATABASE_URL, SECRET_KEY, ...) передаются
+серверу как есть, база должна быть заполнена заранее (например,
+командой import_stackexchange).
+
+Example:
+    $ python benchmarks/asgi_wsgi.py --path /hasker/ \\
+          --path '/hasker/search/?q=python' --concurrency 20
+"""
+
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+
+MODES = {
+    'wsgi': ['stackoverflow.wsgi'],
+    'asgi': ['stackoverflow.asgi', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Server did not start')
+
+
+def run_load(port, paths, requests, concurrency):
+    """Возвращает (запросов в секунду, p95 в секундах, ошибок)."""
+
+    counter = iter(range(requests * len(paths)))
+    lock = threading.Lock()
+    durations = []
+    errors = []
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', paths[number % len(paths)])
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                ok = False
+            with lock:
+                durations.append(time.perf_counter() - start)
+                if not ok:
+                    errors.append(number)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    p95 = statistics.quantiles(durations, n=20)[-1]
+    return len(durations) / elapsed, p95, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--path', action='append',
+                        help='Requested path (repeatable).')
+    parser.add_argument('--requests', type=int, default=500,
+                        help='Requests per path.')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8311)
+    parser.add_argument('--mode', action='append', choices=MODES)
+    args = parser.parse_args()
+    paths = args.path or ['/hasker/']
+
+    for mode in args.mode or list(MODES):
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *MODES[mode],
+             '--workers', '1', '--bind', f'127.0.0.1:{args.port}',
+             '--log-level', 'warning'],
+            env=os.environ.copy()
+        )
+        try:
+            wait_ready(args.port)
+            # Прогрев: соединения с базой, кэши, шаблоны.
+            run_load(args.port, paths, 10, 2)
+            rps, p95, errors = run_load(
+                args.port, paths, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f'{mode}: {rps:.1f} req/s, p95 {p95 * 1000:.1f} ms, '
+              f'{errors} error(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Настройки gunicorn.
+
+gunicorn читает этот файл из текущего каталога при запуске.
+
+Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR, метрики
+рабочих процессов пишутся в файлы этого каталога (см. hasker.metrics).
+Каталог очищается при чтении этого файла, до загрузки приложения
+(с --preload приложение уже при импорте создает файлы метрик), а
+файлы завершившихся процессов помечаются, чтобы их значения не
+учитывались дважды.
+
+Перед запуском рабочих процессов приложение прогревается (см.
+hasker.warmup): с --preload - один раз в главном процессе до fork,
+без него - в каждом рабочем процессе. В журнал выводится отчет
+о времени этапов прогрева и общем времени запуска.
+"""
+
+import os
+import shutil
+import time
+
+
+# Файл настроек читается до загрузки приложения.
+_started = time.monotonic()
+
+# Признак того, что каталог метрик уже подготовлен. gunicorn читает
+# файл настроек заново при SIGHUP, и новый главный процесс при SIGUSR2
+# наследует окружение: в обоих случаях файлы работающих процессов
+# удалять нельзя.
+_METRICS_DIR_READY = 'HASKER_PROMETHEUS_MULTIPROC_DIR_READY'
+
+
+def _prepare_metrics_dir():
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directory or os.environ.get(_METRICS_DIR_READY):
+        return
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+    os.environ[_METRICS_DIR_READY] = '1'
+
+
+_prepare_metrics_dir()
+
+
+def _warm_up(log):
+    from hasker.warmup import format_report, warm_up
+
+    for line in format_report(warm_up()):
+        log.info('Warm-up %s', line)
+    log.info('Started in %.1f ms', (time.monotonic() - _started) * 1000)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
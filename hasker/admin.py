@@ -11,4 +11,5 @@ admin.site.register([
     models.Answer,
     models.QuestionVote,
     models.AnswerVote,
+    models.OutboundEmail,
 ])
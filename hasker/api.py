@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Обработчики запросов JSON API только для чтения.
+
+Списки вопросов и вопрос с ответами выдаются в JSON без построения
+HTML. Запросы к базе те же, что у HTML-страниц (см. модуль views).
+
+Параметры запроса:
+    fields: список полей вопроса через запятую (по умолчанию - все,
+        см. QUESTION_FIELDS). Поля, которые не запрошены, по
+        возможности не читаются из базы.
+    answer_fields: список полей ответа (см. ANSWER_FIELDS)
+    cursor: курсор страницы из полей next и previous ответа
+        (см. модуль pagination)
+    limit: размер страницы (по умолчанию и не больше размера
+        страницы HTML-списка)
+
+Условные запросы (ETag) поддерживаются так же, как для HTML-страниц
+(см. модуль conditional).
+
+Example:
+    GET /api/questions/?sort=hot&fields=id,title,votes_sum
+    {"questions": [{"id": 1, "title": "...", "votes_sum": 3}, ...],
+     "next": "...", "previous": null}
+"""
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from .pagination import KeysetPaginator
+from .views import (
+    ANSWER_KEYSET_ORDERING, HOT_KEYSET_ORDERING, NEW_KEYSET_ORDERING,
+    SEARCH_KEYSET_ORDERING, get_answer_queryset, get_question_list_queryset,
+    get_search_queryset
+)
+
+
+QUESTION_FIELDS = {
+    'id': lambda question: question.id,
+    'title': lambda question: question.title,
+    'text': lambda question: question.text,
+    'author': lambda question: question.author.username,
+    'creation_date': lambda question: question.creation_date,
+    'votes_sum': lambda question: question.votes_sum,
+    'answers_count': lambda question: question.answers_count,
+    'accepted_answer_id': lambda question: question.accepted_answer_id,
+    'tags': lambda question: [tag.text for tag in question.tags.all()],
+}
+
+ANSWER_FIELDS = {
+    'id': lambda answer: answer.id,
+    'text': lambda answer: answer.text,
+    'author': lambda answer: answer.author.username,
+    'creation_date': lambda answer: answer.creation_date,
+    'votes_sum': lambda answer: answer.votes_sum,
+}
+
+
+def _get_fields(request, name, available):
+    """Возвращает список полей из параметра запроса `name`.
+
+    Неизвестное поле приводит к ошибке 400.
+    """
+
+    value = request.GET.get(name)
+    if value is None:
+        return list(available)
+
+    fields = [field for field in value.split(',') if field]
+    if not fields or any(field not in available for field in fields):
+        raise BadRequest
+    return fields
+
+
+def _get_limit(request, page_size):
+    try:
+        limit = int(request.GET.get('limit', page_size))
+    except ValueError:
+        raise BadRequest
+    return max(1, min(limit, page_size))
+
+
+def _restrict(queryset, fields):
+    """Убирает из запроса `queryset` чтение данных для незапрошенных
+       полей `fields`.
+    """
+
+    if 'text' not in fields:
+        queryset = queryset.defer('text')
+    queryset = queryset.select_related(None)
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    if 'tags' not in fields:
+        queryset = queryset.prefetch_related(None)
+    return queryset
+
+
+def _serialize(obj, fields, available):
+    return {field: available[field](obj) for field in fields}
+
+
+def _page_data(page):
+    return {'next': page.next_cursor, 'previous': page.previous_cursor}
+
+
+class QuestionListApiView(View):
+    """Обработка запроса на получение списка вопросов.
+
+    Параметры запроса (кроме общих):
+        sort: 'new' (по умолчанию) или 'hot'
+        tag: тег вопросов
+        q: текст поиска; результаты сортируются по релевантности
+    """
+
+    def get(self, request):
+        fields = _get_fields(request, 'fields', QUESTION_FIELDS)
+        limit = _get_limit(request, settings.HASKER_QUESTION_LIST_PAGE)
+
+        tag = request.GET.get('tag', '').strip()
+        text = request.GET.get('q', '').strip()
+        if tag:
+            queryset = get_search_queryset(text, tag)
+            ordering = HOT_KEYSET_ORDERING
+        elif text:
+            queryset = get_search_queryset(text)
+            ordering = SEARCH_KEYSET_ORDERING
+        elif request.GET.get('sort') == 'hot':
+            queryset = get_question_list_queryset()
+            ordering = HOT_KEYSET_ORDERING
+        else:
+            queryset = get_question_list_queryset()
+            ordering = NEW_KEYSET_ORDERING
+
+        page = KeysetPaginator(
+            _restrict(queryset, fields), ordering, limit
+        ).page(request.GET.get('cursor'))
+
+        return JsonResponse({
+            'questions': [
+                _serialize(question, fields, QUESTION_FIELDS)
+                for question in page
+            ],
+            **_page_data(page),
+        })
+
+
+class QuestionApiView(View):
+    """Обработка запроса на получение вопроса со страницей ответов.
+
+    Параметры:
+        question_id: идентификатор вопроса
+    """
+
+    def get(self, request, question_id):
+        fields = _get_fields(request, 'fields', QUESTION_FIELDS)
+        answer_fields = _get_fields(request, 'answer_fields', ANSWER_FIELDS)
+        limit = _get_limit(request, settings.HASKER_ANSWER_LIST_PAGE)
+
+        question = get_object_or_404(
+            _restrict(get_question_list_queryset(), fields),
+            pk=question_id
+        )
+
+        page = KeysetPaginator(
+            _restrict(get_answer_queryset(question_id), answer_fields),
+            ANSWER_KEYSET_ORDERING,
+            limit
+        ).page(request.GET.get('cursor'))
+
+        return JsonResponse({
+            'question': _serialize(question, fields, QUESTION_FIELDS),
+            'answers': [
+                _serialize(answer, answer_fields, ANSWER_FIELDS)
+                for answer in page
+            ],
+            **_page_data(page),
+        })
@@ -7,3 +7,8 @@ from django.apps import AppConfig
 class HaskerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hasker'
+
+    def ready(self):
+        # Подключение перехватчиков, обновляющих поисковый индекс
+        # и версии закэшированных фрагментов вопросов.
+        from . import caching, search  # noqa: F401
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Асинхронные версии обработчиков для работы под ASGI.
+
+Синхронный обработчик под ASGI Django вызывает через sync_to_async,
+и число потоков, а с ними и соединений с базой, ничем не ограничено.
+Асинхронная версия (async_view) выполняет синхронный обработчик -
+запросы к базе и кэшу и построение шаблона - в общем пуле из
+HASKER_ASYNC_THREADS потоков. У каждого потока пула свое соединение
+с базой, поэтому соединений у процесса не больше, чем потоков, а
+медленный запрос занимает поток пула, а не процесс.
+
+Асинхронные версии подключаются в urls вместо синхронных, если
+включена настройка HASKER_ASYNC_VIEWS (ее включает
+stackoverflow/asgi.py). Middleware замеров (HASKER_INSTRUMENTATION,
+HASKER_METRICS) поддерживают только синхронный режим: если они
+включены, Django вызывает асинхронные обработчики через
+async_to_sync. Middleware подключают счетчики SQL-запросов только
+к соединениям своего потока, поэтому поток пула подключает их
+к своим соединениям сам.
+"""
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from stackoverflow.instrumentation import current_stats
+from .metrics import current_query_counter
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Возвращает пул потоков обработчиков.
+
+    Пул создается при первом запросе, а не при импорте: при запуске
+    gunicorn --preload модуль импортируется до fork, а потоки
+    в дочерние процессы не переходят.
+    """
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.HASKER_ASYNC_THREADS,
+                thread_name_prefix='hasker-view'
+            )
+    return _executor
+
+
+def _call_view(view, request, *args, **kwargs):
+    # Django закрывает устаревшие соединения по сигналам начала и
+    # конца запроса, но под ASGI сигналы отправляются в другом потоке.
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            # Замеры текущего запроса переходят в поток пула вместе
+            # с контекстом (contextvars).
+            for wrapper in (current_stats(), current_query_counter()):
+                if wrapper is None:
+                    continue
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+
+            response = view(request, *args, **kwargs)
+            # TemplateResponse строится в том же потоке: шаблоны
+            # обращаются к базе, вычисляя запросы из контекста.
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Возвращает асинхронную версию обработчика `view`, которая
+       выполняет его в пуле потоков.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(
+            _call_view, thread_sensitive=False, executor=get_executor()
+        )(view, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Индекс тегов для подсказок при вводе.
+
+Теги хранятся в памяти процесса в списке, отсортированном по тексту
+тега в нижнем регистре. Теги с заданным префиксом занимают в нем
+непрерывный отрезок, который находится двоичным поиском. Из отрезка
+выбираются самые используемые теги.
+
+Индекс строится при первом обращении. Добавление тегов в текущем
+процессе исправляет индекс на месте и увеличивает номер версии
+в кэше. Индексы других процессов видят новый номер версии и
+перестраиваются при следующем обращении.
+"""
+
+import bisect
+import heapq
+import threading
+
+from django.db.models import Count
+
+from .caching import get_version, incr_version
+from .models import Tag
+
+
+VERSION_KEY = 'hasker:tag-index-version'
+
+
+class TagIndex:
+    """Индекс тегов с подсчетом количества использований."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []     # тексты тегов в нижнем регистре, по возрастанию
+        self._tags = []     # пары [текст тега, количество использований]
+
+    def suggest(self, prefix, limit):
+        """Возвращает не больше `limit` тегов, начинающихся с `prefix`,
+           в порядке убывания количества использований.
+        """
+
+        prefix = prefix.lower()
+        with self._lock:
+            self._ensure_current()
+            lo = bisect.bisect_left(self._keys, prefix)
+            hi = bisect.bisect_left(self._keys, prefix + '\U0010ffff')
+            best = heapq.nsmallest(
+                limit,
+                self._tags[lo:hi],
+                key=lambda tag: (-tag[1], tag[0])
+            )
+        return [text for text, _ in best]
+
+    def add(self, texts):
+        """Учитывает использование тегов `texts` в новом вопросе."""
+
+        with self._lock:
+            self._ensure_current()
+            for text in texts:
+                key = text.lower()
+                i = bisect.bisect_left(self._keys, key)
+                while i < len(self._keys) and self._keys[i] == key:
+                    if self._tags[i][0] == text:
+                        self._tags[i][1] += 1
+                        break
+                    i += 1
+                else:
+                    self._keys.insert(i, key)
+                    self._tags.insert(i, [text, 1])
+
+            version = incr_version(VERSION_KEY)
+            # Если версию никто больше не менял, индекс актуален.
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def _ensure_current(self):
+        version = get_version(VERSION_KEY)
+        if version == self._version:
+            return
+
+        tags = sorted(
+            Tag.objects.annotate(
+                count=Count('question')
+            ).values_list('text', 'count'),
+            key=lambda tag: (tag[0].lower(), tag[0])
+        )
+        self._keys = [text.lower() for text, _ in tags]
+        self._tags = [[text, count] for text, count in tags]
+        self._version = version
+
+
+tag_index = TagIndex()
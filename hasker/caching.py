@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Версионированный кэш фрагментов страницы вопроса.
+
+У каждого вопроса есть номер версии, который хранится в кэше и
+увеличивается при любом изменении, видимом на странице вопроса:
+новом ответе, голосовании, пометке верного ответа. Номер версии
+входит в ключи закэшированных фрагментов, поэтому после изменения
+старые фрагменты просто перестают использоваться и вытесняются
+из кэша по истечении HASKER_QUESTION_CACHE_TIMEOUT.
+
+Сохранение вопросов и ответов (в том числе из админки) отслеживается
+перехватчиками в конце модуля. Версия увеличивается после фиксации
+транзакции: иначе параллельный запрос мог бы закэшировать под новой
+версией еще старое содержимое базы. Голосование и пометка верного
+ответа изменяют базу запросами UPDATE без сигналов, поэтому
+обработчики этих запросов вызывают bump_question_version сами.
+Фрагменты выводят аватарки авторов, поэтому при изменении аватарки
+(сигнал users.models.avatar_changed) устаревают все вопросы, которые
+пользователь задал или на которые ответил.
+
+Строки вопросов в списках (главная страница, поиск) кэшируются
+по отдельности с версией вопроса в ключе и собираются в страницу
+из кэша одним обращением (см. cached_html_many).
+
+Кроме версий вопросов, в кэше хранится общий счетчик изменений и
+время последнего изменения. По ним строятся валидаторы условных
+GET-запросов для списков вопросов (см. модуль conditional).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.safestring import mark_safe
+
+from users.models import avatar_changed
+
+from .metrics import count_cache_lookup
+from .models import Answer, Question
+from .replicas import reading_from_replica
+
+
+QUESTION_VERSION_KEY = 'hasker:question-version:{}'
+CHANGES_KEY = 'hasker:changes'
+LAST_CHANGE_KEY = 'hasker:last-change'
+FRAGMENT_KEY = 'hasker:fragment:{}'
+
+
+def get_version(key):
+    """Возвращает номер версии, хранящийся в кэше под ключом `key`."""
+
+    version = cache.get(key)
+    if version is None:
+        # Ключа нет в кэше (он мог быть вытеснен). Начальное значение
+        # берется от времени, чтобы оно не совпало с прежними версиями.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def incr_version(key):
+    """Увеличивает номер версии под ключом `key` и возвращает его."""
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(key)
+
+
+def get_question_version(question_id):
+    """Возвращает номер версии вопроса `question_id`."""
+
+    return get_version(QUESTION_VERSION_KEY.format(question_id))
+
+
+def get_question_versions(question_ids):
+    """Возвращает словарь {идентификатор вопроса: номер версии} для
+       вопросов `question_ids` одним обращением к кэшу.
+    """
+
+    keys = {
+        QUESTION_VERSION_KEY.format(question_id): question_id
+        for question_id in question_ids
+    }
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for question_id in question_ids:
+        if question_id not in versions:
+            versions[question_id] = get_question_version(question_id)
+    return versions
+
+
+def bump_question_version(question_id):
+    """Помечает закэшированные фрагменты вопроса `question_id`
+       устаревшими.
+    """
+
+    incr_version(QUESTION_VERSION_KEY.format(question_id))
+    bump_changes()
+
+
+def bump_changes():
+    """Увеличивает общий счетчик изменений.
+
+    Вызывается сама при изменении вопроса, а отдельно - после
+    загрузки данных в обход моделей (например, bulk_create).
+    """
+
+    incr_version(CHANGES_KEY)
+    cache.set(LAST_CHANGE_KEY, time.time(), None)
+
+
+def get_changes():
+    """Возвращает пару (счетчик изменений, время последнего изменения).
+
+    Время - метка времени UNIX. Если оно неизвестно (ключ вытеснен
+    из кэша), последним изменением считается текущий момент.
+    """
+
+    last_change = cache.get(LAST_CHANGE_KEY)
+    if last_change is None:
+        cache.add(LAST_CHANGE_KEY, time.time(), None)
+        last_change = cache.get(LAST_CHANGE_KEY)
+    return get_version(CHANGES_KEY), last_change
+
+
+def get_fragment(name, *vary_on):
+    """Возвращает закэшированный фрагмент `name` или None.
+
+    Ключ фрагмента составляется из `name` и значений `vary_on`.
+    """
+
+    value = cache.get(_fragment_key(name, vary_on))
+    count_cache_lookup('fragment', value)
+    return value
+
+
+def set_fragment(value, name, *vary_on):
+    """Сохраняет в кэше фрагмент `name` со значением `value`.
+
+    Фрагмент, построенный по данным реплики базы, хранится не дольше
+    времени, за которое реплика догоняет основную базу (см. модуль
+    replicas).
+    """
+
+    cache.set(_fragment_key(name, vary_on), value, _fragment_timeout())
+
+
+def cached_html(render, name, *vary_on):
+    """Возвращает HTML фрагмента `name` из кэша, а если его там нет,
+       строит функцией `render` и кэширует.
+    """
+
+    html = get_fragment(name, *vary_on)
+    if html is None:
+        html = render()
+        set_fragment(html, name, *vary_on)
+    return mark_safe(html)
+
+
+def cached_html_many(render, name, vary_on_list):
+    """Возвращает список HTML фрагментов `name` для каждого набора
+       значений из `vary_on_list`.
+
+    Фрагменты читаются из кэша одним обращением. Отсутствующие
+    строятся одним вызовом функции `render`, которая получает список
+    их наборов значений и возвращает список HTML в том же порядке,
+    и кэшируются тоже одним обращением.
+    """
+
+    keys = [_fragment_key(name, vary_on) for vary_on in vary_on_list]
+    found = cache.get_many(keys)
+
+    missing = []
+    for key, vary_on in zip(keys, vary_on_list):
+        count_cache_lookup('fragment', found.get(key))
+        if key not in found:
+            missing.append((key, vary_on))
+
+    if missing:
+        rendered = dict(zip(
+            [key for key, _ in missing],
+            render([vary_on for _, vary_on in missing])
+        ))
+        cache.set_many(rendered, _fragment_timeout())
+        found.update(rendered)
+
+    return [mark_safe(found[key]) for key in keys]
+
+
+def _fragment_timeout():
+    timeout = settings.HASKER_QUESTION_CACHE_TIMEOUT
+    if reading_from_replica():
+        timeout = min(timeout, settings.HASKER_REPLICA_STICKY_SECONDS)
+    return timeout
+
+
+def _fragment_key(name, vary_on):
+    return FRAGMENT_KEY.format(
+        ':'.join([name] + [str(value) for value in vary_on])
+    )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed_signal(sender, instance, **kwargs):
+    """Перехватчик изменения вопроса: фрагменты вопроса устаревают."""
+
+    question_id = instance.id
+    transaction.on_commit(lambda: bump_question_version(question_id))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_changed_signal(sender, instance, **kwargs):
+    """Перехватчик изменения ответа: фрагменты вопроса устаревают."""
+
+    question_id = instance.question_id
+    transaction.on_commit(lambda: bump_question_version(question_id))
+
+
+@receiver(avatar_changed)
+def avatar_changed_signal(sender, user_id, **kwargs):
+    """Перехватчик изменения аватарки: фрагменты вопросов, которые
+       пользователь задал или на которые ответил, устаревают.
+    """
+
+    def bump():
+        question_ids = set(
+            Question.objects.filter(
+                author_id=user_id
+            ).values_list('id', flat=True)
+        ) | set(
+            Answer.objects.filter(
+                author_id=user_id
+            ).values_list('question_id', flat=True)
+        )
+        for question_id in question_ids:
+            incr_version(QUESTION_VERSION_KEY.format(question_id))
+        if question_ids:
+            bump_changes()
+
+    transaction.on_commit(bump)
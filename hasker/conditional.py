@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Условные GET-запросы (ETag и Last-Modified) для страниц вопросов.
+
+Валидаторы вычисляются без построения страницы:
+    страница вопроса: версия вопроса из кэша (см. модуль caching)
+        и контрольная сумма закэшированного списка вопросов
+        "в тренде" из боковой панели, без запросов к базе
+    списки вопросов (главная страница, поиск по тегу): общий
+        счетчик изменений из кэша и максимальная дата создания
+        вопроса, которая берется из индекса question_new_idx
+
+Страница зависит от пользователя (ссылки авторизации, элементы
+пометки верного ответа), поэтому в ETag входит идентификатор
+пользователя. Last-Modified выдается только анонимным
+пользователям: по одной дате нельзя отличить страницу, построенную
+до входа пользователя, от построенной после.
+
+Ответы JSON API (см. модуль api) от пользователя не зависят, и их
+валидаторы - те же значения без идентификатора пользователя.
+
+Example:
+    path('', conditional_page(
+        question_list_etag, question_list_last_modified
+    )(views.QuestionListView.as_view()), name='index')
+"""
+
+import zlib
+from datetime import datetime, timezone
+
+from django.db.models import Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .caching import get_changes, get_question_version
+from .models import Question
+from .trending import get_trending_list
+
+
+def _user_key(request):
+    return request.user.pk or 0
+
+
+def _trending_key():
+    items = get_trending_list()
+    return zlib.crc32(repr([
+        (item['id'], item['title'], item['votes_sum']) for item in items
+    ]).encode())
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _list_state(request):
+    """Возвращает (счетчик изменений, время последнего изменения,
+       максимальная дата создания вопроса).
+
+    Результат запоминается в запросе: его используют и ETag,
+    и Last-Modified.
+    """
+
+    if not hasattr(request, '_hasker_list_state'):
+        changes, last_change = get_changes()
+        newest = Question.objects.aggregate(
+            newest=Max('creation_date')
+        )['newest']
+        request._hasker_list_state = (changes, last_change, newest)
+    return request._hasker_list_state
+
+
+def question_list_etag(request, *args, **kwargs):
+    """ETag главной страницы и страниц поиска по тегу."""
+
+    changes, _, newest = _list_state(request)
+    newest = newest.timestamp() if newest else 0
+    return f'l{changes}-{newest}-{_user_key(request)}'
+
+
+def question_list_last_modified(request, *args, **kwargs):
+    """Last-Modified главной страницы и страниц поиска по тегу."""
+
+    if request.user.is_authenticated:
+        return None
+
+    _, last_change, newest = _list_state(request)
+    if newest is None:
+        return _timestamp(last_change)
+    return max(newest, _timestamp(last_change))
+
+
+def question_etag(request, question_id, **kwargs):
+    """ETag страницы вопроса."""
+
+    version = get_question_version(question_id)
+    return f'q{question_id}-{version}-{_trending_key()}-{_user_key(request)}'
+
+
+def question_last_modified(request, question_id, **kwargs):
+    """Last-Modified страницы вопроса.
+
+    Используется время последнего изменения любого вопроса: оно не
+    меньше времени изменения этого вопроса.
+    """
+
+    if request.user.is_authenticated:
+        return None
+
+    _, last_change = get_changes()
+    return _timestamp(last_change)
+
+
+def api_question_list_etag(request, *args, **kwargs):
+    """ETag списков вопросов JSON API (не зависит от пользователя)."""
+
+    changes, _, newest = _list_state(request)
+    newest = newest.timestamp() if newest else 0
+    return f'al{changes}-{newest}'
+
+
+def api_question_etag(request, question_id, **kwargs):
+    """ETag вопроса JSON API (не зависит от пользователя)."""
+
+    return f'aq{question_id}-{get_question_version(question_id)}'
+
+
+def conditional_page(etag_func, last_modified_func):
+    """Декоратор view-функции: ответ 304 на условные запросы и
+       требование перепроверять страницу в кэше браузера.
+    """
+
+    def decorator(view):
+        return cache_control(no_cache=True)(
+            condition(etag_func, last_modified_func)(view)
+        )
+    return decorator
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""Оповещения об изменениях вопроса (server-sent events).
+
+Обработчики, изменяющие вопрос, публикуют события (publish) в брокер
+процесса. Страница вопроса открывает EventSource по адресу
+question-events, и ASGI-приложение EventStreamApp пересылает ей
+события этого вопроса:
+
+    vote: {"target": "question" или "answer", "id": 1, "votes": 3}
+    answer: {"id": 7}
+    solution: {"accepted_answer_id": 7 или null}
+
+Ожидающее соединение - корутина и очередь в памяти, поэтому тысячи
+соединений не занимают ни потоков, ни воркеров. Ни middleware, ни
+сессия, ни база для соединения не используются: события вопроса
+не зависят от пользователя, а существование вопроса не проверяется.
+
+Соединения обслуживаются только под ASGI (см. stackoverflow/asgi.py).
+Под WSGI тот же адрес отвечает 204, и браузер не переподключается.
+
+Брокер работает в пределах процесса: подписчик получает события от
+обработчиков того же процесса. Поэтому события доходят до всех
+страниц, только если сайт обслуживается одним ASGI-процессом.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+
+_KEEPALIVE = b': keepalive\n\n'
+
+
+def format_event(event, data):
+    """Возвращает событие `event` с данными `data` в формате
+       text/event-stream.
+    """
+
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+class Subscription:
+    """Подписка корутины на события вопроса `question_id`.
+
+    Создается в цикле событий подписчика. Если подписчик не успевает
+    забирать события и очередь переполнилась, устанавливается признак
+    overflow: соединение закрывается, и браузер переподключается.
+    """
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        self.overflow = False
+        self.queue = asyncio.Queue(settings.HASKER_EVENTS_QUEUE_SIZE)
+        self._loop = asyncio.get_running_loop()
+
+    def put(self, message):
+        """Добавляет сообщение в очередь. Вызывается из любого потока."""
+
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Цикл событий подписчика уже закрыт.
+            pass
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflow = True
+
+
+class EventBroker:
+    """Брокер событий вопросов в пределах процесса.
+
+    Публиковать события можно из любого потока (синхронные
+    обработчики под ASGI выполняются в отдельном потоке),
+    подписываться - из корутины.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, question_id):
+        subscription = Subscription(question_id)
+        with self._lock:
+            self._subscribers[question_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.question_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.question_id]
+
+    def publish(self, question_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(question_id, ()))
+        if not subscribers:
+            return
+
+        message = format_event(event, data)
+        for subscription in subscribers:
+            subscription.put(message)
+
+
+broker = EventBroker()
+
+
+def publish(question_id, event, data):
+    """Публикует событие вопроса `question_id` после фиксации текущей
+       транзакции (или сразу, если транзакции нет).
+    """
+
+    transaction.on_commit(
+        lambda: broker.publish(question_id, event, data)
+    )
+
+
+def question_events_view(request, question_id):
+    """Обработка запроса на поток событий вопроса под WSGI.
+
+    Поток событий под WSGI занимал бы воркер на все время соединения,
+    поэтому выдается ответ 204: EventSource не переподключается.
+    """
+
+    return HttpResponse(status=204)
+
+
+class EventStreamApp:
+    """ASGI-приложение, обслуживающее потоки событий вопросов.
+
+    GET-запросы на адрес question-events обслуживаются без Django,
+    остальные передаются приложению `app`.
+
+    Example:
+        application = EventStreamApp(get_asgi_application())
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            question_id = self._question_id(scope['path'])
+            if question_id is not None:
+                await self.stream(question_id, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _question_id(path):
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        if match.url_name != 'question-events':
+            return None
+        return match.kwargs['question_id']
+
+    async def stream(self, question_id, receive, send):
+        """Пересылает события вопроса `question_id`, пока клиент
+           не отключится.
+        """
+
+        subscription = broker.subscribe(question_id)
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    # Запрет буферизации ответа в nginx.
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self._send(send, b'retry: %d\n\n' % (
+                settings.HASKER_EVENTS_RETRY * 1000))
+
+            while True:
+                getter = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected},
+                    timeout=settings.HASKER_EVENTS_KEEPALIVE,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                if disconnected in done:
+                    return
+                if subscription.overflow:
+                    break
+                await self._send(
+                    send, getter.result() if getter in done else _KEEPALIVE)
+
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            broker.unsubscribe(subscription)
+            disconnected.cancel()
+
+    @staticmethod
+    async def _send(send, body):
+        await send({
+            'type': 'http.response.body', 'body': body, 'more_body': True
+        })
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
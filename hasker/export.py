@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Выгрузка вопросов с ответами в формате JSON Lines, сжатом gzip.
+
+Каждая строка выгрузки - объект JSON с полями вопроса, его тегами и
+ответами:
+
+    {"id": 1, "title": "...", "text": "...", "author": "user",
+     "creation_date": "...", "votes_sum": 3, "answers_count": 1,
+     "accepted_answer_id": 7, "tags": ["python"],
+     "answers": [{"id": 7, "text": "...", "author": "...",
+                  "creation_date": "...", "votes_sum": 2}]}
+
+Вопросы читаются пачками по возрастанию id (WHERE id > последний id
+предыдущей пачки), теги и ответы - отдельными запросами на пачку.
+Строки сжимаются по мере получения, поэтому в памяти одновременно
+находится только одна пачка.
+
+Выгрузку выполняют команда export_questions и обработчик export_view
+(только для сотрудников). Под ASGI обработчик отдает асинхронный
+потоковый ответ (см. stackoverflow.handlers): содержимое ответа
+перебирается в цикле событий, поэтому каждая пачка читается и
+сжимается через sync_to_async (aiter_gzip_jsonl).
+"""
+
+import json
+import zlib
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from stackoverflow.handlers import AsyncStreamingHttpResponse
+from .models import Answer, Question
+
+
+_QUESTION_FIELDS = (
+    'id', 'title', 'text', 'author__username', 'creation_date',
+    'votes_sum', 'answers_count', 'accepted_answer_id',
+)
+_ANSWER_FIELDS = (
+    'id', 'question_id', 'text', 'author__username', 'creation_date',
+    'votes_sum',
+)
+
+# Размер пачки вопросов при выгрузке через export_view.
+_VIEW_BATCH_SIZE = 500
+
+# Формат gzip (см. описание wbits в документации zlib).
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _rename_author(row):
+    row['author'] = row.pop('author__username')
+    return row
+
+
+def _read_batch(last_id, batch_size):
+    """Возвращает список из не более `batch_size` словарей вопросов
+       с тегами и ответами, следующих за вопросом `last_id`.
+    """
+
+    questions = [
+        _rename_author(row)
+        for row in Question.objects.filter(
+            id__gt=last_id
+        ).order_by(
+            'id'
+        ).values(*_QUESTION_FIELDS)[:batch_size]
+    ]
+    if not questions:
+        return questions
+    ids = [question['id'] for question in questions]
+
+    tags = defaultdict(list)
+    for question_id, text in Question.tags.through.objects.filter(
+        question_id__in=ids
+    ).order_by(
+        'id'
+    ).values_list('question_id', 'tag__text'):
+        tags[question_id].append(text)
+
+    answers = defaultdict(list)
+    for answer in Answer.objects.filter(
+        question_id__in=ids
+    ).order_by(
+        'question_id', '-votes_sum', 'id'
+    ).values(*_ANSWER_FIELDS).iterator(chunk_size=batch_size):
+        answers[answer.pop('question_id')].append(_rename_author(answer))
+
+    for question in questions:
+        question['tags'] = tags[question['id']]
+        question['answers'] = answers[question['id']]
+    return questions
+
+
+def iter_questions(batch_size):
+    """Перебирает словари вопросов с тегами и ответами в порядке id.
+
+    Вопросы читаются пачками по `batch_size`.
+    """
+
+    last_id = 0
+    while True:
+        questions = _read_batch(last_id, batch_size)
+        if not questions:
+            return
+        last_id = questions[-1]['id']
+        yield from questions
+
+
+def _jsonl_line(question):
+    line = json.dumps(question, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return (line + '\n').encode('utf-8')
+
+
+def iter_jsonl(batch_size):
+    """Перебирает строки выгрузки (bytes) в формате JSON Lines."""
+
+    for question in iter_questions(batch_size):
+        yield _jsonl_line(question)
+
+
+def gzip_chunks(chunks):
+    """Сжимает поток `chunks` (bytes) в формат gzip по мере получения."""
+
+    compressor = zlib.compressobj(wbits=_GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _compress_batch(compressor, last_id, batch_size):
+    """Читает пачку вопросов после `last_id` и сжимает ее строки.
+
+    Возвращает (id последнего вопроса или None, если вопросов больше
+    нет, сжатые данные).
+    """
+
+    questions = _read_batch(last_id, batch_size)
+    if not questions:
+        return None, b''
+    data = b''.join(
+        compressor.compress(_jsonl_line(question)) for question in questions
+    )
+    return questions[-1]['id'], data
+
+
+async def aiter_gzip_jsonl(batch_size):
+    """Асинхронная версия gzip_chunks(iter_jsonl(batch_size)).
+
+    Пачки читаются и сжимаются в потоке через sync_to_async, цикл
+    событий только отдает готовые данные.
+    """
+
+    compressor = zlib.compressobj(wbits=_GZIP_WBITS)
+    last_id = 0
+    while True:
+        last_id, data = await sync_to_async(_compress_batch)(
+            compressor, last_id, batch_size)
+        if last_id is None:
+            break
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_filename():
+    return f'hasker-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz'
+
+
+@staff_member_required
+def export_view(request):
+    """Отдача выгрузки всех вопросов файлом .jsonl.gz."""
+
+    if isinstance(request, ASGIRequest):
+        response = AsyncStreamingHttpResponse(
+            aiter_gzip_jsonl(_VIEW_BATCH_SIZE),
+            content_type='application/gzip'
+        )
+    else:
+        response = StreamingHttpResponse(
+            gzip_chunks(iter_jsonl(_VIEW_BATCH_SIZE)),
+            content_type='application/gzip'
+        )
+    response['Content-Disposition'] = \
+        f'attachment; filename="{export_filename()}"'
+    return response
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Очередь исходящих писем.
+
+Обработчики запросов не обращаются к SMTP-серверу: письмо
+сохраняется в модели OutboundEmail в той же транзакции, что и
+данные запроса. Команда send_queued_mail отправляет письма пачками
+через одно соединение с почтовым сервером. Неудачная отправка
+повторяется с экспоненциально растущей паузой, но не больше
+HASKER_MAIL_MAX_ATTEMPTS раз.
+
+Пачка писем захватывается короткой транзакцией: время следующей
+попытки писем сдвигается на HASKER_MAIL_LEASE секунд, и другие
+обработчики очереди их не берут. Письма отправляются вне транзакции,
+поэтому медленный почтовый сервер не держит блокировки строк, а
+результат каждой отправки записывается отдельным запросом UPDATE.
+Если обработчик завершится, не дописав результаты, письма будут
+отправлены повторно по истечении захвата.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboundEmail
+
+
+def queue_mail(subject, html_message, recipient_list, from_email=None):
+    """Ставит письмо в очередь на отправку.
+
+    Текстовая версия письма получается из `html_message`
+    удалением тегов.
+    """
+
+    return OutboundEmail.objects.create(
+        subject=subject,
+        message=strip_tags(html_message),
+        html_message=html_message,
+        from_email=from_email or settings.HASKER_SEND_MAIL_FROM,
+        recipients=','.join(recipient_list),
+    )
+
+
+def send_queued_mail(batch_size):
+    """Отправляет не больше `batch_size` писем, время отправки которых
+       наступило. Возвращает пару (отправлено, не отправлено).
+    """
+
+    now = timezone.now()
+    emails = _claim(batch_size, now)
+    if not emails:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _postpone(email, now, error)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.message,
+                from_email=email.from_email,
+                to=email.recipients.split(','),
+                connection=connection,
+            )
+            if email.html_message:
+                message.attach_alternative(email.html_message, 'text/html')
+
+            try:
+                message.send()
+            except Exception as error:
+                _postpone(email, now, error)
+                failed += 1
+            else:
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    sent_date=timezone.now())
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def _claim(batch_size, now):
+    """Захватывает не больше `batch_size` писем, время отправки
+       которых наступило, на HASKER_MAIL_LEASE секунд.
+    """
+
+    with transaction.atomic():
+        # Несколько обработчиков очереди не возьмут одни и те же письма.
+        emails = list(
+            OutboundEmail.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                sent_date__isnull=True,
+                next_attempt__lte=now,
+                attempts__lt=settings.HASKER_MAIL_MAX_ATTEMPTS,
+            ).order_by('next_attempt')[:batch_size]
+        )
+        OutboundEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(
+            next_attempt=now + timedelta(seconds=settings.HASKER_MAIL_LEASE)
+        )
+    return emails
+
+
+def _postpone(email, now, error):
+    attempts = email.attempts + 1
+    OutboundEmail.objects.filter(pk=email.pk).update(
+        attempts=attempts,
+        last_error=str(error),
+        next_attempt=now + timedelta(
+            seconds=settings.HASKER_MAIL_RETRY_DELAY * 2 ** (attempts - 1)),
+    )
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Команда выгрузки вопросов с ответами в файл .jsonl.gz."""
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from hasker.export import export_filename, gzip_chunks, iter_jsonl
+
+
+class Command(BaseCommand):
+    help = ('Exports all questions with their tags, answers and vote '
+            'totals as gzip-compressed JSON Lines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?',
+            help='Output file name, "-" for stdout. '
+                 'Defaults to hasker-<timestamp>.jsonl.gz.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of questions fetched per query.')
+
+    def handle(self, *args, **options):
+        output = options['output'] or export_filename()
+        chunks = gzip_chunks(iter_jsonl(options['batch_size']))
+
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        size = 0
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        self.stdout.write(f'Exported {size} byte(s) to {output}.')
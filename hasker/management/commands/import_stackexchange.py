@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Команда загрузки дампа Stack Exchange."""
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from hasker import autocomplete, caching, trending
+from hasker.stackexchange import StackExchangeImporter
+
+
+class Command(BaseCommand):
+    help = ('Imports a Stack Exchange data dump (Users.xml, Tags.xml, '
+            'Posts.xml, Votes.xml) and rebuilds counters and the search '
+            'index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dump_dir',
+            help='Directory with the unpacked XML files of one site.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per bulk insert.')
+
+    def handle(self, *args, **options):
+        importer = StackExchangeImporter(
+            options['dump_dir'], options['batch_size'])
+        if not importer.has_file('Posts.xml'):
+            raise CommandError(
+                f"Posts.xml not found in {options['dump_dir']}.")
+
+        stats = importer.run()
+        self.stdout.write(
+            f"Imported {stats['users']} user(s), {stats['tags']} tag(s), "
+            f"{stats['questions']} question(s), {stats['answers']} "
+            f"answer(s) and {stats['votes']} vote(s)."
+        )
+
+        call_command('update_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+
+        # Данные загружены в обход сигналов моделей.
+        cache.delete(trending.CACHE_KEY)
+        caching.incr_version(autocomplete.VERSION_KEY)
+        caching.bump_changes()
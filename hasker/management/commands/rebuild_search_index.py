@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Команда перестроения поискового индекса."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hasker.models import Question
+from hasker.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the full-text search index of all questions. '
+            'Needed after loading data that bypassed model save().')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of questions fetched per query.')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = 0
+
+        questions = Question.objects.only(
+            'id', 'title', 'text'
+        ).order_by('id').iterator(chunk_size=options['chunk_size'])
+
+        for question in questions:
+            with transaction.atomic():
+                backend.index_question(question)
+            count += 1
+
+        self.stdout.write(f'Indexed {count} question(s).')
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Команда отправки писем из очереди."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from hasker.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Sends e-mails queued in OutboundEmail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of e-mails sent over one SMTP connection.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep draining the queue instead of exiting when empty.')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to sleep when the queue is empty (with --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_mail(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed} e-mail(s).')
+
+            if sent + failed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Команда пересчета денормализованных счетчиков голосов и ответов."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (
+    Count, F, IntegerField, OuterRef, Q, Subquery, Sum
+)
+from django.db.models.functions import Coalesce
+
+from hasker.models import Answer, AnswerVote, Question, QuestionVote
+
+
+def _subquery_total(queryset, field, aggregate):
+    """Возвращает подзапрос, агрегирующий `queryset` по полю `field`
+       для каждой строки внешнего запроса.
+    """
+
+    return Coalesce(
+        Subquery(
+            queryset.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(
+                field
+            ).annotate(
+                total=aggregate
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _reconcile(queryset, **counters):
+    """Исправляет счетчики `counters` у строк `queryset`, в которых
+       они расходятся с подсчитанными значениями. Возвращает
+       количество исправленных строк.
+    """
+
+    actual = {f'actual_{name}': expr for name, expr in counters.items()}
+    queryset = queryset.annotate(**actual)
+
+    stale = None
+    for name in counters:
+        query = ~Q(**{name: F(f'actual_{name}')})
+        stale = query if stale is None else stale | query
+
+    return queryset.model.objects.filter(
+        pk__in=queryset.filter(stale).values('pk')
+    ).update(**counters)
+
+
+class Command(BaseCommand):
+    help = ('Backfills and reconciles Question.votes_sum, '
+            'Question.answers_count and Answer.votes_sum.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            questions = _reconcile(
+                Question.objects.all(),
+                votes_sum=_subquery_total(
+                    QuestionVote.objects, 'question', Sum('vote')),
+                answers_count=_subquery_total(
+                    Answer.objects, 'question', Count('id')),
+            )
+            answers = _reconcile(
+                Answer.objects.all(),
+                votes_sum=_subquery_total(
+                    AnswerVote.objects, 'answer', Sum('vote')),
+            )
+
+        self.stdout.write(
+            f'Fixed counters of {questions} question(s) '
+            f'and {answers} answer(s).'
+        )
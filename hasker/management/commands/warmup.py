@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""Команда прогрева процесса с отчетом о времени этапов.
+
+Выполняет те же этапы, что и прогрев главного процесса gunicorn
+(см. hasker.warmup), и выводит время каждого этапа.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hasker.warmup import format_report, warm_up
+
+
+class Command(BaseCommand):
+    help = ('Warms up URL resolvers, translations, templates and '
+            'in-process caches and reports the time of each stage.')
+
+    def handle(self, *args, **options):
+        for line in format_report(warm_up()):
+            self.stdout.write(line)
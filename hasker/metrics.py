@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Метрики приложения в формате Prometheus.
+
+Собираются:
+    hasker_request_duration_seconds: гистограмма времени обработки
+        запросов по имени URL-а (index, question, search, ...)
+    hasker_db_queries_total: количество SQL-запросов по имени URL-а
+    hasker_votes_total: отданные голоса (за вопросы и ответы)
+    hasker_answers_total: созданные ответы
+    hasker_cache_requests_total: обращения к кэшу фрагментов и списка
+        "в тренде" с результатом hit/miss (доля попаданий считается
+        в Prometheus)
+
+Метрики отдаются по адресу /metrics (metrics_view). Под gunicorn
+с несколькими процессами метрики каждого процесса пишутся в файлы
+каталога из переменной окружения PROMETHEUS_MULTIPROC_DIR и
+суммируются при отдаче (см. gunicorn.conf.py).
+
+Замер запросов и отдача метрик включаются настройкой HASKER_METRICS.
+Если она выключена, MetricsMiddleware не подключается, а /metrics
+отвечает 404. Счетчики событий (голоса, ответы, кэш) увеличиваются
+всегда: это дешево.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY,
+    generate_latest, multiprocess
+)
+
+
+REQUEST_DURATION = Histogram(
+    'hasker_request_duration_seconds',
+    'Request processing time by URL name.',
+    ['url_name', 'method'])
+DB_QUERIES = Counter(
+    'hasker_db_queries_total',
+    'SQL queries executed by URL name.',
+    ['url_name'])
+VOTES = Counter(
+    'hasker_votes_total',
+    'Votes cast.',
+    ['target', 'direction'])
+ANSWERS = Counter(
+    'hasker_answers_total',
+    'Answers created.')
+CACHE_REQUESTS = Counter(
+    'hasker_cache_requests_total',
+    'Cache lookups by cache and result.',
+    ['cache', 'result'])
+
+
+def count_cache_lookup(cache_name, value):
+    """Учитывает обращение к кэшу `cache_name`, вернувшее `value`
+       (None - промах).
+    """
+
+    CACHE_REQUESTS.labels(
+        cache_name, 'miss' if value is None else 'hit'
+    ).inc()
+
+
+_current_counter = contextvars.ContextVar(
+    'metrics_query_counter', default=None)
+
+
+def current_query_counter():
+    """Возвращает счетчик SQL-запросов текущего запроса или None, если
+       замер не идет.
+
+    Обработчики, которые выполняются в других потоках (см.
+    hasker.async_views), подключают его к соединениям своего потока.
+    """
+
+    return _current_counter.get()
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Middleware, замеряющий время обработки и количество SQL-запросов."""
+
+    def __init__(self, get_response):
+        if not settings.HASKER_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        token = _current_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = self.get_response(request)
+        finally:
+            _current_counter.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = match.url_name if match and match.url_name \
+            else 'unmatched'
+        REQUEST_DURATION.labels(url_name, request.method).observe(duration)
+        DB_QUERIES.labels(url_name).inc(counter.queries)
+
+        return response
+
+
+def metrics_view(request):
+    """Отдача метрик в текстовом формате Prometheus."""
+
+    if not settings.HASKER_METRICS:
+        raise Http404
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
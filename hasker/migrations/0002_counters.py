@@ -0,0 +1,58 @@
+# Generated by Django 3.2.2 on 2026-10-17 21:48
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _total(queryset, field, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=aggregate).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Question = apps.get_model('hasker', 'Question')
+    Answer = apps.get_model('hasker', 'Answer')
+    QuestionVote = apps.get_model('hasker', 'QuestionVote')
+    AnswerVote = apps.get_model('hasker', 'AnswerVote')
+
+    Question.objects.update(
+        votes_sum=_total(QuestionVote.objects, 'question', Sum('vote')),
+        answers_count=_total(Answer.objects, 'question', Count('id')),
+    )
+    Answer.objects.update(
+        votes_sum=_total(AnswerVote.objects, 'answer', Sum('vote')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='votes_sum',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='answers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='votes_sum',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
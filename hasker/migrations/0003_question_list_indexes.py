@@ -0,0 +1,26 @@
+# Generated by Django 3.2.2 on 2026-10-17 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='votes_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-creation_date', '-id'], name='question_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-votes_sum', '-creation_date', '-id'], name='question_hot_idx'),
+        ),
+    ]
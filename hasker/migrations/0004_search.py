@@ -0,0 +1,46 @@
+# Generated by Django 3.2.2 on 2026-10-17 21:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_search_vector(apps, schema_editor):
+    # Колонка tsvector и GIN-индекс нужны только на PostgreSQL,
+    # на остальных базах используется модель SearchTerm.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE hasker_question ADD COLUMN search_vector tsvector')
+    schema_editor.execute(
+        'CREATE INDEX question_search_idx ON hasker_question '
+        'USING gin (search_vector)')
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE hasker_question DROP COLUMN search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0003_question_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hasker.question')),
+            ],
+            options={
+                'unique_together': {('term', 'question')},
+            },
+        ),
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
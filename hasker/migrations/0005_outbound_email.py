@@ -0,0 +1,34 @@
+# Generated by Django 3.2.2 on 2026-10-17 21:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0004_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('html_message', models.TextField(blank=True)),
+                ('from_email', models.CharField(max_length=254)),
+                ('recipients', models.TextField()),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.SmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['sent_date', 'next_attempt'], name='outboundemail_queue_idx'),
+        ),
+    ]
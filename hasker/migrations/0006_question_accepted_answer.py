@@ -0,0 +1,45 @@
+# Generated by Django 3.2.2 on 2026-10-17 22:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_accepted_answer(apps, schema_editor):
+    Question = apps.get_model('hasker', 'Question')
+    Answer = apps.get_model('hasker', 'Answer')
+
+    Question.objects.update(
+        accepted_answer=Subquery(
+            Answer.objects.filter(
+                question=OuterRef('pk'), correct=True
+            ).order_by('id').values('id')[:1]
+        )
+    )
+
+
+def fill_correct(apps, schema_editor):
+    Question = apps.get_model('hasker', 'Question')
+    Answer = apps.get_model('hasker', 'Answer')
+
+    Answer.objects.filter(
+        id__in=Question.objects.filter(
+            accepted_answer__isnull=False
+        ).values('accepted_answer')
+    ).update(correct=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0005_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='accepted_answer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hasker.answer'),
+        ),
+        migrations.RunPython(fill_accepted_answer, fill_correct),
+    ]
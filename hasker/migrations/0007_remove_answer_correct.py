@@ -0,0 +1,17 @@
+# Generated by Django 3.2.2 on 2026-10-17 22:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0006_question_accepted_answer'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='answer',
+            name='correct',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.2 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hasker', '0007_remove_answer_correct'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='votes_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-votes_sum', 'id'], name='answer_order_idx'),
+        ),
+    ]
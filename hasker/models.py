@@ -3,7 +3,7 @@
 
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.utils import timezone
 
 
@@ -30,6 +30,13 @@ class Question(models.Model):
         author: автор вопроса
         tags: список тегов вопроса (от 0 до 3)
         voters: пользователи, проголосовавшие за вопрос (за и против)
+        votes_sum: сумма голосов за вопрос
+        answers_count: количество ответов на вопрос
+        accepted_answer: ответ, отмеченный автором вопроса как верный
+
+    Поля votes_sum и answers_count денормализованы: они обновляются
+    вместе с голосами и ответами, а команда update_counters
+    пересчитывает их по таблицам голосов и ответов.
     """
 
     title = models.CharField(max_length=128)
@@ -41,6 +48,23 @@ class Question(models.Model):
     voters = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         through='QuestionVote', related_name='questions')
+    votes_sum = models.IntegerField(default=0)
+    answers_count = models.IntegerField(default=0)
+    accepted_answer = models.ForeignKey(
+        'Answer', null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='+')
+
+    class Meta:
+        # Индексы под сортировки "new" и "hot" списка вопросов,
+        # включая постраничный вывод по ключу.
+        indexes = [
+            models.Index(
+                fields=['-creation_date', '-id'],
+                name='question_new_idx'),
+            models.Index(
+                fields=['-votes_sum', '-creation_date', '-id'],
+                name='question_hot_idx'),
+        ]
 
     @property
     def tag_list(self):
@@ -56,26 +80,176 @@ class Answer(models.Model):
     Поля:
         text: текст ответа
         creation_date: дата и время создания вопроса
-        correct: отметка верного ответа
         author: автор ответа
         question: вопрос, на который дан ответ
         voters: пользователи, проголосовавшие за ответ (за и против)
+        votes_sum: сумма голосов за ответ (денормализована, как и
+            в Question)
     """
 
     text = models.TextField(max_length=2048)
     creation_date = models.DateTimeField(default=timezone.now)
-    correct = models.BooleanField(default=False)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     voters = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         through='AnswerVote', related_name='answers')
+    votes_sum = models.IntegerField(default=0)
+
+    class Meta:
+        # Индекс под вывод ответов вопроса по убыванию суммы голосов
+        # (QuestionDetailView): страница ответов читается из него
+        # диапазоном, без сортировки всех ответов вопроса.
+        indexes = [
+            models.Index(
+                fields=['question', '-votes_sum', 'id'],
+                name='answer_order_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
 
+class VoteManager(models.Manager):
+    """Менеджер модели голосов QuestionVote и AnswerVote.
+
+    Параметры:
+        target: имя поля модели голоса, ссылающегося на объект
+            голосования (вопрос или ответ)
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def cast(self, user_id, target_id, delta):
+        """Атомарно добавляет голос `delta` (1 или -1) пользователя
+           `user_id` за объект `target_id`.
+
+        Голос пользователя создается или изменяется, только если
+        останется в границах [-1, 1]. В той же операции на `delta`
+        изменяется сумма голосов объекта votes_sum.
+
+        Возвращает новую сумму голосов объекта или None, если голос
+        вышел бы за границы. Если объекта нет, выбрасывается
+        исключение DoesNotExist модели объекта.
+        """
+
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        qn = connection.ops.quote_name
+
+        field = self.model._meta.get_field(self.target)
+        target_model = field.related_model
+        names = {
+            'vote_table': qn(self.model._meta.db_table),
+            'user': qn(self.model._meta.get_field('user').column),
+            'target': qn(field.column),
+            'vote': qn(self.model._meta.get_field('vote').column),
+            'target_table': qn(target_model._meta.db_table),
+            'pk': qn(target_model._meta.pk.column),
+            'votes_sum': qn(target_model._meta.get_field('votes_sum').column),
+        }
+
+        if connection.vendor == 'postgresql':
+            exists, votes_sum = self._cast_postgresql(
+                connection, names, user_id, target_id, delta)
+        else:
+            with transaction.atomic(using=db):
+                exists, votes_sum = self._cast_sqlite(
+                    connection, names, user_id, target_id, delta)
+
+        if not exists:
+            raise target_model.DoesNotExist
+        return votes_sum
+
+    @staticmethod
+    def _cast_postgresql(connection, names, user_id, target_id, delta):
+        # Один запрос: вставка или изменение голоса с проверкой
+        # границ и изменение суммы голосов, если голос принят.
+        # Голос вставляется через SELECT из таблицы объекта, чтобы
+        # для несуществующего объекта не нарушался внешний ключ.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH target AS (
+                    SELECT {pk} FROM {target_table} WHERE {pk} = %s
+                ), vote AS (
+                    INSERT INTO {vote_table} ({user}, {target}, {vote})
+                    SELECT %s, {pk}, %s FROM target
+                    ON CONFLICT ({user}, {target}) DO UPDATE
+                    SET {vote} = {vote_table}.{vote} + EXCLUDED.{vote}
+                    WHERE {vote_table}.{vote} + EXCLUDED.{vote}
+                        BETWEEN -1 AND 1
+                    RETURNING 1
+                ), counter AS (
+                    UPDATE {target_table}
+                    SET {votes_sum} = {votes_sum} + %s
+                    WHERE {pk} IN (SELECT {pk} FROM target)
+                        AND EXISTS (SELECT 1 FROM vote)
+                    RETURNING {votes_sum}
+                )
+                SELECT EXISTS (SELECT 1 FROM target),
+                       (SELECT {votes_sum} FROM counter)
+                """.format(**names),
+                [target_id, user_id, delta, delta]
+            )
+            return cursor.fetchone()
+
+    @staticmethod
+    def _cast_sqlite(connection, names, user_id, target_id, delta):
+        # SQLite не поддерживает изменение данных в WITH, поэтому
+        # голос и сумма изменяются двумя запросами в одной транзакции.
+        # Для SQLite это не сетевые обращения, а вызовы библиотеки.
+        # RETURNING поддерживается с SQLite 3.35: в более старых
+        # версиях принятие голоса определяется по rowcount, а сумма
+        # читается отдельным запросом.
+        returning = connection.Database.sqlite_version_info >= (3, 35)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO {vote_table} ({user}, {target}, {vote})
+                SELECT %s, {pk}, %s FROM {target_table} WHERE {pk} = %s
+                ON CONFLICT ({user}, {target}) DO UPDATE
+                SET {vote} = {vote} + excluded.{vote}
+                WHERE {vote} + excluded.{vote} BETWEEN -1 AND 1
+                """.format(**names) + (
+                    'RETURNING {vote}'.format(**names) if returning else ''
+                ),
+                [user_id, delta, target_id]
+            )
+            if returning:
+                accepted = cursor.fetchone() is not None
+            else:
+                accepted = cursor.rowcount > 0
+            if not accepted:
+                cursor.execute(
+                    'SELECT 1 FROM {target_table} WHERE {pk} = %s'.format(
+                        **names),
+                    [target_id]
+                )
+                return cursor.fetchone() is not None, None
+
+            cursor.execute(
+                """
+                UPDATE {target_table} SET {votes_sum} = {votes_sum} + %s
+                WHERE {pk} = %s
+                """.format(**names) + (
+                    'RETURNING {votes_sum}'.format(**names)
+                    if returning else ''
+                ),
+                [delta, target_id]
+            )
+            if not returning:
+                cursor.execute(
+                    'SELECT {votes_sum} FROM {target_table} '
+                    'WHERE {pk} = %s'.format(**names),
+                    [target_id]
+                )
+            return True, cursor.fetchone()[0]
+
+
 class QuestionVote(models.Model):
     """Голос за вопрос.
 
@@ -104,6 +278,8 @@ class QuestionVote(models.Model):
             MinValueValidator(-1)
         ])
 
+    objects = VoteManager('question')
+
     class Meta:
         unique_together = ('user', 'question')
 
@@ -136,5 +312,71 @@ class AnswerVote(models.Model):
             MinValueValidator(-1)
         ])
 
+    objects = VoteManager('answer')
+
     class Meta:
         unique_together = ('user', 'answer')
+
+
+class SearchTerm(models.Model):
+    """Элемент инвертированного индекса полнотекстового поиска.
+
+    Поля:
+        term: основа слова
+        question: вопрос, в заголовке, тексте или ответах которого
+            встречается слово
+        weight: сумма весов вхождений слова в вопрос и ответы
+
+    Используется модулем search, если база данных - не PostgreSQL.
+    """
+
+    term = models.CharField(max_length=64)
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE
+    )
+    weight = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('term', 'question')
+
+
+class OutboundEmail(models.Model):
+    """Письмо в очереди на отправку.
+
+    Поля:
+        subject: тема письма
+        message: текст письма
+        html_message: HTML-версия письма
+        from_email: адрес отправителя
+        recipients: адреса получателей, разделенные запятыми
+        creation_date: дата и время постановки в очередь
+        next_attempt: дата и время, раньше которых письмо не отправляется
+        attempts: количество неудачных попыток отправки
+        last_error: текст последней ошибки отправки
+        sent_date: дата и время отправки (пусто, пока не отправлено)
+
+    Письма ставятся в очередь в транзакции запроса, а отправляет их
+    команда send_queued_mail (см. модуль mail).
+    """
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    html_message = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField()
+    creation_date = models.DateTimeField(default=timezone.now)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    attempts = models.SmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['sent_date', 'next_attempt'],
+                name='outboundemail_queue_idx'),
+        ]
+
+    def __str__(self):
+        return self.subject
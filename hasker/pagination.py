@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Постраничный вывод по ключу (keyset/cursor pagination).
+
+В отличие от стандартного Paginator, страница выбирается не через
+OFFSET, а условием "строки после ключа последней строки предыдущей
+страницы". Общее количество строк не подсчитывается. Поэтому любая
+страница стоит столько же, сколько первая, если по полям ключа есть
+индекс.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница, полученная от KeysetPaginator.
+
+    Поля:
+        object_list: объекты страницы
+        next_cursor: курсор следующей страницы или None
+        previous_cursor: курсор предыдущей страницы или None
+        last_cursor: курсор последней страницы
+
+    Курсор первой страницы - пустая строка.
+    """
+
+    is_keyset = True
+    first_cursor = ''
+
+    def __init__(self, object_list, next_cursor, previous_cursor,
+                 last_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Разбивка запроса на страницы по ключу.
+
+    Параметры:
+        queryset: запрос, который разбивается на страницы
+        ordering: поля ключа в формате order_by, например
+            ('-votes_sum', '-creation_date', '-id'). Последнее поле
+            должно быть уникальным.
+        per_page: размер страницы
+
+    Курсор - подписанная строка со значениями ключа граничной строки
+    и направлением перехода. Подделанный или устаревший курсор
+    приводит к ошибке 404.
+    """
+
+    salt = 'hasker.pagination.keyset'
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        self.per_page = per_page
+
+    def page(self, cursor):
+        """Возвращает страницу KeysetPage по курсору `cursor`."""
+
+        key, backward = self._decode(cursor)
+
+        queryset = self.queryset.order_by(*self._order_by(backward))
+        if key is not None:
+            queryset = queryset.filter(self._after(key, backward))
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        last_cursor = signing.dumps({'k': None, 'b': True}, salt=self.salt)
+
+        if not object_list:
+            # Строки после ключа могли быть удалены: остается
+            # только вернуться на первую страницу.
+            return KeysetPage(
+                object_list,
+                next_cursor=None,
+                previous_cursor=KeysetPage.first_cursor
+                if key is not None else None,
+                last_cursor=last_cursor,
+            )
+
+        if backward:
+            object_list.reverse()
+            has_previous, has_next = has_more, key is not None
+        else:
+            has_previous, has_next = key is not None, has_more
+
+        return KeysetPage(
+            object_list,
+            next_cursor=self._encode(object_list[-1], False)
+            if has_next else None,
+            previous_cursor=self._encode(object_list[0], True)
+            if has_previous else None,
+            last_cursor=last_cursor,
+        )
+
+    def cache_key(self, cursor):
+        """Возвращает хэш значений ключа и направления курсора `cursor`
+           для ключа кэша страницы.
+
+        Неверный курсор, как и в page, приводит к ошибке 404.
+        """
+
+        key, backward = self._decode(cursor)
+        return hashlib.sha1(repr((key, backward)).encode()).hexdigest()
+
+    def _order_by(self, backward):
+        return [
+            ('-' if desc != backward else '') + name
+            for name, desc in self.ordering
+        ]
+
+    def _after(self, key, backward):
+        """Условие "строка следует за ключом `key`" для порядка
+           сортировки ключа (или обратного ему, если backward).
+        """
+
+        query = Q()
+        for i, (name, desc) in enumerate(self.ordering):
+            lookup = 'lt' if desc != backward else 'gt'
+            condition = Q(**{f'{name}__{lookup}': key[i]})
+            for j, (prev_name, _) in enumerate(self.ordering[:i]):
+                condition &= Q(**{prev_name: key[j]})
+            query |= condition
+        return query
+
+    def _encode(self, obj, backward):
+        values = []
+        for name, _ in self.ordering:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return signing.dumps({'k': values, 'b': backward}, salt=self.salt)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None, False
+
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+            values = data['k']
+            backward = bool(data['b'])
+            if values is None:
+                return None, backward
+            if len(values) != len(self.ordering):
+                raise ValueError
+            key = [
+                self._to_python(name, value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (signing.BadSignature, KeyError, TypeError, ValueError,
+                ValidationError):
+            raise Http404('Invalid cursor')
+
+        return key, backward
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Ключ по аннотации: значение используется как есть.
+            return value
+        return field.to_python(value)
+
+
+class KeysetPaginationMixin:
+    """Класс-mixin для ListView, включающий постраничный вывод по ключу.
+
+    Режим включается настройкой HASKER_KEYSET_PAGINATION. Номер
+    страницы в нем заменяется параметром запроса `cursor`. Класс,
+    использующий mixin, определяет метод get_keyset_ordering.
+
+    Example:
+        class QuestionListView(KeysetPaginationMixin, ListView):
+    """
+
+    def get_keyset_ordering(self):
+        raise NotImplementedError
+
+    def get_keyset_cache_key(self):
+        """Возвращает значение для ключа кэша страницы по курсору
+           запроса (см. KeysetPaginator.cache_key).
+        """
+
+        paginator = KeysetPaginator(
+            self.get_queryset(), self.get_keyset_ordering(),
+            self.get_paginate_by(None)
+        )
+        return paginator.cache_key(self.request.GET.get('cursor'))
+
+    def paginate_queryset(self, queryset, page_size):
+        if not settings.HASKER_KEYSET_PAGINATION:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(
+            queryset, self.get_keyset_ordering(), page_size
+        )
+        page = paginator.page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Чтение из реплик базы данных.
+
+Реплики задаются переменной окружения REPLICA_URL (один или несколько
+URL-ов через запятую) и попадают в DATABASES под именами replica1,
+replica2, ... и в список HASKER_DATABASE_REPLICAS.
+
+Из реплик читают только GET- и HEAD-запросы к обработчикам,
+отмеченным декоратором reads_from_replica (списки вопросов, поиск,
+вопрос, JSON API); реплика выбирается для каждого запроса случайно.
+Все записи и чтения остальных обработчиков идут в основную базу.
+
+Реплика отстает от основной базы, поэтому пользователь, который
+только что что-то записал (проголосовал, ответил, вошел), должен
+видеть свои изменения. После запроса, который записал данные в базу,
+ReplicaMiddleware выставляет cookie на HASKER_REPLICA_STICKY_SECONDS
+секунд, и пока она есть, запросы пользователя читают основную базу.
+После первой записи в запросе основную базу читает и сам запрос.
+
+Фрагменты страниц, построенные по данным реплики, кэшируются не
+дольше HASKER_REPLICA_STICKY_SECONDS (см. caching.set_fragment):
+иначе страница, построенная до прихода изменений в реплику, могла бы
+остаться в кэше под новой версией вопроса.
+
+Состояние запроса хранится в contextvar, поэтому оно доступно и в
+потоках пула асинхронных обработчиков (см. модуль async_views).
+"""
+
+import asyncio
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+STICKY_COOKIE = 'hasker_primary'
+
+_SAFE_METHODS = ('GET', 'HEAD')
+
+_state = contextvars.ContextVar('replica_state', default=None)
+
+
+class _RequestState:
+    def __init__(self):
+        # Имя реплики, из которой читает запрос, или None.
+        self.read_alias = None
+        self.wrote = False
+
+
+def reads_from_replica(view):
+    """Декоратор обработчика, разрешающий ему читать из реплики."""
+
+    view.reads_from_replica = True
+    return view
+
+
+def reading_from_replica():
+    """Проверяет, читает ли текущий запрос из реплики."""
+
+    state = _state.get()
+    return state is not None and state.read_alias is not None
+
+
+class PrimaryReplicaRouter:
+    """Маршрутизатор запросов к базе: чтение - из реплики, выбранной
+       ReplicaMiddleware для текущего запроса, запись - в основную
+       базу, в том числе запись объектов, прочитанных из реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        return state.read_alias if state is not None else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            # Вне запроса (команды, миграции) база выбирается как обычно.
+            return None
+        state.wrote = True
+        state.read_alias = None
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        databases = {'default', *settings.HASKER_DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Middleware, выбирающий базу для чтения и выставляющий cookie
+       чтения из основной базы после записи.
+
+    Должен стоять до SessionMiddleware, чтобы запись сессии тоже
+    учитывалась. Подключается, только если заданы реплики.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.HASKER_DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._async = asyncio.iscoroutinefunction(get_response)
+        if self._async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._set_sticky_cookie(state, response)
+
+    async def __acall__(self, request):
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._set_sticky_cookie(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or state.wrote:
+            return
+        if request.method in _SAFE_METHODS and \
+           getattr(view_func, 'reads_from_replica', False) and \
+           STICKY_COOKIE not in request.COOKIES:
+            state.read_alias = random.choice(
+                settings.HASKER_DATABASE_REPLICAS)
+
+    @staticmethod
+    def _set_sticky_cookie(state, response):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.HASKER_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
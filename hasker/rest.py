@@ -1,27 +1,37 @@
 # -*- coding: utf-8 -*-
-"""Обработчики REST-запросов на пометку правильного ответа и голосования.
+"""Обработчики REST-запросов на пометку правильного ответа, голосования
+(в том числе пакетного) и подсказки тегов.
 
 Полноценный REST API для приложения не реализован, поэтому `rest_framework`
-не применялся.
+не применялся. Обработчики чтения данных в JSON - в модуле api.
 """
 
+import json
+
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.db.models import Sum, Value
-from django.db.models.functions import Coalesce
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+)
 from django.views import View
 
+from .autocomplete import tag_index
+from .caching import bump_question_version
+from .events import publish
+from .metrics import VOTES
 from .models import Answer, AnswerVote, Question, QuestionVote
+from .trending import update_trending_list
 
 
 class MarkSolutionView(View):
     """Обработка запроса на пометку верного ответа.
 
-    Принимается POST-запрос. Если пользователь не аутентифицирован,
-    выдается ошибка. Для всех ответов, кроме указанного, пометка
-    снимается. Для указанного она снимается или устанавливается в
-    зависимости от параметров запроса.
+    Принимается POST-запрос. Если пользователь не аутентифицирован
+    или не является автором вопроса, выдается ошибка. Верный ответ
+    хранится в поле вопроса accepted_answer, поэтому пометка
+    устанавливается или снимается одним запросом UPDATE, сколько
+    бы ответов ни было у вопроса.
 
     Параметры:
         answer_id: идентификатор ответа
@@ -29,17 +39,23 @@ class MarkSolutionView(View):
     """
 
     def post(self, request, answer_id, is_set):
-        solution = Answer.objects.get(pk=answer_id)
-        question = Question.objects.get(pk=solution.question.id)
+        solution = Answer.objects.filter(
+            pk=answer_id
+        ).values('question_id', 'question__author_id').first()
+        if solution is None:
+            raise Http404
 
         if not request.user.is_authenticated or \
-           question.author != request.user:
+           solution['question__author_id'] != request.user.id:
             raise PermissionDenied
 
-        answers = Answer.objects.filter(question=question).all()
-        for answer in answers:
-            answer.correct = is_set if answer == solution else False
-        Answer.objects.bulk_update(answers, ['correct'])
+        accepted_answer_id = answer_id if is_set else None
+        Question.objects.filter(pk=solution['question_id']).update(
+            accepted_answer=accepted_answer_id
+        )
+        bump_question_version(solution['question_id'])
+        publish(solution['question_id'], 'solution',
+                {'accepted_answer_id': accepted_answer_id})
 
         return HttpResponse()
 
@@ -49,9 +65,9 @@ class QuestionVoteView(View):
 
     Принимается POST-запрос. Если пользователь не аутентифицирован,
     выдается ошибка. Если сумма голосов, отданных пользователем,
-    выйдет за границы [-1, 1], выдается ошибка. Создается, при
-    необходимости, новый экземпляр QuestionVote. В него записывается
-    или обновляется голос.
+    выйдет за границы [-1, 1], выдается ошибка. Голос пользователя
+    и сумма голосов вопроса изменяются одной атомарной операцией
+    (см. VoteManager.cast), которая возвращает новую сумму голосов.
 
     Параметры:
         question_id: идентификатор вопроса
@@ -61,27 +77,22 @@ class QuestionVoteView(View):
         if not request.user.is_authenticated:
             raise PermissionDenied
 
-        question = get_object_or_404(Question, pk=question_id)
+        try:
+            votes_sum = QuestionVote.objects.cast(
+                request.user.id, question_id, 1 if is_up else -1)
+        except Question.DoesNotExist:
+            raise Http404
 
-        old_vote, _ = QuestionVote.objects.get_or_create(
-            user_id=self.request.user.id,
-            question_id=question_id)
-
-        vote = 1 if is_up else -1
-
-        if not (old_vote.vote + vote) in (-1, 0, 1):
+        if votes_sum is None:
             return HttpResponseBadRequest()
 
-        old_vote.vote = old_vote.vote + vote
-        old_vote.save()
-
-        question = Question.objects.filter(
-            id=question_id
-        ).annotate(
-            votes_sum=Coalesce(Sum('questionvote__vote'), Value(0))
-        )
+        update_trending_list(question_id, votes_sum)
+        bump_question_version(question_id)
+        publish(question_id, 'vote',
+                {'target': 'question', 'id': question_id, 'votes': votes_sum})
+        VOTES.labels('question', 'up' if is_up else 'down').inc()
 
-        return JsonResponse({'votes': question[0].votes_sum})
+        return JsonResponse({'votes': votes_sum})
 
 
 class AnswerVoteView(View):
@@ -89,9 +100,9 @@ class AnswerVoteView(View):
 
     Принимается POST-запрос. Если пользователь не аутентифицирован,
     выдается ошибка. Если сумма голосов, отданных пользователем,
-    выйдет за границы [-1, 1], выдается ошибка. Создается, при
-    необходимости, новый экземпляр AnswerVote. В него записывается
-    или обновляется голос.
+    выйдет за границы [-1, 1], выдается ошибка. Голос пользователя
+    и сумма голосов ответа изменяются одной атомарной операцией
+    (см. VoteManager.cast), которая возвращает новую сумму голосов.
 
     Параметры:
         answer_id: идентификатор ответа
@@ -102,24 +113,170 @@ class AnswerVoteView(View):
         if not request.user.is_authenticated:
             raise PermissionDenied
 
-        question = get_object_or_404(Answer, pk=answer_id)
+        try:
+            votes_sum = AnswerVote.objects.cast(
+                request.user.id, answer_id, 1 if is_up else -1)
+        except Answer.DoesNotExist:
+            raise Http404
+
+        if votes_sum is None:
+            return HttpResponseBadRequest()
+
+        question_id = Answer.objects.filter(
+            pk=answer_id
+        ).values_list('question_id', flat=True).first()
+        bump_question_version(question_id)
+        publish(question_id, 'vote',
+                {'target': 'answer', 'id': answer_id, 'votes': votes_sum})
+        VOTES.labels('answer', 'up' if is_up else 'down').inc()
+
+        return JsonResponse({'votes': votes_sum})
+
 
-        old_vote, _ = AnswerVote.objects.get_or_create(
-            user_id=self.request.user.id,
-            answer_id=answer_id)
+class VoteBatchView(View):
+    """Обработка запроса на пакетное голосование.
 
-        vote = 1 if is_up else -1
+    Принимается POST-запрос с JSON-списком операций
+    [<объект>, <идентификатор>, <направление>], где объект -
+    'question' или 'answer', направление - 'up' или 'down':
 
-        if not (old_vote.vote + vote) in (-1, 0, 1):
+        [["question", 1, "up"], ["answer", 7, "down"]]
+
+    Операции выполняются по порядку в одной транзакции по тем же
+    правилам, что и в QuestionVoteView и AnswerVoteView. Отклоненная
+    операция (объекта нет или голос вышел бы за границы [-1, 1])
+    базу не изменяет и не отменяет остальные. Возвращается список
+    результатов в порядке операций: новая сумма голосов или код
+    ошибки.
+
+        {"results": [
+            {"target": "question", "id": 1, "direction": "up",
+             "votes": 3},
+            {"target": "answer", "id": 7, "direction": "down",
+             "error": 404}
+        ]}
+
+    Если пользователь не аутентифицирован, выдается ошибка 403, если
+    список некорректен или длиннее HASKER_VOTE_BATCH_SIZE - ошибка 400.
+    """
+
+    targets = {
+        'question': (QuestionVote, Question),
+        'answer': (AnswerVote, Answer),
+    }
+    directions = {'up': 1, 'down': -1}
+
+    def post(self, request):
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+
+        try:
+            operations = self.parse(request.body)
+        except ValueError:
             return HttpResponseBadRequest()
 
-        old_vote.vote = old_vote.vote + vote
-        old_vote.save()
+        results = []
+        with transaction.atomic():
+            for target, target_id, direction in operations:
+                vote_model, target_model = self.targets[target]
+                result = {
+                    'target': target, 'id': target_id, 'direction': direction
+                }
+                try:
+                    votes_sum = vote_model.objects.cast(
+                        request.user.id, target_id, self.directions[direction])
+                except target_model.DoesNotExist:
+                    result['error'] = 404
+                else:
+                    if votes_sum is None:
+                        result['error'] = 400
+                    else:
+                        result['votes'] = votes_sum
+                results.append(result)
+
+        self.update_caches([r for r in results if 'votes' in r])
+
+        return JsonResponse({'results': results})
+
+    def parse(self, body):
+        """Возвращает список операций из тела запроса `body`.
+
+        Если список некорректен, выбрасывается ValueError.
+        """
+
+        operations = json.loads(body)
+        if not isinstance(operations, list) or \
+           len(operations) > settings.HASKER_VOTE_BATCH_SIZE:
+            raise ValueError
+        for operation in operations:
+            if not isinstance(operation, list) or len(operation) != 3:
+                raise ValueError
+            target, target_id, direction = operation
+            if target not in self.targets or \
+               direction not in self.directions or \
+               type(target_id) is not int:
+                raise ValueError
+        return operations
+
+    @staticmethod
+    def update_caches(accepted):
+        """Обновляет список "в тренде", версии вопросов и метрики и
+           публикует события после принятых голосов `accepted`.
+        """
+
+        # Итоговые суммы голосов: последний результат для объекта.
+        totals = {
+            (result['target'], result['id']): result['votes']
+            for result in accepted
+        }
+        for result in accepted:
+            VOTES.labels(result['target'], result['direction']).inc()
+
+        answer_ids = [
+            target_id for target, target_id in totals if target == 'answer'
+        ]
+        answer_questions = dict(
+            Answer.objects.filter(
+                pk__in=answer_ids
+            ).values_list('id', 'question_id')
+        ) if answer_ids else {}
+
+        question_ids = set()
+        for (target, target_id), votes_sum in totals.items():
+            if target == 'question':
+                question_id = target_id
+                update_trending_list(question_id, votes_sum)
+            else:
+                question_id = answer_questions[target_id]
+            question_ids.add(question_id)
+            publish(question_id, 'vote',
+                    {'target': target, 'id': target_id, 'votes': votes_sum})
+
+        for question_id in question_ids:
+            bump_question_version(question_id)
+
+
+class TagAutocompleteView(View):
+    """Обработка запроса на подсказку тегов по префиксу.
+
+    Принимается GET-запрос. Возвращается JSON со списком тегов,
+    начинающихся с префикса, в порядке убывания количества
+    использований.
+
+    Параметры запроса:
+        q: префикс тега
+        limit: максимальное количество тегов (по умолчанию и не
+            больше HASKER_TAG_AUTOCOMPLETE_SIZE)
+    """
 
-        answers = Answer.objects.filter(
-            id=answer_id
-        ).annotate(
-            votes_sum=Coalesce(Sum('answervote__vote'), Value(0))
-        )
+    def get(self, request):
+        prefix = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get(
+                'limit', settings.HASKER_TAG_AUTOCOMPLETE_SIZE))
+        except ValueError:
+            return HttpResponseBadRequest()
+        limit = max(0, min(limit, settings.HASKER_TAG_AUTOCOMPLETE_SIZE))
 
-        return JsonResponse({'votes': answers[0].votes_sum})
+        tags = tag_index.suggest(prefix, limit) if prefix else []
+        return JsonResponse({'tags': tags})
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""Полнотекстовый поиск по вопросам и ответам.
+
+Текст разбивается на слова, а слова приводятся к основе стеммерами
+Snowball: английским или русским, в зависимости от алфавита слова.
+Поэтому "questions" находит "question", а "вопросы" - "вопрос".
+
+Индекс строится по заголовку вопроса, тексту вопроса и текстам
+ответов. Совпадение в заголовке весит больше, чем в тексте, а в
+тексте - больше, чем в ответе. Индекс обновляется при сохранении
+вопросов и ответов и при удалении ответов (см. перехватчики в конце
+модуля).
+
+Хранение индекса зависит от базы данных:
+    PostgreSQL: колонка tsvector с GIN-индексом у таблицы вопросов
+        (создается миграцией только на PostgreSQL)
+    остальные базы: инвертированный индекс в модели SearchTerm
+"""
+
+import re
+from collections import Counter
+
+import snowballstemmer
+from django.db import connections, router, transaction
+from django.db.models import (
+    BooleanField, Count, IntegerField, OuterRef, Subquery, Sum, Value
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Answer, Question, SearchTerm
+
+
+# Веса совпадений в заголовке, тексте вопроса и в ответах.
+TITLE_WEIGHT = 3
+TEXT_WEIGHT = 2
+ANSWER_WEIGHT = 1
+
+_WORD_RE = re.compile(r'\w+')
+_CYRILLIC_RE = re.compile('[а-яё]')
+
+_stemmers = {
+    'english': snowballstemmer.stemmer('english'),
+    'russian': snowballstemmer.stemmer('russian'),
+}
+
+_max_term_length = SearchTerm._meta.get_field('term').max_length
+
+
+def tokenize(text):
+    """Возвращает список основ слов текста `text`."""
+
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        language = 'russian' if _CYRILLIC_RE.search(word) else 'english'
+        term = _stemmers[language].stemWord(word)
+        if len(term) <= _max_term_length:
+            terms.append(term)
+    return terms
+
+
+class InvertedIndexBackend:
+    """Поиск по инвертированному индексу в модели SearchTerm.
+
+    Для каждой пары (основа слова, вопрос) хранится сумма весов
+    вхождений основы в вопрос и его ответы. Она же служит
+    релевантностью вопроса.
+    """
+
+    def index_question(self, question):
+        """Перестраивает индекс вопроса `question` целиком."""
+
+        counter = Counter()
+        self._count(counter, question.title, TITLE_WEIGHT)
+        self._count(counter, question.text, TEXT_WEIGHT)
+        for text in Answer.objects.filter(
+            question_id=question.id
+        ).values_list('text', flat=True):
+            self._count(counter, text, ANSWER_WEIGHT)
+
+        SearchTerm.objects.filter(question_id=question.id).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, question_id=question.id, weight=weight)
+            for term, weight in counter.items()
+        )
+
+    def index_answer(self, answer):
+        """Добавляет в индекс вопроса текст нового ответа `answer`."""
+
+        counter = Counter()
+        self._count(counter, answer.text, ANSWER_WEIGHT)
+
+        existing = list(SearchTerm.objects.filter(
+            question_id=answer.question_id, term__in=counter
+        ))
+        for search_term in existing:
+            search_term.weight += counter.pop(search_term.term)
+        SearchTerm.objects.bulk_update(existing, ['weight'])
+
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(
+                    term=term, question_id=answer.question_id, weight=weight
+                )
+                for term, weight in counter.items()
+            ],
+            ignore_conflicts=True
+        )
+
+    def search(self, queryset, terms):
+        matches = SearchTerm.objects.filter(
+            term__in=terms
+        ).values(
+            'question'
+        ).annotate(
+            matched=Count('term'), rank=Sum('weight')
+        ).filter(
+            matched=len(terms)
+        )
+
+        return queryset.filter(
+            id__in=matches.values('question')
+        ).annotate(
+            search_rank=Subquery(
+                matches.filter(question=OuterRef('pk')).values('rank'),
+                output_field=IntegerField()
+            )
+        )
+
+    @staticmethod
+    def _count(counter, text, weight):
+        for term in tokenize(text):
+            counter[term] += weight
+
+
+class PostgresBackend:
+    """Поиск по колонке hasker_question.search_vector (tsvector).
+
+    Основы слов вычисляются в Python так же, как для
+    InvertedIndexBackend, и передаются PostgreSQL с конфигурацией
+    'simple', которая их уже не изменяет. Вес A - заголовок,
+    B - текст вопроса, C - ответы.
+    """
+
+    # Релевантность ts_rank - число с плавающей точкой. Оно
+    # приводится к целому, чтобы его можно было использовать в
+    # ключе постраничного вывода (см. модуль pagination).
+    _rank_scale = 1000000
+
+    def index_question(self, question):
+        answers = ' '.join(
+            ' '.join(tokenize(text)) for text in Answer.objects.filter(
+                question_id=question.id
+            ).values_list('text', flat=True)
+        )
+
+        with connections[router.db_for_write(Question)].cursor() as cursor:
+            cursor.execute(
+                "UPDATE hasker_question SET search_vector = "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') "
+                "WHERE id = %s",
+                [
+                    ' '.join(tokenize(question.title)),
+                    ' '.join(tokenize(question.text)),
+                    answers,
+                    question.id
+                ]
+            )
+
+    def index_answer(self, answer):
+        with connections[router.db_for_write(Question)].cursor() as cursor:
+            cursor.execute(
+                "UPDATE hasker_question SET search_vector = "
+                "coalesce(search_vector, ''::tsvector) || "
+                "setweight(to_tsvector('simple', %s), 'C') "
+                "WHERE id = %s",
+                [' '.join(tokenize(answer.text)), answer.question_id]
+            )
+
+    def search(self, queryset, terms):
+        query = ' '.join(terms)
+
+        return queryset.filter(
+            RawSQL(
+                "hasker_question.search_vector @@ "
+                "plainto_tsquery('simple', %s)",
+                [query],
+                output_field=BooleanField()
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                "(ts_rank(hasker_question.search_vector, "
+                "plainto_tsquery('simple', %s)) * %s)::integer",
+                [query, self._rank_scale],
+                output_field=IntegerField()
+            )
+        )
+
+
+def get_search_backend(using=None):
+    """Возвращает объект поиска для базы данных `using`."""
+
+    connection = connections[using or Question.objects.db]
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return InvertedIndexBackend()
+
+
+def search_questions(queryset, text):
+    """Фильтрует запрос вопросов `queryset` по тексту `text`.
+
+    Вопрос подходит, если все слова запроса встречаются в его
+    заголовке, тексте или ответах. Запрос аннотируется полем
+    search_rank - релевантностью вопроса (чем больше, тем лучше).
+    Если в тексте нет ни одного слова, возвращаются все вопросы.
+    """
+
+    terms = sorted(set(tokenize(text)))
+    if not terms:
+        return queryset.annotate(search_rank=Value(0, IntegerField()))
+    return get_search_backend(queryset.db).search(queryset, terms)
+
+
+@receiver(post_save, sender=Question)
+def index_question_signal(sender, instance, raw, **kwargs):
+    """Перехватчик сохранения вопроса: индекс вопроса перестраивается."""
+
+    if not raw:
+        get_search_backend().index_question(instance)
+
+
+@receiver(post_save, sender=Answer)
+def index_answer_signal(sender, instance, created, raw, **kwargs):
+    """Перехватчик сохранения ответа.
+
+    Новый ответ дописывается в индекс вопроса. При изменении
+    ответа его прежний текст неизвестен, поэтому индекс вопроса
+    перестраивается.
+    """
+
+    if raw:
+        return
+    if created:
+        get_search_backend().index_answer(instance)
+    else:
+        get_search_backend().index_question(instance.question)
+
+
+
+@receiver(post_delete, sender=Answer)
+def unindex_answer_signal(sender, instance, **kwargs):
+    """Перехватчик удаления ответа: индекс вопроса перестраивается
+       после фиксации транзакции.
+
+    Если вопрос удален вместе с ответом, индекс не строится: записи
+    индекса удаляются вместе с вопросом.
+    """
+
+    question_id = instance.question_id
+
+    def reindex():
+        question = Question.objects.filter(pk=question_id).first()
+        if question is not None:
+            get_search_backend().index_question(question)
+
+    transaction.on_commit(reindex)
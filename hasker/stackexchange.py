@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""Загрузка дампа Stack Exchange (https://archive.org/details/stackexchange).
+
+Файлы Users.xml, Tags.xml, Posts.xml и Votes.xml читаются потоково
+(iterparse): строка <row .../> удаляется из дерева сразу после
+обработки, поэтому память не растет с размером файла. Строки
+записываются пачками bulk_create, по транзакции на пачку.
+
+Идентификаторы Stack Exchange сохраняются со сдвигом на максимальный
+идентификатор таблицы до загрузки (в пустой базе - без сдвига).
+Поэтому ссылки между строками (автор, вопрос ответа, верный ответ)
+вычисляются без таблиц соответствия, а существование упомянутых строк
+проверяется одним запросом на пачку.
+
+Особенности:
+    - пользователи получают имена se-<id> и неиспользуемый пароль
+    - автор, которого нет в базе (удаленный пользователь), заменяется
+      пользователем se-community
+    - HTML из текстов убирается, тексты обрезаются до ограничений
+      моделей, у вопроса остается не больше MAX_TAGS тегов
+    - голоса в открытом дампе анонимны, поэтому n-й голос за
+      сообщение назначается синтетическому пользователю se-voter-<n>.
+      Загружаются только голоса UpMod (+1) и DownMod (-1).
+    - сигналы post_save не вызываются: после загрузки нужно
+      пересчитать счетчики и поисковый индекс (это делает команда
+      import_stackexchange)
+"""
+
+import html
+import os
+from collections import Counter
+from xml.etree.ElementTree import iterparse
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import strip_tags
+
+from users.models import UserAvatar
+
+from .models import Answer, AnswerVote, Question, QuestionVote, Tag
+
+
+# VoteTypeId -> значение голоса.
+VOTE_TYPES = {'2': 1, '3': -1}
+MAX_TAGS = 3
+
+COMMUNITY_USERNAME = 'se-community'
+VOTER_USERNAME = 'se-voter-{}'
+
+# Неиспользуемый пароль (см. django.contrib.auth.hashers).
+_UNUSABLE_PASSWORD = '!'
+
+
+def iter_rows(path):
+    """Перебирает словари атрибутов строк <row> XML-файла `path`."""
+
+    context = iterparse(path, events=('start', 'end'))
+    _, root = next(context)
+    for event, element in context:
+        if event == 'end' and element.tag == 'row':
+            yield dict(element.attrib)
+            root.clear()
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _date(value):
+    date = parse_datetime(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def _text(value, model, field):
+    max_length = model._meta.get_field(field).max_length
+    return html.unescape(strip_tags(value or '')).strip()[:max_length]
+
+
+def _tag_names(value):
+    # Старый формат - '<python><django>', новый - '|python|django|'.
+    max_length = Tag._meta.get_field('text').max_length
+    names = value.replace('<', '|').replace('>', '|').split('|')
+    return [name[:max_length] for name in names if name]
+
+
+class StackExchangeImporter:
+    """Загрузчик дампа одного сайта Stack Exchange.
+
+    Параметры:
+        directory: каталог с XML-файлами дампа
+        batch_size: количество строк в пачке
+    """
+
+    def __init__(self, directory, batch_size):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.db = router.db_for_write(Question)
+        self.stats = Counter()
+        self.tags = {}
+        self.voters = []
+        # Верный ответ -> вопрос, пока ответ не загружен.
+        self.pending_accepted = {}
+
+    def run(self):
+        """Загружает дамп. Возвращает Counter с количеством загруженных
+           строк по видам.
+        """
+
+        self.community_id = self._get_community()
+        self.user_offset = self._max_id(User)
+        self.question_offset = self._max_id(Question)
+        self.answer_offset = self._max_id(Answer)
+
+        if self.has_file('Users.xml'):
+            self.import_users()
+        # Синтетические пользователи создаются с идентификаторами из
+        # последовательности, которая должна учитывать загруженных.
+        self._reset_sequences(User, UserAvatar)
+
+        if self.has_file('Tags.xml'):
+            self.import_tags()
+        self.tags = dict(Tag.objects.using(self.db).values_list('text', 'id'))
+
+        self.import_posts()
+        if self.has_file('Votes.xml'):
+            self.import_votes()
+
+        self._reset_sequences(Question, Answer)
+        return self.stats
+
+    def import_users(self):
+        for batch in self._rows('Users.xml'):
+            users = [
+                User(
+                    id=int(row['Id']) + self.user_offset,
+                    username=f"se-{int(row['Id']) + self.user_offset}",
+                    first_name=row.get('DisplayName', '')[:150],
+                    password=_UNUSABLE_PASSWORD,
+                    date_joined=_date(row['CreationDate']),
+                )
+                for row in batch
+                # Id -1 - служебный пользователь Community.
+                if int(row['Id']) > 0
+            ]
+            with transaction.atomic(using=self.db):
+                self._create_users(users)
+            self.stats['users'] += len(users)
+
+    def import_tags(self):
+        for batch in self._rows('Tags.xml'):
+            tags = [Tag(text=_tag_names(row['TagName'])[0]) for row in batch]
+            Tag.objects.using(self.db).bulk_create(
+                tags, ignore_conflicts=True)
+            self.stats['tags'] += len(tags)
+
+    def import_posts(self):
+        for batch in self._rows('Posts.xml'):
+            # Автор - загруженный пользователь дампа. Идентификаторы
+            # до user_offset принадлежат пользователям, которые были
+            # в базе до загрузки, поэтому Community (-1) и отсутствующие
+            # владельцы заменяются служебным пользователем до сдвига.
+            owners = {
+                int(row['OwnerUserId']) for row in batch
+                if row.get('OwnerUserId')
+            }
+            authors = self._existing(User, {
+                owner + self.user_offset for owner in owners if owner > 0
+            })
+
+            questions, question_tags, answers = [], [], []
+            for row in batch:
+                owner = int(row.get('OwnerUserId') or 0)
+                author_id = owner + self.user_offset
+                if owner <= 0 or author_id not in authors:
+                    author_id = self.community_id
+
+                if row['PostTypeId'] == '1':
+                    question = self._question(row, author_id)
+                    questions.append(question)
+                    question_tags.extend(
+                        Question.tags.through(
+                            question_id=question.id, tag_id=self.tags[name]
+                        )
+                        for name in _tag_names(row.get('Tags', ''))[:MAX_TAGS]
+                        if name in self.tags
+                    )
+                elif row['PostTypeId'] == '2':
+                    answers.append(self._answer(row, author_id))
+
+            with transaction.atomic(using=self.db):
+                Question.objects.using(self.db).bulk_create(questions)
+                Question.tags.through.objects.using(self.db).bulk_create(
+                    question_tags, ignore_conflicts=True)
+
+                parents = self._existing(
+                    Question, {answer.question_id for answer in answers})
+                answers = [a for a in answers if a.question_id in parents]
+                Answer.objects.using(self.db).bulk_create(answers)
+
+                accepted = [
+                    Question(
+                        id=self.pending_accepted.pop(answer.id),
+                        accepted_answer_id=answer.id
+                    )
+                    for answer in answers
+                    if answer.id in self.pending_accepted
+                ]
+                Question.objects.using(self.db).bulk_update(
+                    accepted, ['accepted_answer'])
+
+            self.stats['questions'] += len(questions)
+            self.stats['answers'] += len(answers)
+
+    def import_votes(self):
+        for batch in self._rows('Votes.xml'):
+            votes = [
+                (int(row['PostId']), VOTE_TYPES[row['VoteTypeId']])
+                for row in batch
+                if row.get('VoteTypeId') in VOTE_TYPES
+            ]
+            with transaction.atomic(using=self.db):
+                self.stats['votes'] += self._create_votes(
+                    votes, QuestionVote, 'question', self.question_offset)
+                self.stats['votes'] += self._create_votes(
+                    votes, AnswerVote, 'answer', self.answer_offset)
+
+    def _question(self, row, author_id):
+        question_id = int(row['Id']) + self.question_offset
+        if row.get('AcceptedAnswerId'):
+            answer_id = int(row['AcceptedAnswerId']) + self.answer_offset
+            self.pending_accepted[answer_id] = question_id
+
+        return Question(
+            id=question_id,
+            title=_text(row.get('Title'), Question, 'title'),
+            text=_text(row.get('Body'), Question, 'text'),
+            creation_date=_date(row['CreationDate']),
+            author_id=author_id,
+        )
+
+    def _answer(self, row, author_id):
+        return Answer(
+            id=int(row['Id']) + self.answer_offset,
+            text=_text(row.get('Body'), Answer, 'text'),
+            creation_date=_date(row['CreationDate']),
+            author_id=author_id,
+            question_id=int(row['ParentId']) + self.question_offset,
+        )
+
+    def _create_votes(self, votes, vote_model, target, offset):
+        """Создает голоса `votes` (пары (PostId, значение)) за сообщения,
+           загруженные в модель объекта голосования `target`.
+        """
+
+        target_model = vote_model._meta.get_field(target).related_model
+        targets = self._existing(
+            target_model, {post_id + offset for post_id, _ in votes})
+
+        # Количество уже загруженных голосов за каждое сообщение -
+        # номер следующего синтетического пользователя.
+        counts = dict(
+            vote_model.objects.using(self.db).filter(
+                **{f'{target}__in': targets}
+            ).order_by().values_list(target).annotate(Count('id'))
+        )
+
+        objects = []
+        for post_id, value in votes:
+            target_id = post_id + offset
+            if target_id not in targets:
+                continue
+            number = counts.get(target_id, 0)
+            counts[target_id] = number + 1
+            objects.append(vote_model(
+                user_id=self._voter(number),
+                vote=value,
+                **{f'{target}_id': target_id}
+            ))
+
+        vote_model.objects.using(self.db).bulk_create(objects)
+        return len(objects)
+
+    def _voter(self, number):
+        """Возвращает идентификатор синтетического пользователя
+           с номером `number`, при необходимости создавая новых.
+        """
+
+        if number >= len(self.voters):
+            count = max(number + 1, 2 * len(self.voters), 100)
+            names = [
+                VOTER_USERNAME.format(i)
+                for i in range(len(self.voters), count)
+            ]
+            users = User.objects.using(self.db)
+            users.bulk_create(
+                [
+                    User(username=name, password=_UNUSABLE_PASSWORD)
+                    for name in names
+                ],
+                ignore_conflicts=True
+            )
+            ids = dict(
+                users.filter(username__in=names).values_list('username', 'id')
+            )
+            UserAvatar.objects.using(self.db).bulk_create(
+                [UserAvatar(user_id=user_id) for user_id in ids.values()],
+                ignore_conflicts=True
+            )
+            self.voters.extend(ids[name] for name in names)
+
+        return self.voters[number]
+
+    def _create_users(self, users):
+        User.objects.using(self.db).bulk_create(users)
+        UserAvatar.objects.using(self.db).bulk_create(
+            UserAvatar(user_id=user.id) for user in users
+        )
+
+    def _get_community(self):
+        user = User.objects.db_manager(self.db).filter(
+            username=COMMUNITY_USERNAME
+        ).first()
+        if user is None:
+            user = User.objects.db_manager(self.db).create_user(
+                COMMUNITY_USERNAME)
+        return user.id
+
+    def _existing(self, model, ids):
+        return set(
+            model.objects.using(self.db).filter(
+                id__in=ids
+            ).values_list('id', flat=True)
+        )
+
+    def _max_id(self, model):
+        return model.objects.using(self.db).aggregate(
+            max_id=Max('id')
+        )['max_id'] or 0
+
+    def _reset_sequences(self, *models):
+        connection = connections[self.db]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def has_file(self, filename):
+        """Проверяет, есть ли в дампе файл `filename`."""
+
+        return os.path.exists(os.path.join(self.directory, filename))
+
+    def _rows(self, filename):
+        return _batches(
+            iter_rows(os.path.join(self.directory, filename)),
+            self.batch_size
+        )
@@ -3,10 +3,8 @@
 
 from django import template
 from django.conf import settings
-from django.db.models import Sum, Value
-from django.db.models.functions import Coalesce
 
-from ..models import Question
+from ..trending import get_trending_list
 
 
 register = template.Library()
@@ -14,31 +12,42 @@ register = template.Library()
 
 @register.simple_tag(takes_context=True)
 def url_replace(context, **kwargs):
-    """Добавляет пары ключ/значение из kwargs к параметрам запроса.
+    """Заменяет параметры запроса значениями из kwargs.
 
     Используется, например для формирования ссылки на следующую
     страницу с сохранением параметров запроса, присутствующих
-    в URL-е.
+    в URL-е. Если в контексте есть base_query, параметры берутся
+    из него, а не из запроса: так строятся ссылки в кэшируемых
+    фрагментах, которые не должны зависеть от лишних параметров
+    запроса.
 
     Examples:
         href="?{% url_replace page=1 %}
     """
-    query = context['request'].GET.copy()
-    query.update(kwargs)
+    query = context.get('base_query', context['request'].GET).copy()
+    for key, value in kwargs.items():
+        query[key] = value
     return query.urlencode()
 
+@register.filter
+def avatar_url(useravatar, size):
+    """Возвращает URL аватарки размера `size` (см. UserAvatar.avatar_url).
+
+    Examples:
+        <img src="{{ user.useravatar|avatar_url:'small' }}"/>
+    """
+    return useravatar.avatar_url(size)
+
+
 @register.inclusion_tag('hasker/_trending.html', takes_context=True)
 def trending_list(context, num=settings.HASKER_TRENDING_SIZE):
     """Выводит список запросов "в тренде".
 
+    Список берется из кэша (см. модуль trending), поэтому `num`
+    не может быть больше HASKER_TRENDING_SIZE.
+
     Examples:
         {% load template-ext %}
         {% trending_list %}
     """
-    return {
-        'trending_list': Question.objects.annotate(
-            votes_sum=Coalesce(Sum('questionvote__vote'), Value(0))
-        ).order_by(
-            '-votes_sum', '-creation_date'
-        ).all()[:num]
-    }
+    return {'trending_list': get_trending_list()[:num]}
@@ -43,7 +43,6 @@ class AnswerFactory(DjangoModelFactory):
         model = models.Answer
 
     text = factory.Sequence(lambda n: 'Text %d' % n)
-    correct = False
     author = factory.SubFactory(UserFactory)
     question = factory.SubFactory(QuestionFactory)
 
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Тесты для JSON API."""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from hasker import models
+from . import factories
+
+
+class QuestionListApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=6)
+        cls.questions = factories.QuestionFactory.create_batch(size=5)
+        for votes_sum, question in zip([2, 0, 5, 1, 3], cls.questions):
+            question.votes_sum = votes_sum
+            question.save()
+
+        tag = models.Tag.objects.create(text='python')
+        cls.questions[0].tags.add(tag)
+        cls.questions[2].tags.add(tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def _ids(self, response):
+        return [question['id'] for question in response.json()['questions']]
+
+    def test_new_pages(self):
+        url = reverse('api-questions')
+        response = self.client.get(url, {'limit': 3})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([5, 4, 3], self._ids(response))
+
+        data = response.json()
+        self.assertIsNone(data['previous'])
+        response = self.client.get(url, {'limit': 3, 'cursor': data['next']})
+        self.assertEqual([2, 1], self._ids(response))
+        self.assertIsNone(response.json()['next'])
+
+    def test_hot(self):
+        response = self.client.get(reverse('api-questions'), {'sort': 'hot'})
+        self.assertEqual([3, 5, 1, 4, 2], self._ids(response))
+
+    def test_tag(self):
+        response = self.client.get(reverse('api-questions'), {'tag': 'python'})
+        self.assertEqual([3, 1], self._ids(response))
+
+    def test_search(self):
+        response = self.client.get(reverse('api-questions'), {'q': 'Title 3'})
+        self.assertEqual([4], self._ids(response))
+
+    def test_sparse_fields(self):
+        # ETag и сам список, без тегов.
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('api-questions'), {'fields': 'id,votes_sum'}
+            )
+        self.assertEqual(
+            {'id': 5, 'votes_sum': 3}, response.json()['questions'][0]
+        )
+
+        response = self.client.get(
+            reverse('api-questions'), {'fields': 'title,tags,author'}
+        )
+        self.assertEqual(
+            {'title': 'Title 0', 'tags': ['python'], 'author': 'User0'},
+            response.json()['questions'][-1]
+        )
+
+    def test_bad_request(self):
+        url = reverse('api-questions')
+        self.assertEqual(
+            400, self.client.get(url, {'fields': 'id,password'}).status_code
+        )
+        self.assertEqual(
+            400, self.client.get(url, {'limit': 'many'}).status_code
+        )
+        self.assertEqual(
+            404, self.client.get(url, {'cursor': 'forged'}).status_code
+        )
+
+    def test_not_modified(self):
+        url = reverse('api-questions')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            304, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+        )
+
+        factories.QuestionFactory()
+        self.assertEqual(
+            200, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+        )
+
+
+class QuestionApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=1)
+        cls.question = factories.QuestionFactory()
+        cls.answers = [
+            factories.AnswerFactory(question=cls.question, votes_sum=votes)
+            for votes in [0, 3, 1]
+        ]
+        cls.question.answers_count = 3
+        cls.question.accepted_answer = cls.answers[0]
+        cls.question.save()
+        cls.url = reverse(
+            'api-question', kwargs={'question_id': cls.question.id}
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail(self):
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(200, response.status_code)
+
+        data = response.json()
+        self.assertEqual('Title 0', data['question']['title'])
+        self.assertEqual(
+            self.answers[0].id, data['question']['accepted_answer_id']
+        )
+        self.assertEqual(
+            [self.answers[1].id, self.answers[2].id],
+            [answer['id'] for answer in data['answers']]
+        )
+
+        response = self.client.get(
+            self.url, {'limit': 2, 'cursor': data['next']}
+        )
+        self.assertEqual(
+            [self.answers[0].id],
+            [answer['id'] for answer in response.json()['answers']]
+        )
+
+    def test_sparse_fields(self):
+        response = self.client.get(
+            self.url, {'fields': 'id', 'answer_fields': 'votes_sum'}
+        )
+        data = response.json()
+        self.assertEqual({'id': self.question.id}, data['question'])
+        self.assertEqual(
+            [{'votes_sum': 3}, {'votes_sum': 1}, {'votes_sum': 0}],
+            data['answers']
+        )
+
+    def test_not_found(self):
+        response = self.client.get(
+            reverse('api-question', kwargs={'question_id': 100})
+        )
+        self.assertEqual(404, response.status_code)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(
+            304, self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            factories.AnswerFactory(question=self.question)
+        self.assertEqual(
+            200, self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code
+        )
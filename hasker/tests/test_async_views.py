@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Тесты для асинхронных обработчиков."""
+
+import asyncio
+import threading
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TransactionTestCase
+)
+
+from hasker import metrics, views
+from hasker.async_views import async_view
+from stackoverflow import instrumentation
+from stackoverflow.middleware import AsyncWhiteNoiseMiddleware
+from . import factories
+
+
+class AsyncViewTest(TransactionTestCase):
+    # Обработчики выполняются в пуле потоков со своими соединениями
+    # с базой, поэтому данные теста должны быть зафиксированы.
+
+    def setUp(self):
+        cache.clear()
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=1)
+        factories.QuestionFactory(title='Async question')
+
+    def _request(self, path):
+        request = AsyncRequestFactory().get(path)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_thread_pool(self):
+        threads = []
+
+        def view(request):
+            threads.append(threading.current_thread().name)
+            return HttpResponse()
+
+        wrapper = async_view(view)
+        self.assertTrue(asyncio.iscoroutinefunction(wrapper))
+
+        await wrapper(self._request('/'))
+        self.assertTrue(threads[0].startswith('hasker-view'))
+
+    async def test_question_list(self):
+        view = async_view(views.QuestionListView.as_view())
+        response = await view(self._request('/'))
+
+        # Шаблон построен в потоке пула.
+        self.assertTrue(response.is_rendered)
+        self.assertContains(response, 'Async question')
+
+    async def test_query_counters(self):
+        stats = instrumentation.RequestStats()
+        counter = metrics._QueryCounter()
+        # Так счетчики устанавливают InstrumentationMiddleware и
+        # MetricsMiddleware в потоке, отличном от потока пула.
+        stats_token = instrumentation._current.set(stats)
+        counter_token = metrics._current_counter.set(counter)
+        try:
+            view = async_view(views.QuestionListView.as_view())
+            await view(self._request('/'))
+        finally:
+            instrumentation._current.reset(stats_token)
+            metrics._current_counter.reset(counter_token)
+
+        self.assertGreater(stats.queries, 0)
+        self.assertEqual(stats.queries, counter.queries)
+
+
+class AsyncWhiteNoiseMiddlewareTest(SimpleTestCase):
+    async def test_async_mode(self):
+        async def get_response(request):
+            return HttpResponse('view')
+
+        middleware = AsyncWhiteNoiseMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        response = await middleware(AsyncRequestFactory().get('/hasker/'))
+        self.assertEqual(b'view', response.content)
+
+    def test_sync_mode(self):
+        middleware = AsyncWhiteNoiseMiddleware(
+            lambda request: HttpResponse('view'))
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+
+        response = middleware(RequestFactory().get('/hasker/'))
+        self.assertEqual(b'view', response.content)
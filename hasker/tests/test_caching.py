@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Тесты для кэша фрагментов страницы вопроса."""
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from hasker import caching, models, views
+from . import factories
+
+
+class QuestionPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.AnswerFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        self.question = factories.QuestionFactory()
+        self.answer = factories.AnswerFactory(
+            question=self.question,
+            author=User.objects.get(username='User1')
+        )
+        # Фабрики не обновляют счетчик ответов.
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(answers_count=1)
+        self.url = reverse(
+            'question', kwargs={'question_id': self.question.id}
+        )
+
+    def test_anonymous_cached_page(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, self.question.title)
+        self.assertContains(response, self.answer.text)
+
+    def test_version_bump(self):
+        version = caching.get_question_version(self.question.id)
+        self.client.get(self.url)
+
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(title='Changed title')
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Changed title')
+
+        caching.bump_question_version(self.question.id)
+        self.assertNotEqual(
+            version, caching.get_question_version(self.question.id)
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Changed title')
+
+    def test_new_answer(self):
+        self.client.get(self.url)
+
+        self.client.login(username='User2', password='123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'text': 'Fresh answer'})
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Fresh answer')
+
+    def test_votes(self):
+        self.client.login(username='User2', password='123')
+        self.client.get(self.url)
+
+        self.client.post(reverse(
+            'question-vote-up', kwargs={'question_id': self.question.id}
+        ))
+        self.client.post(reverse(
+            'answer-vote-up', kwargs={'answer_id': self.answer.id}
+        ))
+
+        response = self.client.get(self.url)
+        self.assertContains(response, '<span id="votes-num">1</span>')
+        self.assertContains(
+            response,
+            f'<span class="votes-num" data-answer-id="{self.answer.id}">'
+            f'1</span>'
+        )
+
+    def test_solution_mark(self):
+        self.client.get(self.url)
+
+        self.client.login(
+            username=self.question.author.username, password='123'
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, 'solution-mark')
+        self.assertNotContains(response, 'bi-star-fill')
+
+        self.client.post(
+            reverse('solution-set', kwargs={'answer_id': self.answer.id})
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, 'bi-star-fill')
+
+        # Другим пользователям элементы пометки не выводятся.
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'solution-mark')
+        self.assertContains(response, 'bi-star-fill')
+
+    def test_pagination_links_ignore_extra_parameters(self):
+        models.Answer.objects.bulk_create([
+            models.Answer(
+                text=f'Answer {n}', question=self.question,
+                author=self.answer.author
+            )
+            for n in range(30)
+        ])
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(answers_count=31)
+        caching.bump_question_version(self.question.id)
+
+        response = self.client.get(self.url, {'utm_source': 'mail'})
+        self.assertContains(response, 'href="?page=2"')
+        self.assertNotContains(response, 'utm_source')
+
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'utm_source')
+
+    def _count_renders(self):
+        return mock.patch.object(
+            views.QuestionDetailView, 'render_answers', autospec=True,
+            side_effect=views.QuestionDetailView.render_answers
+        )
+
+    def test_cursor_not_in_key(self):
+        with self._count_renders() as render:
+            for n in range(3):
+                # Без HASKER_KEYSET_PAGINATION курсор не используется.
+                self.client.get(self.url, {'cursor': f'junk {n}'})
+                self.client.get(self.url, {'page': '0' * n + '1'})
+        self.assertEqual(1, render.call_count)
+
+    @override_settings(HASKER_KEYSET_PAGINATION=True)
+    def test_keyset_cursor_key(self):
+        response = self.client.get(self.url, {'cursor': 'a b'})
+        self.assertEqual(404, response.status_code)
+
+        with self._count_renders() as render:
+            response = self.client.get(self.url)
+            last_cursor = response.context['page_obj'].last_cursor
+            for _ in range(2):
+                self.client.get(self.url, {'cursor': last_cursor})
+        self.assertEqual(2, render.call_count)
+
+    def test_avatar_change(self):
+        self.client.get(self.url)
+        version = caching.get_question_version(self.question.id)
+
+        # Аватарка автора ответа выводится в закэшированном фрагменте.
+        useravatar = self.answer.author.useravatar
+        with self.captureOnCommitCallbacks(execute=True):
+            useravatar.set_avatar('avatars/new.png')
+            useravatar.save()
+
+        self.assertNotEqual(
+            version, caching.get_question_version(self.question.id)
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, 'avatars/new.png')
+
+
+class QuestionRowCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        self.questions = factories.QuestionFactory.create_batch(size=3)
+        self.question = self.questions[0]
+        self.url = reverse('index')
+
+    def test_cached_rows(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, self.question.title)
+        self.assertContains(response, '<time class="timesince" datetime="')
+
+        # Дата последнего вопроса для ETag, количество вопросов и
+        # страница вопросов; строки и список "в тренде" - из кэша.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        for question in self.questions:
+            self.assertContains(response, question.title)
+
+    def test_version_bump(self):
+        self.client.get(self.url)
+
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(title='Changed title')
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Changed title')
+
+        caching.bump_question_version(self.question.id)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Changed title')
+
+    def test_counters(self):
+        self.client.get(self.url)
+
+        # Счетчики входят в ключ строки: их исправление (например,
+        # командой update_counters) видно без смены версии.
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(votes_sum=42, answers_count=7)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Votes<br/>\n    42\n')
+        self.assertContains(response, 'Answers<br/>\n    7\n')
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Тесты для management-команд."""
+
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hasker import models, search
+from hasker.mail import _claim, queue_mail, send_queued_mail
+from . import factories
+
+
+class UpdateCountersTest(TestCase):
+    def setUp(self):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+
+        self.question = factories.QuestionFactory()
+        self.answer = factories.AnswerFactory(question=self.question)
+        factories.AnswerFactory(question=self.question)
+
+        factories.QuestionVoteFactory(question=self.question, vote=1)
+        factories.QuestionVoteFactory(question=self.question, vote=1)
+        factories.QuestionVoteFactory(question=self.question, vote=-1)
+        factories.AnswerVoteFactory(answer=self.answer, vote=-1)
+
+    def test_backfill(self):
+        out = StringIO()
+        call_command('update_counters', stdout=out)
+
+        question = models.Question.objects.get(pk=self.question.id)
+        self.assertEqual(1, question.votes_sum)
+        self.assertEqual(2, question.answers_count)
+        self.assertEqual(
+            -1, models.Answer.objects.get(pk=self.answer.id).votes_sum
+        )
+        self.assertIn('1 question(s) and 1 answer(s)', out.getvalue())
+
+    def test_reconcile_only_stale_rows(self):
+        call_command('update_counters', stdout=StringIO())
+        models.Question.objects.filter(
+            pk=self.question.id
+        ).update(votes_sum=100)
+
+        out = StringIO()
+        call_command('update_counters', stdout=out)
+
+        self.assertEqual(
+            1, models.Question.objects.get(pk=self.question.id).votes_sum
+        )
+        self.assertIn('1 question(s) and 0 answer(s)', out.getvalue())
+
+
+class RebuildSearchIndexTest(TestCase):
+    def setUp(self):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=1)
+        self.question = factories.QuestionFactory(title='Indexed title')
+
+    def test_rebuild(self):
+        models.SearchTerm.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        self.assertIn('Indexed 1 question(s)', out.getvalue())
+        self.assertEqual(
+            [self.question.id],
+            list(search.search_questions(
+                models.Question.objects.all(), 'indexed'
+            ).values_list('id', flat=True))
+        )
+
+
+DUMP = {
+    'Users.xml': """<?xml version="1.0" encoding="utf-8"?>
+<users>
+  <row Id="-1" DisplayName="Community" CreationDate="2008-07-31T00:00:00.000" />
+  <row Id="1" DisplayName="Alice" CreationDate="2008-07-31T14:22:31.287" />
+  <row Id="2" DisplayName="Bob" CreationDate="2008-08-01T10:00:00.000" />
+</users>""",
+    'Tags.xml': """<?xml version="1.0" encoding="utf-8"?>
+<tags>
+  <row Id="1" TagName="python" Count="1" />
+  <row Id="2" TagName="django" Count="2" />
+</tags>""",
+    'Posts.xml': """<?xml version="1.0" encoding="utf-8"?>
+<posts>
+  <row Id="1" PostTypeId="1" AcceptedAnswerId="3" OwnerUserId="1"
+       CreationDate="2008-08-01T12:00:00.000" Title="Streaming &amp; XML"
+       Body="&lt;p&gt;How to parse &amp;lt;xml&amp;gt;?&lt;/p&gt;"
+       Tags="&lt;python&gt;&lt;django&gt;" />
+  <row Id="2" PostTypeId="1" OwnerUserId="999"
+       CreationDate="2008-08-02T12:00:00.000" Title="Orphan question"
+       Body="&lt;p&gt;Text&lt;/p&gt;" Tags="|django|" />
+  <row Id="3" PostTypeId="2" ParentId="1" OwnerUserId="2"
+       CreationDate="2008-08-01T13:00:00.000" Body="&lt;p&gt;iterparse&lt;/p&gt;" />
+  <row Id="4" PostTypeId="2" ParentId="2"
+       CreationDate="2008-08-02T13:00:00.000" Body="Answer" />
+  <row Id="5" PostTypeId="2" ParentId="100" OwnerUserId="1"
+       CreationDate="2008-08-03T13:00:00.000" Body="Lost answer" />
+  <row Id="6" PostTypeId="5" CreationDate="2008-08-03T13:00:00.000" Body="" />
+</posts>""",
+    'Votes.xml': """<?xml version="1.0" encoding="utf-8"?>
+<votes>
+  <row Id="1" PostId="1" VoteTypeId="2" CreationDate="2008-08-01T00:00:00.000" />
+  <row Id="2" PostId="1" VoteTypeId="2" CreationDate="2008-08-01T00:00:00.000" />
+  <row Id="3" PostId="1" VoteTypeId="3" CreationDate="2008-08-01T00:00:00.000" />
+  <row Id="4" PostId="3" VoteTypeId="2" CreationDate="2008-08-01T00:00:00.000" />
+  <row Id="5" PostId="2" VoteTypeId="1" CreationDate="2008-08-01T00:00:00.000" />
+  <row Id="6" PostId="100" VoteTypeId="2" CreationDate="2008-08-01T00:00:00.000" />
+</votes>""",
+}
+
+
+class ImportStackExchangeTest(TestCase):
+    def setUp(self):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=1)
+        self.existing = factories.QuestionFactory()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dump_dir = directory.name
+        for filename, content in DUMP.items():
+            with open(os.path.join(self.dump_dir, filename), 'w') as f:
+                f.write(content)
+
+    def _import(self):
+        out = StringIO()
+        # Пачки по две строки: верный ответ загружается в другой
+        # пачке, чем его вопрос.
+        call_command('import_stackexchange', self.dump_dir,
+                     batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        output = self._import()
+        self.assertIn(
+            'Imported 2 user(s), 2 tag(s), 2 question(s), 2 answer(s) '
+            'and 4 vote(s).', output
+        )
+
+        questions = models.Question.objects.exclude(
+            pk=self.existing.pk
+        ).order_by('creation_date')
+        first, orphan = questions
+
+        self.assertEqual('Streaming & XML', first.title)
+        self.assertEqual('How to parse <xml>?', first.text)
+        self.assertEqual('Alice', first.author.first_name)
+        self.assertEqual(
+            {'python', 'django'},
+            set(first.tags.values_list('text', flat=True))
+        )
+        self.assertEqual(1, first.votes_sum)
+        self.assertEqual(1, first.answers_count)
+
+        answer = first.accepted_answer
+        self.assertEqual('iterparse', answer.text)
+        self.assertEqual('Bob', answer.author.first_name)
+        self.assertEqual(1, answer.votes_sum)
+
+        self.assertEqual('se-community', orphan.author.username)
+        self.assertEqual(
+            'se-community', orphan.answer_set.get().author.username
+        )
+        self.assertIsNone(orphan.accepted_answer)
+
+        # Счетчики и поисковый индекс перестроены.
+        self.assertEqual(
+            [first.id],
+            list(search.search_questions(
+                models.Question.objects.all(), 'streaming'
+            ).values_list('id', flat=True))
+        )
+
+        # Загруженные пользователи - полноценные пользователи сайта.
+        self.assertFalse(first.author.has_usable_password())
+        self.assertIsNotNone(first.author.useravatar)
+
+    def test_import_twice(self):
+        self._import()
+        self._import()
+
+        self.assertEqual(5, models.Question.objects.count())
+        self.assertEqual(2, models.Question.objects.filter(
+            accepted_answer__isnull=False
+        ).count())
+        self.assertEqual(
+            [1, 1],
+            list(models.Question.objects.filter(
+                title='Streaming & XML'
+            ).values_list('votes_sum', flat=True))
+        )
+        # Синтетические голосующие пользователи создаются один раз.
+        self.assertEqual(
+            3, models.QuestionVote.objects.values('user').distinct().count()
+        )
+        self.assertEqual(2, models.Tag.objects.count())
+
+    def test_community_owner(self):
+        # Id -1 со сдвигом совпал бы с уже существующим пользователем.
+        with open(os.path.join(self.dump_dir, 'Posts.xml'), 'w') as f:
+            f.write('''<?xml version="1.0" encoding="utf-8"?>
+<posts>
+  <row Id="1" PostTypeId="1" OwnerUserId="-1"
+       CreationDate="2008-08-01T12:00:00.000" Title="Wiki question"
+       Body="Text" Tags="|django|" />
+</posts>''')
+        self._import()
+
+        question = models.Question.objects.get(title='Wiki question')
+        self.assertEqual('se-community', question.author.username)
+
+    def test_missing_posts(self):
+        os.remove(os.path.join(self.dump_dir, 'Posts.xml'))
+        with self.assertRaises(CommandError):
+            self._import()
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP is down')
+
+
+class LeaseCheckingEmailBackend(BaseEmailBackend):
+    """Проверяет, что отправляемые письма захвачены обработчиком."""
+
+    def send_messages(self, email_messages):
+        claimed = models.OutboundEmail.objects.filter(
+            next_attempt__gt=timezone.now()
+        ).count()
+        if claimed != models.OutboundEmail.objects.count():
+            raise AssertionError('E-mails are not claimed')
+        return len(email_messages)
+
+
+@override_settings(HASKER_MAIL_MAX_ATTEMPTS=2)
+class SendQueuedMailTest(TestCase):
+    def setUp(self):
+        for n in range(3):
+            queue_mail(f'Subject {n}', f'<p>Body {n}</p>', [f'{n}@example.com'])
+
+    def test_batches(self):
+        call_command('send_queued_mail', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(3, len(mail.outbox))
+        self.assertEqual('Body 0', mail.outbox[0].body)
+        self.assertEqual(
+            0, models.OutboundEmail.objects.filter(sent_date=None).count()
+        )
+
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(3, len(mail.outbox))
+
+    @override_settings(
+        EMAIL_BACKEND='hasker.tests.test_commands.LeaseCheckingEmailBackend'
+    )
+    def test_claimed_while_sending(self):
+        self.assertEqual((3, 0), send_queued_mail(10))
+        self.assertEqual(
+            0, models.OutboundEmail.objects.filter(sent_date=None).count()
+        )
+
+    def test_expired_claim_is_retried(self):
+        # Обработчик захватил письма и завершился, не отправив их.
+        _claim(10, timezone.now())
+        self.assertEqual((0, 0), send_queued_mail(10))
+
+        models.OutboundEmail.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual((3, 0), send_queued_mail(10))
+
+    @override_settings(
+        EMAIL_BACKEND='hasker.tests.test_commands.FailingEmailBackend'
+    )
+    def test_retries_with_backoff(self):
+        call_command('send_queued_mail', stdout=StringIO())
+
+        email = models.OutboundEmail.objects.first()
+        self.assertEqual(1, email.attempts)
+        self.assertEqual('SMTP is down', email.last_error)
+        self.assertGreater(email.next_attempt, timezone.now())
+
+        # Время повтора еще не наступило.
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(
+            1, models.OutboundEmail.objects.get(pk=email.pk).attempts
+        )
+
+        models.OutboundEmail.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('send_queued_mail', stdout=StringIO())
+        models.OutboundEmail.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('send_queued_mail', stdout=StringIO())
+
+        # После HASKER_MAIL_MAX_ATTEMPTS попыток письмо больше
+        # не отправляется.
+        self.assertEqual(
+            2, models.OutboundEmail.objects.get(pk=email.pk).attempts
+        )
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Тесты для условных GET-запросов (ETag и Last-Modified)."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from hasker import models
+from . import factories
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        self.question = factories.QuestionFactory()
+        tag = models.Tag.objects.create(text='python')
+        self.question.tags.add(tag)
+
+        self.question_url = reverse(
+            'question', kwargs={'question_id': self.question.id}
+        )
+        self.tag_url = reverse('search_tag', kwargs={'tag': 'python'})
+
+    def test_question_not_modified(self):
+        response = self.client.get(self.question_url)
+        self.assertEqual(200, response.status_code)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.question_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(304, response.status_code)
+
+    def test_question_modified_by_vote(self):
+        self.client.login(username='User1', password='123')
+        etag = self.client.get(self.question_url)['ETag']
+
+        self.client.post(reverse(
+            'question-vote-up', kwargs={'question_id': self.question.id}
+        ))
+
+        response = self.client.get(
+            self.question_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(self.question_url)['ETag']
+
+        self.client.login(username='User1', password='123')
+        response = self.client.get(
+            self.question_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_index_not_modified(self):
+        etag = self.client.get(reverse('index'))['ETag']
+
+        # Только максимальная дата создания вопроса.
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('index'), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(304, response.status_code)
+
+    def test_index_modified_by_new_question(self):
+        etag = self.client.get(reverse('index'))['ETag']
+
+        models.Question.objects.create(
+            title='New', text='New', author=User.objects.get(username='User1')
+        )
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+
+    def test_tag_if_modified_since(self):
+        response = self.client.get(self.tag_url)
+        self.assertEqual(200, response.status_code)
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(
+            self.tag_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(304, response.status_code)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Тесты для оповещений об изменениях вопроса."""
+
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from hasker.events import EventStreamApp, broker, format_event
+from . import factories
+
+
+class EventStreamAppTest(SimpleTestCase):
+    def setUp(self):
+        self.inner_scopes = []
+        self.app = EventStreamApp(self.inner_app)
+        self.received = None
+        self.sent = []
+
+    async def inner_app(self, scope, receive, send):
+        self.inner_scopes.append(scope)
+
+    async def receive(self):
+        return await self.received.get()
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def _wait_sent(self, count):
+        for _ in range(100):
+            if len(self.sent) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f'{len(self.sent)} messages sent, {count} expected')
+
+    def _start(self, path):
+        # Очередь создается в цикле событий теста: до Python 3.10 она
+        # привязывается к циклу текущего потока при создании, а Django
+        # выполняет асинхронные тесты в новом цикле в другом потоке.
+        self.received = asyncio.Queue()
+        self.received.put_nowait({'type': 'http.request', 'body': b''})
+        scope = {'type': 'http', 'method': 'GET', 'path': path}
+        return asyncio.ensure_future(
+            self.app(scope, self.receive, self.send))
+
+    async def test_stream(self):
+        task = self._start(reverse('question-events', args=[1]))
+        await self._wait_sent(2)
+        self.assertEqual(200, self.sent[0]['status'])
+        self.assertIn(
+            (b'content-type', b'text/event-stream'), self.sent[0]['headers']
+        )
+
+        data = {'target': 'question', 'id': 1, 'votes': 3}
+        broker.publish(1, 'vote', data)
+        # События других вопросов не пересылаются.
+        broker.publish(2, 'vote', data)
+        await self._wait_sent(3)
+        self.assertEqual(format_event('vote', data), self.sent[2]['body'])
+
+        self.received.put_nowait({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(3, len(self.sent))
+        self.assertNotIn(1, broker._subscribers)
+
+    async def test_keepalive(self):
+        with self.settings(HASKER_EVENTS_KEEPALIVE=0.01):
+            task = self._start(reverse('question-events', args=[1]))
+            await self._wait_sent(3)
+            self.received.put_nowait({'type': 'http.disconnect'})
+            await asyncio.wait_for(task, 1)
+
+        self.assertEqual(b': keepalive\n\n', self.sent[2]['body'])
+
+    async def test_overflow(self):
+        with self.settings(HASKER_EVENTS_QUEUE_SIZE=1):
+            task = self._start(reverse('question-events', args=[1]))
+            await self._wait_sent(2)
+            for votes in range(3):
+                broker.publish(1, 'vote', {'votes': votes})
+            await asyncio.wait_for(task, 1)
+
+        # Медленный клиент отключается, чтобы переподключиться.
+        self.assertFalse(self.sent[-1].get('more_body', False))
+        self.assertNotIn(1, broker._subscribers)
+
+    async def test_other_requests(self):
+        await self._start(reverse('index'))
+        self.assertEqual(1, len(self.inner_scopes))
+        self.assertEqual([], self.sent)
+
+
+class PublishTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=2)
+        cls.question = factories.QuestionFactory()
+        cls.answer = factories.AnswerFactory(question=cls.question)
+        User.objects.create_user('UserA', 'user_a@example.com', '123')
+
+    def setUp(self):
+        patcher = mock.patch.object(broker, 'publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.login(username='UserA', password='123')
+
+    def test_wsgi_fallback(self):
+        response = self.client.get(
+            reverse('question-events', args=[self.question.id])
+        )
+        self.assertEqual(204, response.status_code)
+
+    def test_votes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('question-vote-up', args=[self.question.id]))
+            self.client.post(
+                reverse('answer-vote-down', args=[self.answer.id]))
+
+        self.assertEqual(
+            [
+                mock.call(self.question.id, 'vote', {
+                    'target': 'question', 'id': self.question.id, 'votes': 1
+                }),
+                mock.call(self.question.id, 'vote', {
+                    'target': 'answer', 'id': self.answer.id, 'votes': -1
+                }),
+            ],
+            self.publish.call_args_list
+        )
+
+    def test_batch_votes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('vote-batch'),
+                [['answer', self.answer.id, 'up']],
+                content_type='application/json'
+            )
+
+        self.publish.assert_called_once_with(
+            self.question.id, 'vote',
+            {'target': 'answer', 'id': self.answer.id, 'votes': 1}
+        )
+
+    def test_answer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('question', args=[self.question.id]),
+                {'text': 'New answer'}
+            )
+
+        answer = self.question.answer_set.latest('id')
+        self.publish.assert_called_once_with(
+            self.question.id, 'answer', {'id': answer.id}
+        )
+
+    def test_solution(self):
+        self.client.login(username='User0', password='123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('solution-set', args=[self.answer.id]))
+
+        self.publish.assert_called_once_with(
+            self.question.id, 'solution',
+            {'accepted_answer_id': self.answer.id}
+        )
+
+    def test_rejected_vote(self):
+        # Отклоненный голос событий не публикует.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('question-vote-up', args=[self.question.id]))
+            self.client.post(
+                reverse('question-vote-up', args=[self.question.id]))
+
+        self.assertEqual(1, self.publish.call_count)
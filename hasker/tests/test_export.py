@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Тесты для выгрузки вопросов."""
+
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from hasker import export, models
+from stackoverflow.handlers import ASGIHandler
+from . import factories
+
+
+def read_export(data):
+    return [
+        json.loads(line)
+        for line in gzip.decompress(data).decode('utf-8').splitlines()
+    ]
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        cls.questions = factories.QuestionFactory.create_batch(size=3)
+
+        tag = models.Tag.objects.create(text='python')
+        cls.questions[0].tags.add(tag)
+        cls.worse = factories.AnswerFactory(question=cls.questions[0])
+        cls.better = factories.AnswerFactory(
+            question=cls.questions[0], votes_sum=2)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl.gz')
+            out = StringIO()
+            # Пачки по два вопроса: выгрузка читается в два запроса.
+            call_command('export_questions', path, batch_size=2, stdout=out)
+            with open(path, 'rb') as f:
+                rows = read_export(f.read())
+
+        self.assertIn(f'to {path}', out.getvalue())
+        self.assertEqual(
+            [question.id for question in self.questions],
+            [row['id'] for row in rows]
+        )
+
+        first = rows[0]
+        self.assertEqual('User0', first['author'])
+        self.assertEqual(['python'], first['tags'])
+        self.assertEqual(
+            [self.better.id, self.worse.id],
+            [answer['id'] for answer in first['answers']]
+        )
+        self.assertEqual(2, first['answers'][0]['votes_sum'])
+        self.assertEqual([], rows[1]['answers'])
+
+    def test_view_staff_only(self):
+        user = User.objects.get(username='User0')
+        self.client.force_login(user)
+        response = self.client.get(reverse('export'))
+        self.assertEqual(302, response.status_code)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('export'))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/gzip', response['Content-Type'])
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        rows = read_export(b''.join(response.streaming_content))
+        self.assertEqual(3, len(rows))
+
+
+class ExportAsgiTest(TransactionTestCase):
+    # Обработчик выполняется в другом потоке со своим соединением
+    # с базой, поэтому данные теста должны быть зафиксированы.
+
+    def setUp(self):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        user = factories.UserFactory(is_staff=True)
+        factories.QuestionFactory.create_batch(size=2, author=user)
+        self.client.force_login(user)
+        self.events = []
+
+    async def _get(self, path):
+        cookie = settings.SESSION_COOKIE_NAME
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', f'{cookie}={self.client.cookies[cookie].value}'
+                 .encode('ascii')),
+            ],
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            self.events.append(message)
+
+        await ASGIHandler()(scope, receive, send)
+
+    def _read_batch(self, *args, read_batch=export._read_batch):
+        self.events.append('read')
+        return read_batch(*args)
+
+    def test_view(self):
+        # Тело ответа ASGIHandler перебирает в цикле событий. Пачки
+        # по одному вопросу.
+        with mock.patch('hasker.export._VIEW_BATCH_SIZE', 1), \
+                mock.patch('hasker.export._read_batch', self._read_batch):
+            async_to_sync(self._get)(reverse('export'))
+
+        # Ответ начинается до чтения первой пачки.
+        start = self.events[0]
+        self.assertEqual(200, start['status'])
+        headers = dict(start['headers'])
+        self.assertEqual(b'application/gzip', headers[b'Content-Type'])
+        self.assertNotIn(b'Content-Length', headers)
+        self.assertEqual(3, self.events.count('read'))
+
+        body = b''.join(
+            event.get('body', b'') for event in self.events[1:]
+            if event != 'read'
+        )
+        self.assertEqual(2, len(read_export(body)))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Тесты для замеров SQL-запросов и шаблонов (stackoverflow.instrumentation)."""
+
+import json
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import factories
+
+
+class InstrumentationMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        factories.QuestionFactory.create_batch(size=3)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(HASKER_INSTRUMENTATION=True)
+    def test_server_timing_and_log(self):
+        with self.assertLogs('stackoverflow.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('index'))
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        self.assertEqual(1, len(logs.records))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual('index', record['view'])
+        self.assertEqual(200, record['status'])
+        # Дата последнего вопроса для ETag, количество вопросов,
+        # страница вопросов, вопросы с авторами и теги для строк,
+        # которых нет в кэше, и список "в тренде".
+        self.assertEqual(6, record['db_queries'])
+        self.assertIn('SELECT', record['slowest_sql'])
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn(f'"{record["db_queries"]} queries"', timing)
+
+    def test_disabled(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
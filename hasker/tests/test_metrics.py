@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Тесты для метрик Prometheus."""
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from . import factories
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(HASKER_METRICS=True)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=3)
+        cls.question = factories.QuestionFactory()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_request_metrics(self):
+        count = sample(
+            'hasker_request_duration_seconds_count',
+            url_name='index', method='GET')
+        queries = sample('hasker_db_queries_total', url_name='index')
+
+        self.client.get(reverse('index'))
+
+        self.assertEqual(count + 1, sample(
+            'hasker_request_duration_seconds_count',
+            url_name='index', method='GET'))
+        self.assertGreater(
+            sample('hasker_db_queries_total', url_name='index'), queries)
+
+    def test_event_counters(self):
+        votes = sample(
+            'hasker_votes_total', target='question', direction='up')
+        answers = sample('hasker_answers_total')
+
+        self.client.login(username='User1', password='123')
+        self.client.post(reverse(
+            'question-vote-up', kwargs={'question_id': self.question.id}
+        ))
+        self.client.post(
+            reverse('question', kwargs={'question_id': self.question.id}),
+            {'text': 'Answer text.'}
+        )
+
+        self.assertEqual(votes + 1, sample(
+            'hasker_votes_total', target='question', direction='up'))
+        self.assertEqual(answers + 1, sample('hasker_answers_total'))
+
+    def test_cache_counters(self):
+        hits = sample(
+            'hasker_cache_requests_total', cache='trending', result='hit')
+        misses = sample(
+            'hasker_cache_requests_total', cache='trending', result='miss')
+
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+
+        self.assertEqual(misses + 1, sample(
+            'hasker_cache_requests_total', cache='trending', result='miss'))
+        self.assertEqual(hits + 1, sample(
+            'hasker_cache_requests_total', cache='trending', result='hit'))
+
+    def test_metrics_view(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'hasker_request_duration_seconds')
+
+    @override_settings(HASKER_METRICS=False)
+    def test_metrics_disabled(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(404, response.status_code)
@@ -2,8 +2,11 @@
 """Тесты для классов-моделей."""
 
 from datetime import datetime
+from unittest import mock, skipUnless
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from hasker import models
 
@@ -23,7 +26,7 @@ class AnswerTest(TestCase):
         )
 
     def test_default_value(self):
-        self.assertFalse(self.answer.correct)
+        self.assertIsNone(self.question.accepted_answer)
         self.assertEqual(
             datetime.now().date(),
             self.answer.creation_date.date()
@@ -125,3 +128,66 @@ class QuestionVoteTest(TestCase):
 
     def test_default_value(self):
         self.assertEqual(0, self.vote.vote)
+
+
+class VoteManagerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('john', 'john@example.com', '123')
+        self.other = User.objects.create_user('jane', 'jane@example.com', '123')
+        self.question = models.Question.objects.create(
+            title='To be or not to be',
+            text='that is the questionm',
+            author=self.user
+        )
+        self.answer = models.Answer.objects.create(
+            text='Answer',
+            author=self.user,
+            question=self.question
+        )
+
+    def test_question_vote_bounds(self):
+        cast = models.QuestionVote.objects.cast
+        self.assertEqual(1, cast(self.user.id, self.question.id, 1))
+        self.assertIsNone(cast(self.user.id, self.question.id, 1))
+        self.assertEqual(2, cast(self.other.id, self.question.id, 1))
+        self.assertEqual(1, cast(self.user.id, self.question.id, -1))
+        self.assertEqual(0, cast(self.user.id, self.question.id, -1))
+        self.assertIsNone(cast(self.user.id, self.question.id, -1))
+
+        self.assertEqual(
+            0, models.Question.objects.get(pk=self.question.id).votes_sum
+        )
+        self.assertEqual(
+            -1,
+            models.QuestionVote.objects.get(
+                user=self.user, question=self.question
+            ).vote
+        )
+
+    def test_answer_vote(self):
+        cast = models.AnswerVote.objects.cast
+        self.assertEqual(-1, cast(self.user.id, self.answer.id, -1))
+        self.assertEqual(
+            -1, models.Answer.objects.get(pk=self.answer.id).votes_sum
+        )
+
+    def test_missing_target(self):
+        with self.assertRaises(models.Question.DoesNotExist):
+            models.QuestionVote.objects.cast(self.user.id, 999, 1)
+        self.assertEqual(0, models.QuestionVote.objects.count())
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_sqlite_without_returning(self):
+        cast = models.QuestionVote.objects.cast
+        with mock.patch.object(connection.Database, 'sqlite_version_info',
+                               (3, 34, 1)), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(1, cast(self.user.id, self.question.id, 1))
+            self.assertIsNone(cast(self.user.id, self.question.id, 1))
+            self.assertEqual(0, cast(self.user.id, self.question.id, -1))
+            with self.assertRaises(models.Question.DoesNotExist):
+                cast(self.user.id, 999, 1)
+
+        self.assertFalse(any(
+            'RETURNING' in query['sql'] for query in queries.captured_queries
+        ))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Тесты для чтения из реплик базы данных."""
+
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from hasker import caching, models
+from hasker.replicas import STICKY_COOKIE
+from users.models import UserAvatar
+
+
+# Реплика 'replica' - отдельная база SQLite из REPLICA_TEST_DB (см.
+# настройки), в которую данные основной базы не попадают: так видно,
+# из какой базы прочитана страница.
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'REPLICA_TEST_DB is not set')
+@override_settings(HASKER_DATABASE_REPLICAS=['replica'])
+class ReplicaTest(TestCase):
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user('User0', 'user0@example.com', '123')
+        models.Question.objects.create(
+            id=1, title='Question in default', text='Text', author=author
+        )
+
+        # Пользователи в реплике - копия основной базы, вопрос - другой.
+        User.objects.using('replica').bulk_create([author])
+        UserAvatar.objects.using('replica').bulk_create(
+            [UserAvatar(user_id=author.id)])
+        models.Question.objects.using('replica').create(
+            id=1, title='Question in replica', text='Text',
+            author_id=author.id
+        )
+
+    def test_reads_from_replica(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Question in replica')
+        self.assertNotContains(response, 'Question in default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        response = self.client.get(
+            reverse('question', kwargs={'question_id': 1}))
+        self.assertContains(response, 'Question in replica')
+
+    def test_sticky_cookie_reads_primary(self):
+        self.client.cookies[STICKY_COOKIE] = '1'
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Question in default')
+
+    def test_sticky_after_write(self):
+        self.client.login(username='User0', password='123')
+
+        response = self.client.post(
+            reverse('question-vote-up', kwargs={'question_id': 1}))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, models.QuestionVote.objects.count())
+        self.assertEqual(
+            0, models.QuestionVote.objects.using('replica').count())
+
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(10, cookie['max-age'])
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Question in default')
+
+        del self.client.cookies[STICKY_COOKIE]
+        cache.clear()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Question in replica')
+
+    def test_short_cache_for_replica_fragments(self):
+        with self.settings(HASKER_REPLICA_STICKY_SECONDS=0):
+            response = self.client.get(
+                reverse('question', kwargs={'question_id': 1}))
+            self.assertContains(response, 'Question in replica')
+
+        # Фрагмент из реплики не сохранился (срок хранения 0),
+        # и после прихода изменений страница строится заново.
+        version = caching.get_question_version(1)
+        self.assertIsNone(caching.get_fragment('question', 1, version))
+
+
+class NoReplicaTest(TestCase):
+    def test_middleware_not_used(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
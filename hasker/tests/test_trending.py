@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Тесты для кэша списка вопросов "в тренде"."""
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from hasker import models, trending
+from . import factories
+
+
+@override_settings(HASKER_TRENDING_SIZE=3)
+class TrendingListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=5)
+        self.questions = factories.QuestionFactory.create_batch(size=5)
+        for votes, question in enumerate(self.questions):
+            models.Question.objects.filter(
+                pk=question.id
+            ).update(votes_sum=votes)
+
+        User.objects.create_user('voter1', 'voter1@example.com', '123')
+        User.objects.create_user('voter2', 'voter2@example.com', '123')
+
+    def _trending_ids(self):
+        return [item['id'] for item in trending.get_trending_list()]
+
+    def test_cached_list(self):
+        ids = [q.id for q in reversed(self.questions[2:])]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(ids, self._trending_ids())
+        with self.assertNumQueries(0):
+            self.assertEqual(ids, self._trending_ids())
+
+    def test_vote_updates_cached_list(self):
+        self._trending_ids()
+
+        question = self.questions[1]
+        for username in ('voter1', 'voter2'):
+            self.client.login(username=username, password='123')
+            self.client.post(reverse(
+                'question-vote-up', kwargs={'question_id': question.id}
+            ))
+
+        with self.assertNumQueries(0):
+            ids = self._trending_ids()
+        self.assertEqual(
+            [self.questions[4].id, self.questions[3].id, question.id], ids
+        )
+
+    def test_vote_down_invalidates_last_item(self):
+        self._trending_ids()
+
+        self.client.login(username='voter1', password='123')
+        question = self.questions[2]
+        self.client.post(
+            reverse('question-vote-down', kwargs={'question_id': question.id})
+        )
+
+        self.assertIsNone(cache.get(trending.CACHE_KEY))
+        self.assertEqual(
+            [self.questions[4].id, self.questions[3].id, question.id],
+            self._trending_ids()
+        )
+
+    def test_update_releases_lock(self):
+        self._trending_ids()
+
+        trending.update_trending_list(self.questions[3].id, 10)
+        self.assertIsNone(cache.get(trending.LOCK_KEY))
+        self.assertEqual(self.questions[3].id, self._trending_ids()[0])
+
+    @mock.patch('hasker.trending._LOCK_WAIT', 0)
+    def test_locked_list_is_invalidated(self):
+        self._trending_ids()
+
+        # Список исправляет другой процесс: исправление нельзя
+        # применить, не потеряв чужое, поэтому список сбрасывается.
+        cache.add(trending.LOCK_KEY, 'other')
+        trending.update_trending_list(self.questions[3].id, 10)
+
+        self.assertIsNone(cache.get(trending.CACHE_KEY))
+        self.assertEqual('other', cache.get(trending.LOCK_KEY))
@@ -2,14 +2,19 @@
 """Тесты для view-классов."""
 
 from datetime import datetime
+from io import StringIO
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from django.db.models import Sum, Value
 from django.db.models.functions import Coalesce
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from hasker import models, views
+from hasker import caching, models, views
+from hasker.autocomplete import tag_index
+from hasker.trending import get_trending_list
 from . import factories
 
 
@@ -51,6 +56,10 @@ def createTestData(question_num):
                             vote=1
                         )
 
+    # Фабрики создают голоса и ответы в обход view-классов,
+    # поэтому счетчики пересчитываются отдельно.
+    call_command('update_counters', stdout=StringIO())
+
 
 class QuestionListViewTest(TestCase):
     @classmethod
@@ -104,11 +113,83 @@ class QuestionListViewTest(TestCase):
         self.assertEqual(30, response.context['question_list'][9].answers_count)
 
 
+@override_settings(HASKER_KEYSET_PAGINATION=True)
+class QuestionListKeysetViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        createTestData(question_num=30)
+
+    def test_default_pages(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_paginated'])
+        page = response.context['page_obj']
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertEqual(20, len(response.context['question_list']))
+        self.assertEqual(1, response.context['question_list'][0].votes_sum)
+
+        response = self.client.get(
+            reverse('index'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertTrue(page.has_previous())
+        self.assertFalse(page.has_next())
+        self.assertEqual(10, len(response.context['question_list']))
+        self.assertEqual(21, response.context['question_list'][0].votes_sum)
+        self.assertEqual(0, response.context['question_list'][9].votes_sum)
+
+        response = self.client.get(
+            reverse('index'), {'cursor': page.previous_cursor}
+        )
+        page = response.context['page_obj']
+        self.assertEqual(20, len(response.context['question_list']))
+        self.assertEqual(1, response.context['question_list'][0].votes_sum)
+        self.assertEqual(20, response.context['question_list'][19].votes_sum)
+        self.assertFalse(page.has_previous())
+
+    def test_hot_pages(self):
+        response = self.client.get(reverse('index'), {'sort': 'hot'})
+        page = response.context['page_obj']
+        self.assertEqual(29, response.context['question_list'][0].votes_sum)
+        self.assertEqual(10, response.context['question_list'][19].votes_sum)
+
+        response = self.client.get(
+            reverse('index'), {'sort': 'hot', 'cursor': page.next_cursor}
+        )
+        self.assertEqual(10, len(response.context['question_list']))
+        self.assertEqual(9, response.context['question_list'][0].votes_sum)
+        self.assertEqual(0, response.context['question_list'][9].votes_sum)
+
+    def test_last_page(self):
+        response = self.client.get(reverse('index'), {'sort': 'hot'})
+        page = response.context['page_obj']
+
+        response = self.client.get(
+            reverse('index'), {'sort': 'hot', 'cursor': page.last_cursor}
+        )
+        page = response.context['page_obj']
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertEqual(20, len(response.context['question_list']))
+        self.assertEqual(0, response.context['question_list'][19].votes_sum)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('index'), {'cursor': 'garbage'})
+        self.assertEqual(404, response.status_code)
+
+
 class QuestionViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         createTestData(question_num=3)
 
+    def setUp(self):
+        # Закэшированные фрагменты вопросов переживают откат
+        # транзакции теста.
+        cache.clear()
+
     def test_invalid_question(self):
         response = self.client.get('/hasker/question/999/')
         self.assertEqual(404, response.status_code)
@@ -137,6 +218,35 @@ class QuestionViewTest(TestCase):
         self.assertEqual(4, response.context['answer_list'][0].votes_sum)
         self.assertEqual(0, response.context['answer_list'][3].votes_sum)
 
+    def test_answers_page_without_count(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+
+        # Сессии нет, список "в тренде" в кэше: вопрос (с тегами)
+        # и страница ответов, без COUNT.
+        get_trending_list()
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('question', kwargs={'question_id': question.id})
+            )
+        self.assertEqual(2, response.context['paginator'].num_pages)
+
+    @override_settings(HASKER_KEYSET_PAGINATION=True)
+    def test_keyset_answers(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+        url = reverse('question', kwargs={'question_id': question.id})
+
+        response = self.client.get(url)
+        page = response.context['page_obj']
+        self.assertEqual(25, len(response.context['answer_list']))
+        self.assertEqual(29, response.context['answer_list'][0].votes_sum)
+
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        page = response.context['page_obj']
+        self.assertFalse(page.has_next())
+        self.assertEqual(4, len(response.context['answer_list']))
+        self.assertEqual(4, response.context['answer_list'][0].votes_sum)
+        self.assertEqual(0, response.context['answer_list'][3].votes_sum)
+
     def test_new_answer_saving(self):
         question = models.Question.objects.filter(title='Title 1').first()
 
@@ -153,7 +263,16 @@ class QuestionViewTest(TestCase):
             30,
             models.Answer.objects.filter(question__id=question.id).count()
         )
+        self.assertEqual(
+            30, models.Question.objects.get(pk=question.id).answers_count
+        )
+
+        # Письмо ставится в очередь и отправляется командой.
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(1, models.OutboundEmail.objects.count())
+        call_command('send_queued_mail', stdout=StringIO())
         self.assertEqual(1, len(mail.outbox))
+        self.assertEqual([question.author.email], mail.outbox[0].to)
 
     def test_new_answer_requires_login(self):
         question = models.Question.objects.filter(title='Title 1').first()
@@ -175,6 +294,7 @@ class QuestionViewTest(TestCase):
             models.Answer.objects.filter(question__id=question.id).count()
         )
         self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(0, models.OutboundEmail.objects.count())
 
 
 class AskFormViewTest(TestCase):
@@ -228,6 +348,15 @@ class MarkSolutionViewTest(TestCase):
     def setUpTestData(cls):
         createTestData(question_num=3)
 
+    def setUp(self):
+        # Закэшированные фрагменты вопросов переживают откат
+        # транзакции теста.
+        cache.clear()
+
+    @staticmethod
+    def _accepted(question):
+        return models.Question.objects.get(pk=question.id).accepted_answer_id
+
     def test_set_clear_solution(self):
         question = models.Question.objects.filter(title='Title 1').first()
         answers = models.Answer.objects.filter(question__id=question.id)
@@ -238,21 +367,18 @@ class MarkSolutionViewTest(TestCase):
             reverse('solution-set', kwargs={'answer_id': answers[0].id})
         )
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(models.Answer.objects.get(pk=answers[0].id).correct)
-        self.assertFalse(models.Answer.objects.get(pk=answers[1].id).correct)
+        self.assertEqual(answers[0].id, self._accepted(question))
 
         response = self.client.post(
             reverse('solution-clear', kwargs={'answer_id': answers[0].id})
         )
         self.assertEqual(response.status_code, 200)
-        self.assertFalse(models.Answer.objects.get(pk=answers[0].id).correct)
-        self.assertFalse(models.Answer.objects.get(pk=answers[1].id).correct)
+        self.assertIsNone(self._accepted(question))
 
     def test_change_solution(self):
         question = models.Question.objects.filter(title='Title 1').first()
         answers = models.Answer.objects.filter(question__id=question.id)
-        self.assertFalse(models.Answer.objects.get(pk=answers[0].id).correct)
-        self.assertFalse(models.Answer.objects.get(pk=answers[1].id).correct)
+        self.assertIsNone(self._accepted(question))
 
         self.client.login(username=question.author.username, password='123')
 
@@ -260,15 +386,46 @@ class MarkSolutionViewTest(TestCase):
             reverse('solution-set', kwargs={'answer_id': answers[0].id})
         )
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(models.Answer.objects.get(pk=answers[0].id).correct)
-        self.assertFalse(models.Answer.objects.get(pk=answers[1].id).correct)
+        self.assertEqual(answers[0].id, self._accepted(question))
 
         response = self.client.post(
             reverse('solution-set', kwargs={'answer_id': answers[1].id})
         )
         self.assertEqual(response.status_code, 200)
-        self.assertFalse(models.Answer.objects.get(pk=answers[0].id).correct)
-        self.assertTrue(models.Answer.objects.get(pk=answers[1].id).correct)
+        self.assertEqual(answers[1].id, self._accepted(question))
+
+    def test_solution_set_single_update(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+        answer = models.Answer.objects.filter(question__id=question.id).first()
+
+        self.client.login(username=question.author.username, password='123')
+        # Сессия, пользователь, ответ с автором вопроса и UPDATE.
+        with self.assertNumQueries(4):
+            self.client.post(
+                reverse('solution-set', kwargs={'answer_id': answer.id})
+            )
+        self.assertEqual(answer.id, self._accepted(question))
+
+    def test_solution_page_star(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+        answer = models.Answer.objects.filter(
+            question__id=question.id
+        ).order_by('-votes_sum').first()
+        models.Question.objects.filter(pk=question.id).update(
+            accepted_answer=answer
+        )
+
+        response = self.client.get(
+            reverse('question', kwargs={'question_id': question.id})
+        )
+        self.assertContains(response, 'bi-star-fill', count=1)
+
+    def test_solution_missing_answer(self):
+        self.client.login(username='User0', password='123')
+        response = self.client.post(
+            reverse('solution-set', kwargs={'answer_id': 999})
+        )
+        self.assertEqual(response.status_code, 404)
 
     def test_solution_set_requires_question_author(self):
         question = models.Question.objects.filter(title='Title 1').first()
@@ -412,6 +569,17 @@ class QuestionVoteViewTest(TestCase):
             init_votes + 1,
             QuestionVoteViewTest._get_votes_sum(question)
         )
+        self.assertEqual(
+            init_votes + 1,
+            models.Question.objects.get(pk=question.id).votes_sum
+        )
+
+    def test_vote_missing_question(self):
+        self.client.login(username='UserA', password='123')
+        response = self.client.post(
+            reverse('question-vote-up', kwargs={'question_id': 999})
+        )
+        self.assertEqual(404, response.status_code)
 
     def test_vote_requires_login(self):
         question = models.Question.objects.filter(title='Title 1').first()
@@ -541,6 +709,10 @@ class AnswerVoteViewTest(TestCase):
             init_votes + 1,
             AnswerVoteViewTest._get_votes_sum(answer)
         )
+        self.assertEqual(
+            init_votes + 1,
+            models.Answer.objects.get(pk=answer.id).votes_sum
+        )
 
     def test_vote_requires_login(self):
         question = models.Question.objects.filter(title='Title 1').first()
@@ -557,6 +729,89 @@ class AnswerVoteViewTest(TestCase):
         self.assertEqual(403, response.status_code, 403)
 
 
+class VoteBatchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory.create_batch(size=2)
+        cls.question = factories.QuestionFactory()
+        cls.answer = factories.AnswerFactory(question=cls.question)
+        User.objects.create_user('UserA', 'user_a@example.com', '123')
+
+    def setUp(self):
+        cache.clear()
+
+    def _post(self, operations):
+        return self.client.post(
+            reverse('vote-batch'), operations,
+            content_type='application/json'
+        )
+
+    def test_batch(self):
+        self.client.login(username='UserA', password='123')
+        version = caching.get_question_version(self.question.id)
+
+        response = self._post([
+            ['question', self.question.id, 'up'],
+            ['answer', self.answer.id, 'down'],
+            # Голос вышел бы за границы.
+            ['question', self.question.id, 'up'],
+            ['answer', 1000, 'up'],
+        ])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [
+                {'target': 'question', 'id': self.question.id,
+                 'direction': 'up', 'votes': 1},
+                {'target': 'answer', 'id': self.answer.id,
+                 'direction': 'down', 'votes': -1},
+                {'target': 'question', 'id': self.question.id,
+                 'direction': 'up', 'error': 400},
+                {'target': 'answer', 'id': 1000,
+                 'direction': 'up', 'error': 404},
+            ],
+            response.json()['results']
+        )
+
+        self.assertEqual(
+            1, models.Question.objects.get(pk=self.question.id).votes_sum
+        )
+        self.assertEqual(
+            -1, models.Answer.objects.get(pk=self.answer.id).votes_sum
+        )
+        self.assertEqual(1, models.QuestionVote.objects.count())
+        self.assertNotEqual(
+            version, caching.get_question_version(self.question.id)
+        )
+        self.assertEqual(1, get_trending_list()[0]['votes_sum'])
+
+    def test_not_authenticated(self):
+        response = self._post([['question', self.question.id, 'up']])
+        self.assertEqual(403, response.status_code)
+        self.assertEqual(0, models.QuestionVote.objects.count())
+
+    def test_bad_request(self):
+        self.client.login(username='UserA', password='123')
+
+        for operations in [
+            {'question': self.question.id},
+            [['question', self.question.id]],
+            [['comment', self.question.id, 'up']],
+            [['question', str(self.question.id), 'up']],
+            [['question', self.question.id, 'sideways']],
+        ]:
+            self.assertEqual(400, self._post(operations).status_code)
+
+        with override_settings(HASKER_VOTE_BATCH_SIZE=1):
+            response = self._post([
+                ['question', self.question.id, 'up'],
+                ['answer', self.answer.id, 'up'],
+            ])
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(0, models.QuestionVote.objects.count())
+
+
 class SearchListViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -584,10 +839,67 @@ class SearchListViewTest(TestCase):
         self.assertEqual('Text 0', response.context['question_list'][9].text)
 
     def test_single_search(self):
+        # Ответы тоже участвуют в поиске: "11" встречается в ответах
+        # других вопросов, но выше всех - вопрос с обоими словами
+        # в заголовке.
         response = self.client.get(reverse('search')+'?q=Title 11')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(1, len(response.context['question_list']))
         self.assertEqual('Title 11', response.context['question_list'][0].title)
+        self.assertGreater(
+            response.context['question_list'][0].search_rank,
+            response.context['question_list'][1].search_rank
+        )
+
+    @override_settings(HASKER_KEYSET_PAGINATION=True)
+    def test_keyset_pagination(self):
+        response = self.client.get(reverse('search'), {'q': 'Title'})
+        self.assertEqual(20, len(response.context['question_list']))
+        page = response.context['page_obj']
+
+        response = self.client.get(
+            reverse('search'), {'q': 'Title', 'cursor': page.next_cursor}
+        )
+        self.assertEqual(10, len(response.context['question_list']))
+        self.assertEqual('Title 21', response.context['question_list'][0].title)
+        self.assertEqual('Title 0', response.context['question_list'][9].title)
+
+    def test_answer_text_search(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+        factories.AnswerFactory(
+            text='Use the questions of PostgreSQL',
+            author=question.author,
+            question=question
+        )
+
+        response = self.client.get(reverse('search')+'?q=postgresql question')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, len(response.context['question_list']))
+        self.assertEqual('Title 1', response.context['question_list'][0].title)
+
+    def test_deleted_answer_not_found(self):
+        question = models.Question.objects.filter(title='Title 1').first()
+        answer = factories.AnswerFactory(
+            text='Use PostgreSQL', author=question.author, question=question
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.delete()
+
+        response = self.client.get(reverse('search'), {'q': 'postgresql'})
+        self.assertEqual(0, len(response.context['question_list']))
+
+        # Ответы удаленного вопроса индекс не перестраивают.
+        with self.captureOnCommitCallbacks(execute=True):
+            question.delete()
+
+    def test_russian_stemming(self):
+        question = models.Question.objects.filter(title='Title 2').first()
+        question.title = 'Вопросы о базах данных'
+        question.save()
+
+        response = self.client.get(reverse('search')+'?q=вопрос базы')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, len(response.context['question_list']))
+        self.assertEqual(question.id, response.context['question_list'][0].id)
 
     def test_no_result_search(self):
         response = self.client.get(reverse('search')+'?q=ZZZ')
@@ -619,4 +931,54 @@ class SearchListViewTest(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(0, len(response.context['question_list']))
- 
\ No newline at end of file
+ 
+
+class TagAutocompleteViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        createTestData(question_num=3)
+
+        questions = models.Question.objects.all()
+        python = models.Tag.objects.create(text='python')
+        pytest = models.Tag.objects.create(text='pytest')
+        models.Tag.objects.create(text='PyPy')
+        models.Tag.objects.create(text='django')
+        for question in questions:
+            question.tags.add(python)
+        questions[0].tags.add(pytest)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_prefix_ranking(self):
+        response = self.client.get(reverse('tag-autocomplete'), {'q': 'py'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ['python', 'pytest', 'PyPy'], response.json()['tags']
+        )
+
+        response = self.client.get(
+            reverse('tag-autocomplete'), {'q': 'PY', 'limit': 1}
+        )
+        self.assertEqual(['python'], response.json()['tags'])
+
+    def test_empty_prefix(self):
+        response = self.client.get(reverse('tag-autocomplete'), {'q': ''})
+        self.assertEqual([], response.json()['tags'])
+
+    def test_new_tags_update_index(self):
+        self.client.get(reverse('tag-autocomplete'), {'q': 'd'})
+
+        self.client.login(username='User0', password='123')
+        self.client.post(
+            reverse('ask'),
+            {'title': 'T', 'text': 'Text', 'tags': 'docker, django'}
+        )
+        self.client.post(
+            reverse('ask'),
+            {'title': 'T', 'text': 'Text', 'tags': 'docker'}
+        )
+
+        with self.assertNumQueries(0):
+            tags = tag_index.suggest('d', 10)
+        self.assertEqual(['docker', 'django'], tags)
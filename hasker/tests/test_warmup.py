@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Тесты для прогрева процесса."""
+
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from hasker import trending
+from hasker.warmup import format_report, warm_up
+from . import factories
+
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        factories.UserFactory.reset_sequence()
+        factories.QuestionFactory.reset_sequence()
+        factories.UserFactory()
+        factories.QuestionFactory()
+
+    def test_stages(self):
+        report = warm_up()
+
+        self.assertEqual(
+            ['urls', 'translations', 'templates', 'caches'],
+            [stage.name for stage in report]
+        )
+        stages = {stage.name: stage for stage in report}
+        self.assertGreater(stages['urls'].count, 0)
+        self.assertGreater(stages['templates'].count, 0)
+        self.assertEqual(0, sum(stage.errors for stage in report))
+
+        self.assertIsNotNone(cache.get(trending.CACHE_KEY))
+
+    def test_broken_template(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'broken.html'), 'w') as f:
+                f.write('{% if %}')
+
+            templates = [{**settings.TEMPLATES[0], 'DIRS': [directory]}]
+            with override_settings(TEMPLATES=templates):
+                report = warm_up()
+
+        templates = next(stage for stage in report if stage.name == 'templates')
+        self.assertEqual(1, templates.errors)
+        self.assertIn('templates: ', format_report(report)[2])
+        self.assertIn('(1 failed)', format_report(report)[2])
+
+    def test_database_error(self):
+        with mock.patch('hasker.warmup.get_trending_list',
+                        side_effect=OperationalError('database is down')):
+            with self.assertLogs('hasker.warmup', 'ERROR') as logs:
+                report = warm_up()
+
+        self.assertEqual(4, len(report))
+        caches = report[-1]
+        self.assertEqual(('caches', 0, 1), caches[:3])
+        self.assertIn('caches', logs.output[0])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('warmup', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(5, len(lines))
+        self.assertTrue(lines[-1].startswith('total: '))
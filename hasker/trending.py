@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Кэшируемый список вопросов "в тренде".
+
+Список из HASKER_TRENDING_SIZE вопросов с наибольшей суммой голосов
+хранится в кэше не дольше HASKER_TRENDING_TIMEOUT секунд. При
+голосовании список не сбрасывается, а исправляется на месте. Сброс
+нужен, только если вопрос мог уступить место вопросу вне списка.
+
+Исправление - чтение, изменение и запись списка - выполняется под
+блокировкой в кэше (cache.add), иначе параллельные голоса теряли бы
+изменения друг друга. Если блокировку не удалось получить за
+_LOCK_WAIT секунд, список сбрасывается и строится заново.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count_cache_lookup
+from .models import Question
+
+
+CACHE_KEY = 'hasker:trending'
+LOCK_KEY = 'hasker:trending-lock'
+
+# Время жизни блокировки списка (на случай, если процесс, захвативший
+# ее, завершился) и время ожидания ее освобождения, в секундах.
+_LOCK_TIMEOUT = 5
+_LOCK_WAIT = 0.5
+
+_FIELDS = ('id', 'title', 'votes_sum', 'creation_date')
+
+
+def _sort_key(item):
+    return (item['votes_sum'], item['creation_date'])
+
+
+def _store(items, expires):
+    timeout = expires - time.time()
+    if timeout > 0:
+        cache.set(CACHE_KEY, {'items': items, 'expires': expires}, timeout)
+    else:
+        cache.delete(CACHE_KEY)
+
+
+def get_trending_list():
+    """Возвращает список вопросов "в тренде".
+
+    Элементы списка - словари с полями id, title, votes_sum
+    и creation_date, отсортированные так же, как в запросе
+    order_by('-votes_sum', '-creation_date').
+    """
+
+    data = cache.get(CACHE_KEY)
+    count_cache_lookup('trending', data)
+    if data is not None:
+        return data['items']
+
+    items = list(
+        Question.objects.order_by(
+            '-votes_sum', '-creation_date'
+        ).values(*_FIELDS)[:settings.HASKER_TRENDING_SIZE]
+    )
+    _store(items, time.time() + settings.HASKER_TRENDING_TIMEOUT)
+    return items
+
+
+@contextmanager
+def _lock():
+    """Захватывает блокировку списка. Возвращает True, если она
+       захвачена, и False, если не освободилась за _LOCK_WAIT секунд.
+    """
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + _LOCK_WAIT
+    while not cache.add(LOCK_KEY, token, _LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.01)
+    try:
+        yield True
+    finally:
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
+
+
+def update_trending_list(question_id, votes_sum):
+    """Учитывает новую сумму голосов `votes_sum` вопроса `question_id`
+       в закэшированном списке.
+
+    Если списка в кэше нет, ничего не делается: он будет построен
+    при следующем запросе.
+    """
+
+    with _lock() as locked:
+        if locked:
+            _update(question_id, votes_sum)
+        else:
+            cache.delete(CACHE_KEY)
+
+
+def _update(question_id, votes_sum):
+    data = cache.get(CACHE_KEY)
+    if data is None:
+        return
+
+    items = data['items']
+    size = settings.HASKER_TRENDING_SIZE
+    # Если список неполон, в нем уже все вопросы из базы.
+    is_full = len(items) >= size
+
+    old = next((i for i in items if i['id'] == question_id), None)
+    if old is not None:
+        items = [i for i in items if i['id'] != question_id]
+        item = dict(old, votes_sum=votes_sum)
+    else:
+        if is_full and (not items or votes_sum < items[-1]['votes_sum']):
+            return
+        item = Question.objects.filter(
+            id=question_id
+        ).values(*_FIELDS).first()
+        if item is None:
+            return
+        item['votes_sum'] = votes_sum
+
+    items.append(item)
+    items.sort(key=_sort_key, reverse=True)
+
+    dropped = old is not None and votes_sum < old['votes_sum']
+    if is_full and dropped and items[-1] is item:
+        # Вопрос из списка опустился на последнее место: его может
+        # обогнать вопрос, которого в списке нет.
+        cache.delete(CACHE_KEY)
+        return
+
+    _store(items[:size], data['expires'])
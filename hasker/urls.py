@@ -1,19 +1,60 @@
 # -*- coding: utf-8 -*-
 """Маршрутизация URL-ов для приложения."""
 
+from django.conf import settings
 from django.urls import path
 
+from . import api
 from . import views
 from . import rest
+from .async_views import async_view
+from .events import question_events_view
+from .export import export_view
+from .replicas import reads_from_replica
+from .conditional import (
+    api_question_etag, api_question_list_etag,
+    conditional_page,
+    question_etag, question_last_modified,
+    question_list_etag, question_list_last_modified
+)
+
+
+# Декораторы условных GET-запросов (см. модуль conditional).
+question_list_conditional = conditional_page(
+    question_list_etag, question_list_last_modified)
+question_conditional = conditional_page(
+    question_etag, question_last_modified)
+api_question_list_conditional = conditional_page(
+    api_question_list_etag, None)
+api_question_conditional = conditional_page(api_question_etag, None)
+
+
+def read_view(view):
+    """Возвращает обработчик страницы, читающий из реплик базы (см.
+       модуль replicas), в асинхронной версии, если включена
+       настройка HASKER_ASYNC_VIEWS (см. модуль async_views).
+    """
+
+    if settings.HASKER_ASYNC_VIEWS:
+        view = async_view(view)
+    return reads_from_replica(view)
 
 
 urlpatterns = [
-    path('', views.QuestionListView.as_view(), name='index'),
+    path('',
+         read_view(question_list_conditional(
+             views.QuestionListView.as_view())),
+         name='index'),
 
     # Отображение звопроса.
     path('question/<int:question_id>/',
-         views.QuestionView.as_view(),
+         read_view(question_conditional(views.QuestionView.as_view())),
          name='question'),
+    # Поток событий вопроса (под ASGI обслуживается
+    # hasker.events.EventStreamApp).
+    path('question/<int:question_id>/events/',
+         question_events_view,
+         name='question-events'),
     # Голосование за вопрос.
     path('question/<int:question_id>/vote-up/',
          rest.QuestionVoteView.as_view(),
@@ -50,12 +91,36 @@ urlpatterns = [
          name='answer-vote-down',
          kwargs={'is_up': False}),
 
+    # Пакетное голосование за вопросы и ответы.
+    path('votes/', rest.VoteBatchView.as_view(), name='vote-batch'),
+
+    # Подсказка тегов по префиксу.
+    path('tags/autocomplete/',
+         rest.TagAutocompleteView.as_view(),
+         name='tag-autocomplete'),
+
     # Поиск по тексту.
     path('search/',
-         views.SearchListView.as_view(template_name='hasker/search-txt.html'),
+         read_view(views.SearchListView.as_view(
+             template_name='hasker/search-txt.html')),
          name='search'),
     # Поиск по тегу.
     path('tag/<str:tag>/',
-         views.SearchListView.as_view(template_name='hasker/search-tag.html'),
+         read_view(question_list_conditional(views.SearchListView.as_view(
+             template_name='hasker/search-tag.html'))),
          name='search_tag'),
+
+    # JSON API: список вопросов (новые, популярные, по тегу, поиск).
+    path('api/questions/',
+         reads_from_replica(api_question_list_conditional(
+             api.QuestionListApiView.as_view())),
+         name='api-questions'),
+    # JSON API: вопрос со страницей ответов.
+    path('api/questions/<int:question_id>/',
+         reads_from_replica(api_question_conditional(
+             api.QuestionApiView.as_view())),
+         name='api-question'),
+
+    # Выгрузка всех вопросов (только для сотрудников).
+    path('export/questions.jsonl.gz', export_view, name='export'),
 ]
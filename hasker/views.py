@@ -4,44 +4,152 @@
 from django import urls
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.mail import send_mail
 from django.core.paginator import Paginator
-from django.db.models import F, Q, Count, Sum, Value
-from django.db.models.functions import Coalesce
-from django.http import HttpResponseBadRequest, HttpResponseRedirect, Http404
-from django.shortcuts import render, redirect
+from django.db import transaction
+from django.db.models import F
+from django.http import (
+    HttpResponseBadRequest, HttpResponseRedirect, Http404, QueryDict
+)
+from django.shortcuts import get_object_or_404, render, redirect
 from django.template.loader import render_to_string
-from django.utils.html import escape, strip_tags
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.views import View
 from django.views.generic import ListView
 from django.views.generic.edit import CreateView, FormView
 
 from .models import Answer, Question, Tag
+from .autocomplete import tag_index
+from .caching import (
+    cached_html, cached_html_many, get_fragment, get_question_version,
+    get_question_versions, set_fragment
+)
+from .events import publish
 from .forms import AnswerForm, AskForm
+from .mail import queue_mail
+from .metrics import ANSWERS
+from .pagination import KeysetPaginationMixin
+from .search import search_questions
+from .trending import update_trending_list
 
 
 def get_question_list_queryset():
-    """Возвращает запрос списка вопросов с их авторами,
-       подсчетом ответов и голосов.
+    """Возвращает запрос списка вопросов с их авторами и тегами.
+
+    Количество ответов и сумма голосов хранятся в самих вопросах,
+    поэтому агрегировать таблицы ответов и голосов не нужно.
     """
 
     return Question.objects.select_related(
         'author'
     ).prefetch_related(
         'tags'
-    ).annotate(
-        answers_count=Count('answer', distinct=True)
-    ).annotate(
-        votes_sum=Coalesce(
-            Sum('questionvote__vote') * \
-                Count('questionvote__id', distinct=True) / \
-                Count('questionvote__id', distinct=False),
-            Value(0)
+    )
+
+
+# Поля вопроса, которые нужны списку вопросов, когда строки вопросов
+# берутся из кэша: ключ строки и поля сортировки.
+QUESTION_ROW_FIELDS = ('id', 'votes_sum', 'answers_count', 'creation_date')
+
+
+def only_row_fields(queryset):
+    """Ограничивает запрос списка вопросов полями QUESTION_ROW_FIELDS.
+
+    Авторы, теги и тексты загружаются только для строк, которых нет
+    в кэше (см. render_question_rows).
+    """
+
+    return queryset.select_related(None).prefetch_related(None).only(
+        *QUESTION_ROW_FIELDS
+    )
+
+
+def render_question_rows(questions):
+    """Возвращает список HTML строк списка вопросов `questions`.
+
+    Строка кэшируется с версией вопроса, суммой голосов и количеством
+    ответов в ключе: она строится заново, только когда изменился
+    вопрос, его голоса или ответы. Счетчики в ключе учитывают и
+    исправления командой update_counters, которая версий не меняет.
+    Время создания вопроса выводится относительным ("3 days ago")
+    в браузере (static/js/timesince.js), поэтому строка от текущего
+    времени не зависит.
+    """
+
+    versions = get_question_versions([question.id for question in questions])
+    return cached_html_many(
+        _render_question_rows,
+        'question-row',
+        [
+            (question.id, versions[question.id],
+             question.votes_sum, question.answers_count)
+            for question in questions
+        ]
+    )
+
+
+def _render_question_rows(keys):
+    questions = get_question_list_queryset().in_bulk(
+        [question_id for question_id, *_ in keys]
+    )
+    return [
+        render_to_string(
+            'hasker/_question-row.html', {'question': questions[key[0]]}
+        ) if key[0] in questions else ''
+        for key in keys
+    ]
+
+
+class QuestionRowsMixin:
+    """Добавляет в контекст списка вопросов HTML строк вопросов
+       текущей страницы (question_rows, см. render_question_rows).
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['question_rows'] = render_question_rows(
+            context['object_list'])
+        return context
+
+
+NEW_KEYSET_ORDERING = ('-creation_date', '-id')
+HOT_KEYSET_ORDERING = ('-votes_sum', '-creation_date', '-id')
+SEARCH_KEYSET_ORDERING = ('-search_rank',) + HOT_KEYSET_ORDERING
+ANSWER_KEYSET_ORDERING = ('-votes_sum', 'id')
+
+
+def get_search_queryset(text, tag=None):
+    """Возвращает запрос вопросов с тегом `tag` (если задан) или
+       найденных по тексту `text`, упорядоченный по релевантности.
+    """
+
+    queryset = get_question_list_queryset()
+
+    if tag:
+        return queryset.filter(tags__text=tag).order_by(
+            '-votes_sum', '-creation_date'
         )
+
+    return search_questions(queryset, text).order_by(
+        '-search_rank', '-votes_sum', '-creation_date'
     )
 
 
-class QuestionListView(ListView):
+def get_answer_queryset(question_id):
+    """Возвращает запрос ответов на вопрос с их авторами в порядке
+       вывода (см. индекс answer_order_idx).
+    """
+
+    return Answer.objects.filter(
+        question_id=question_id
+    ).select_related(
+        'author', 'author__useravatar'
+    ).order_by(
+        *ANSWER_KEYSET_ORDERING
+    )
+
+
+class QuestionListView(QuestionRowsMixin, KeysetPaginationMixin, ListView):
     """Обработка запроса на вывод списка вопросов.
 
     Список выводится постранично. В зависимости от параметра
@@ -51,7 +159,7 @@ class QuestionListView(ListView):
 
     paginate_by = settings.HASKER_QUESTION_LIST_PAGE
     template_name = 'hasker/index.html'
-    queryset = get_question_list_queryset()
+    queryset = only_row_fields(get_question_list_queryset())
 
     def get_ordering(self):
         if self.is_hot():
@@ -59,95 +167,182 @@ class QuestionListView(ListView):
         else:
             return ['-creation_date', '-votes_sum']
 
+    def get_keyset_ordering(self):
+        return HOT_KEYSET_ORDERING if self.is_hot() else NEW_KEYSET_ORDERING
+
     def is_hot(self):
         return self.request.GET.get('sort', '') == 'hot'
 
 
-class QuestionDetailView(ListView):
+class QuestionDetailView(KeysetPaginationMixin, ListView):
     """Обработка запроса на вывод вопроса и списка ответов.
 
     Список ответов выводится постранично с сортировкой по количеству
-    голосов.
+    голосов. Порядок ответов поддерживается индексом answer_order_idx
+    по (вопрос, сумма голосов, id), а количество ответов берется из
+    поля вопроса answers_count. Поэтому страница ответов читается
+    из индекса без агрегирования и подсчета всех ответов вопроса,
+    а в режиме HASKER_KEYSET_PAGINATION - еще и без OFFSET.
+
+    Заголовок вопроса и страницы ответов кэшируются как готовый HTML
+    с номером версии вопроса в ключе (см. модуль caching). Пока
+    вопрос не изменился, страница анонимному пользователю строится
+    без запросов к базе. Страницы ответов кэшируются отдельно для
+    автора вопроса, которому выводятся элементы пометки верного
+    ответа. Форма ответа и скрипты голосования в кэш не попадают.
     """
 
     paginate_by = settings.HASKER_ANSWER_LIST_PAGE
     template_name = 'hasker/question.html'
 
-    def get_queryset(self):
-        return Answer.objects.filter(
-            question__id=self.kwargs['question_id']
-        ).select_related(
-            'author', 'author__useravatar'
-        ).annotate(
-            votes_sum=Coalesce(Sum('answervote__vote'), Value(0))
-        ).order_by(
-            '-votes_sum'
-        )
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['form'] = AnswerForm()
-
-        questions = Question.objects.filter(
-            id=self.kwargs['question_id']
-        ).select_related(
-            'author'
-        ).prefetch_related(
-            'tags'
-        ).annotate(
-            votes_sum=Coalesce(Sum('questionvote__vote'), Value(0))
+    def get(self, request, question_id):
+        version = get_question_version(question_id)
+
+        question = get_fragment('question', question_id, version)
+        if question is None:
+            question = self.render_question(question_id)
+            set_fragment(question, 'question', question_id, version)
+
+        is_author = request.user.is_authenticated and \
+            request.user.id == question['author_id']
+
+        # Страница входит в ключ кэша, поэтому сразу отбрасываются
+        # значения, которые ListView тоже не принял бы. Строка из
+        # запроса в ключ не попадает: в режиме
+        # HASKER_KEYSET_PAGINATION ключ строится по значениям из
+        # курсора, иначе - по номеру страницы.
+        if settings.HASKER_KEYSET_PAGINATION:
+            page = self.get_keyset_cache_key()
+        else:
+            page = request.GET.get(self.page_kwarg, '1')
+            if page.isdigit():
+                page = str(int(page))
+            elif page != 'last':
+                raise Http404
+
+        answers_html = cached_html(
+            lambda: self.render_answers(question, is_author),
+            'answers', question_id, version, page, int(is_author)
         )
 
-        if not questions:
-            raise Http404
+        return render(request, self.template_name, {
+            'question_id': question_id,
+            'question_html': mark_safe(question['html']),
+            'answers_html': answers_html,
+            'form': AnswerForm(),
+        })
 
-        context['question'] = questions[0]
+    def get_queryset(self):
+        return get_answer_queryset(self.kwargs['question_id'])
+
+    def get_keyset_ordering(self):
+        return ANSWER_KEYSET_ORDERING
+
+    def get_paginator(self, *args, **kwargs):
+        paginator = super().get_paginator(*args, **kwargs)
+        # Paginator.count - cached_property: запрос COUNT не выполняется.
+        paginator.count = self.answers_count
+        return paginator
+
+    def render_question(self, question_id):
+        """Возвращает словарь с HTML заголовка вопроса и полями
+           вопроса, нужными для вывода ответов.
+        """
+
+        question = get_object_or_404(
+            Question.objects.select_related(
+                'author', 'author__useravatar'
+            ).prefetch_related(
+                'tags'
+            ),
+            pk=question_id
+        )
 
-        return context
+        return {
+            'author_id': question.author_id,
+            'accepted_answer_id': question.accepted_answer_id,
+            'answers_count': question.answers_count,
+            'html': render_to_string(
+                'hasker/_question-header.html',
+                {'question': question},
+                self.request
+            ),
+        }
+
+    def render_answers(self, question, is_author):
+        """Возвращает HTML текущей страницы ответов."""
+
+        self.answers_count = question['answers_count']
+        self.object_list = self.get_queryset()
+        # Ссылки на страницы строятся только из номера страницы или
+        # курсора, которые входят в ключ кэша, а не из всего запроса.
+        context = self.get_context_data(
+            accepted_answer_id=question['accepted_answer_id'],
+            is_author=is_author,
+            base_query=QueryDict()
+        )
+        return render_to_string(
+            'hasker/_answer-list.html', context, self.request
+        )
 
 
 class QuestionAnswerView(LoginRequiredMixin, CreateView):
-    """Обработка запроса на создание нового ответа."""
+    """Обработка запроса на создание нового ответа.
+
+    Автору вопроса, если у него есть e-mail, в той же транзакции
+    ставится в очередь письмо о новом ответе (см. модуль mail).
+    """
 
     form_class = AnswerForm
     model = Answer
 
     def form_valid(self, form):
+        question = get_object_or_404(
+            Question.objects.select_related('author'),
+            pk=self.kwargs['question_id']
+        )
+
         self.object = form.save(commit=False)
         self.object.author = self.request.user
-        self.object.question_id=self.kwargs['question_id']
-        self.object.save()
+        self.object.question = question
+
+        with transaction.atomic():
+            self.object.save()
+            Question.objects.filter(
+                id=question.id
+            ).update(
+                answers_count=F('answers_count') + 1
+            )
 
-        # Send e-mail to the question's author if
-        # he/she has an e-mail address.
-        if self.object.question.author.email:
-            self.send_email()
+            # Send e-mail to the question's author if
+            # he/she has an e-mail address.
+            if question.author.email:
+                self.queue_email(question)
 
-        return super().form_valid(form)
+            publish(question.id, 'answer', {'id': self.object.id})
+
+        ANSWERS.inc()
 
         return HttpResponseRedirect(self.get_success_url())
 
-    def send_email(self):
+    def queue_email(self, question):
         answer = self.object
         html_message = render_to_string(
             'hasker/mail-answer.html',
             {
                 'question_url': self.request.build_absolute_uri(
-                    urls.reverse(
-                        'question', args=[answer.question.id])
-                    ),
-                'question_text': answer.question.text,
-                'answer_user': answer.author.username,
+                    urls.reverse('question', args=[question.id])
+                ),
+                'question_text': question.text,
+                'answer_user': self.request.user.username,
                 'answer_text': answer.text
             }
         )
 
-        send_mail(
+        queue_mail(
             subject='Your question has an answer!',
-            message=strip_tags(html_message),
             html_message=html_message,
-            from_email=settings.HASKER_SEND_MAIL_FROM,
-            recipient_list=[answer.question.author.email]
+            recipient_list=[question.author.email]
         )
 
     def get_success_url(self):
@@ -178,16 +373,20 @@ class AskFormView(LoginRequiredMixin, FormView):
 
     template_name = 'hasker/ask.html'
     form_class = AskForm
-    all_tags = Tag.objects.order_by('text')
 
     def form_valid(self, form):
         self.question = form.save(commit=False)
         self.question.author = self.request.user
         self.question.save()
 
+        tags = []
         for tag_text in form.cleaned_data.get('tags'):
             tag, _ = Tag.objects.get_or_create(text=tag_text)
             self.question.tags.add(tag)
+            tags.append(tag.text)
+        tag_index.add(tags)
+
+        update_trending_list(self.question.id, self.question.votes_sum)
 
         return super().form_valid(form)
 
@@ -197,11 +396,12 @@ class AskFormView(LoginRequiredMixin, FormView):
         )
 
 
-class SearchListView(ListView):
+class SearchListView(QuestionRowsMixin, KeysetPaginationMixin, ListView):
     """Обработчик запроса на поиск по тексту.
 
     Поиск производится по тексту заголовка вопроса, тексту вопроса
-    и ответов на вопрос. Если запрос имеет форму "tag: <тег>", из
+    и ответов на вопрос (см. модуль search), результаты сортируются
+    по релевантности. Если запрос имеет форму "tag: <тег>", из
     запроса извлекается имя тега и поиск ведется по тегам.
     """
 
@@ -219,12 +419,10 @@ class SearchListView(ListView):
         return super().get(request)
 
     def get_queryset(self):
-        if self.tag:
-            query = Q(tags__text=self.tag)
-        else:
-            query = Q(title__contains=f'{self.search_text}')
-            query.add(Q(text__contains=f'{self.search_text}'), Q.OR)
+        return only_row_fields(
+            get_search_queryset(self.search_text, self.tag))
 
-        return get_question_list_queryset().filter(query).order_by(
-            '-votes_sum', '-creation_date'
-        )
+    def get_keyset_ordering(self):
+        if self.tag:
+            return HOT_KEYSET_ORDERING
+        return SEARCH_KEYSET_ORDERING
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Прогрев процесса перед обслуживанием запросов.
+
+Под gunicorn --preload приложение загружается в главном процессе, и
+рабочие процессы получают его копию при fork. warm_up выполняет в
+главном процессе то, что иначе делал бы первый запрос каждого
+рабочего процесса:
+
+    urls: импорт всех обработчиков и построение таблиц URL-ов,
+        обращение reverse ко всем именам URL-ов
+    translations: загрузка каталогов переводов
+    templates: загрузка библиотек тегов и компиляция всех шаблонов
+        (при DEBUG=False скомпилированные шаблоны остаются в кэше
+        загрузчика cached.Loader)
+    caches: заполнение индекса тегов (см. модуль autocomplete) и
+        списка вопросов "в тренде" (см. модуль trending)
+
+Соединения с базой после прогрева закрываются: открытое соединение
+не должно достаться нескольким процессам после fork. Рабочие
+процессы открывают свои соединения сами.
+
+Каждый этап возвращает количество обработанных объектов и ошибок;
+ошибка одного объекта (например, шаблон, который не компилируется
+отдельно) не прерывает прогрев. Ошибка базы данных (база недоступна
+при запуске) прерывает только свой этап: она выводится в журнал и
+учитывается как ошибка этапа, а gunicorn продолжает запуск.
+
+Example:
+    report = warm_up()
+    for line in format_report(report):
+        print(line)
+"""
+
+import logging
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import NoReverseMatch, get_resolver, reverse
+from django.urls.converters import IntConverter
+from django.utils import translation
+
+from .autocomplete import tag_index
+from .trending import get_trending_list
+
+
+logger = logging.getLogger(__name__)
+
+Stage = namedtuple('Stage', ['name', 'count', 'errors', 'seconds'])
+
+
+def _url_names(resolver, namespace=''):
+    """Перебирает тройки (имя URL-а с пространством имен, имена
+       параметров, конвертеры параметров) для всех вариантов URL-ов
+       `resolver`.
+    """
+
+    for name in resolver.reverse_dict:
+        if not isinstance(name, str):
+            continue
+        for possibility, *_, converters in resolver.reverse_dict.getlist(name):
+            for _, params in possibility:
+                yield namespace + name, params, converters
+
+    for prefix, (_, child) in resolver.namespace_dict.items():
+        yield from _url_names(child, f'{namespace}{prefix}:')
+
+
+def _sample_value(converter):
+    return 1 if isinstance(converter, IntConverter) else 'a'
+
+
+def warm_urls():
+    """Строит таблицы URL-ов и вызывает reverse для всех имен.
+
+    Возвращает (количество имен, количество ошибок).
+    """
+
+    count = 0
+    for name, params, converters in _url_names(get_resolver()):
+        kwargs = {
+            param: _sample_value(converters.get(param)) for param in params
+        }
+        try:
+            reverse(name, kwargs=kwargs)
+        except NoReverseMatch:
+            # Параметр задан регулярным выражением, которому пробное
+            # значение не подходит. Таблицы URL-ов уже построены.
+            pass
+        count += 1
+    return count, 0
+
+
+def warm_translations():
+    """Загружает каталоги переводов языка по умолчанию.
+
+    Возвращает (количество языков, количество ошибок).
+    """
+
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+    return 1, 0
+
+
+def _template_names(engine):
+    """Перебирает имена шаблонов во всех каталогах шаблонизатора."""
+
+    loaders = []
+    for loader in engine.template_loaders:
+        loaders.extend(getattr(loader, 'loaders', [loader]))
+
+    seen = set()
+    for loader in loaders:
+        for directory in loader.get_dirs():
+            directory = str(directory)
+            for root, _, files in os.walk(directory):
+                for filename in sorted(files):
+                    name = os.path.relpath(
+                        os.path.join(root, filename), directory
+                    ).replace(os.sep, '/')
+                    if name not in seen:
+                        seen.add(name)
+                        yield name
+
+
+def warm_templates():
+    """Компилирует все шаблоны шаблонизаторов Django.
+
+    Возвращает (количество шаблонов, количество ошибок).
+    """
+
+    count = errors = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in _template_names(backend.engine):
+            try:
+                backend.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                errors += 1
+            count += 1
+    return count, errors
+
+
+def warm_caches():
+    """Заполняет индекс тегов и список вопросов "в тренде".
+
+    Возвращает (количество заполненных кэшей, количество ошибок).
+    """
+
+    tag_index.suggest('', 0)
+    get_trending_list()
+    return 2, 0
+
+
+STAGES = [
+    ('urls', warm_urls),
+    ('translations', warm_translations),
+    ('templates', warm_templates),
+    ('caches', warm_caches),
+]
+
+
+def warm_up():
+    """Выполняет все этапы прогрева. Возвращает список Stage."""
+
+    report = []
+    try:
+        for name, stage in STAGES:
+            start = time.perf_counter()
+            try:
+                count, errors = stage()
+            except DatabaseError:
+                logger.exception('Warm-up stage %s failed', name)
+                count, errors = 0, 1
+            report.append(
+                Stage(name, count, errors, time.perf_counter() - start))
+    finally:
+        connections.close_all()
+    return report
+
+
+def format_report(report):
+    """Возвращает строки отчета о прогреве `report`."""
+
+    lines = [
+        f'{stage.name}: {stage.count} in {stage.seconds * 1000:.1f} ms'
+        + (f' ({stage.errors} failed)' if stage.errors else '')
+        for stage in report
+    ]
+    total = sum(stage.seconds for stage in report)
+    lines.append(f'total: {total * 1000:.1f} ms')
+    return lines
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Настройки ASGI для проекта.
+
+Кроме приложения Django обслуживает потоки событий вопросов
+(см. hasker.events). Страницы вопросов и поиска обслуживаются
+асинхронными обработчиками (см. hasker.async_views).
+
+Детали:
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+
+from stackoverflow.handlers import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stackoverflow.settings')
+os.environ.setdefault('HASKER_ASYNC_VIEWS', 'True')
+
+# То же, что get_asgi_application, но с обработчиком, который отдает
+# асинхронные потоковые ответы (см. stackoverflow.handlers).
+django.setup(set_prefix=False)
+django_application = ASGIHandler()
+
+# Импорт после настройки Django: модулю нужны настройки и приложения.
+from hasker.events import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Обработчик ASGI с поддержкой асинхронных потоковых ответов.
+
+Под ASGI Django 3.2 перебирает содержимое StreamingHttpResponse
+обычным циклом for прямо в цикле событий, поэтому генератор ответа
+не может обращаться к базе. ASGIHandler дополнительно отдает
+AsyncStreamingHttpResponse, содержимое которого - асинхронный
+итератор: итератор получает данные через sync_to_async, а цикл
+событий в это время обслуживает другие соединения (так потоковые
+ответы работают в Django 4.2).
+
+Example:
+    response = AsyncStreamingHttpResponse(aiter_chunks())
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.http import StreamingHttpResponse
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """Потоковый ответ с асинхронным итератором `streaming_content`.
+
+    Отдается только обработчиком ASGIHandler этого модуля.
+    """
+
+    is_async = True
+
+    @property
+    def streaming_content(self):
+        async def make_bytes():
+            async for part in self._iterator:
+                yield self.make_bytes(part)
+
+        return make_bytes()
+
+    @streaming_content.setter
+    def streaming_content(self, value):
+        self._iterator = value.__aiter__()
+
+    def __iter__(self):
+        raise TypeError(
+            'AsyncStreamingHttpResponse can only be served by '
+            'stackoverflow.handlers.ASGIHandler.')
+
+    async def aclose_iterator(self):
+        """Закрывает итератор содержимого, если он не был дочитан
+           (например, клиент отключился).
+        """
+
+        aclose = getattr(self._iterator, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """ASGIHandler, отдающий и AsyncStreamingHttpResponse."""
+
+    async def send_response(self, response, send):
+        if not getattr(response, 'is_async', False):
+            return await super().send_response(response, send)
+
+        # Заголовки - как в ASGIHandler.send_response.
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            header = cookie.output(header='').encode('ascii').strip()
+            response_headers.append((b'Set-Cookie', header))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+
+        try:
+            async for part in response.streaming_content:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            await response.aclose_iterator()
+            await sync_to_async(response.close, thread_sensitive=True)()
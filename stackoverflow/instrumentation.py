@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Замеры SQL-запросов и построения шаблонов для каждого запроса.
+
+InstrumentationMiddleware подключает к соединениям с базой обертку
+execute_wrapper и считает количество SQL-запросов, их общее время и
+самый медленный запрос. InstrumentedTemplates - шаблонизатор Django,
+который дополнительно замеряет время построения шаблонов. Результат
+выдается в заголовке ответа Server-Timing и строкой JSON в журнал
+'stackoverflow.instrumentation'.
+
+Замеры включаются настройкой HASKER_INSTRUMENTATION. Если она
+выключена, middleware не подключается (MiddlewareNotUsed), а
+шаблонизатор только проверяет, что замер не идет.
+"""
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('instrumentation_stats', default=None)
+
+# Максимальная длина текста SQL-запроса в журнале.
+_SQL_LOG_LENGTH = 500
+
+
+class RequestStats:
+    """Замеры одного запроса.
+
+    Объект служит оберткой для connection.execute_wrapper.
+    """
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if duration >= self.slowest_time:
+                self.slowest_time = duration
+                self.slowest_sql = sql
+
+    def server_timing(self, total):
+        """Возвращает значение заголовка Server-Timing."""
+
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'db-slowest;dur={self.slowest_time * 1000:.1f}',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    def as_dict(self, total):
+        return {
+            'view': self.view,
+            'duration_ms': round(total * 1000, 1),
+            'db_queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'slowest_sql': self.slowest_sql[:_SQL_LOG_LENGTH]
+            if self.slowest_sql else None,
+            'slowest_ms': round(self.slowest_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+        }
+
+
+def current_stats():
+    """Возвращает RequestStats текущего запроса или None, если замер
+       не идет.
+
+    Обработчики, которые выполняются в других потоках (см.
+    hasker.async_views), подключают его к соединениям своего потока.
+    """
+
+    return _current.get()
+
+
+class InstrumentationMiddleware:
+    """Middleware, замеряющий SQL-запросы и шаблоны каждого запроса.
+
+    Должен быть первым в списке MIDDLEWARE, чтобы в замер попали
+    запросы остальных middleware (например, чтение сессии).
+    """
+
+    def __init__(self, get_response):
+        if not settings.HASKER_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = stats.server_timing(total)
+
+        record = stats.as_dict(total)
+        record.update({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        })
+        logger.info(json.dumps(record))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current.get()
+        if stats is not None and request.resolver_match:
+            stats.view = request.resolver_match.view_name
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Шаблонизатор Django с замером времени построения шаблонов.
+
+    Замеряется построение шаблонов верхнего уровня (render,
+    render_to_string, TemplateResponse). Вложенные шаблоны (include,
+    inclusion-теги) входят во время шаблона, из которого они вызваны.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class InstrumentedTemplate:
+    """Обертка шаблона, замеряющая время его построения."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None or stats.rendering:
+            return self.template.render(context, request)
+
+        stats.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.rendering = False
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Middleware проекта."""
+
+import asyncio
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware с поддержкой асинхронного режима.
+
+    WhiteNoise 5 поддерживает только синхронный режим. Под ASGI из-за
+    него вся цепочка middleware переводилась бы в синхронный режим, и
+    асинхронные обработчики вызывались бы через async_to_sync.
+    Статический файл ищется в словаре в памяти, поэтому поиск
+    выполняется прямо в цикле событий.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self._async = asyncio.iscoroutinefunction(get_response)
+        if self._async:
+            # Признак, по которому Django определяет асинхронный
+            # middleware (см. django.utils.deprecation.MiddlewareMixin).
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
@@ -28,6 +28,14 @@ DEBUG = env('DEBUG')
 LOGIN_URL = '/hasker/login'
 LOGIN_REDIRECT_URL = '/hasker'
 
+# ModelBackend that loads the user's avatar in the same query. New
+# logins use it; ModelBackend stays so that sessions created before it
+# was added (they store the backend path) remain valid.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.UserAvatarBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
 
 # Application definition
@@ -44,8 +52,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stackoverflow.instrumentation.InstrumentationMiddleware',
+    'hasker.metrics.MetricsMiddleware',
+    'hasker.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'stackoverflow.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,7 +69,9 @@ ROOT_URLCONF = 'stackoverflow.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render time measurement
+        # (see HASKER_INSTRUMENTATION)
+        'BACKEND': 'stackoverflow.instrumentation.InstrumentedTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,13 +88,71 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'stackoverflow.wsgi.application'
 
+# Logging
+# https://docs.djangoproject.com/en/3.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'stackoverflow.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
 DATABASES = {'default': env.db('DATABASE_URL')}
 
+# Read replicas: REPLICA_URL is one or more comma-separated database
+# URLs (see hasker.replicas). Tests read replicas from the default test
+# database.
+HASKER_DATABASE_REPLICAS = []
+for number, url in enumerate(env.list('REPLICA_URL', default=[]), 1):
+    DATABASES[f'replica{number}'] = env.db_url_config(url)
+    DATABASES[f'replica{number}']['TEST'] = {'MIRROR': 'default'}
+    HASKER_DATABASE_REPLICAS.append(f'replica{number}')
+
+# Replica for hasker/tests/test_replicas.py: REPLICA_TEST_DB is a SQLite
+# file name (set by CI). The replica does not mirror the default database,
+# so a test can tell which database a page was read from; without it
+# those tests are skipped. Tables are created from models: data
+# migrations only write to the default database.
+REPLICA_TEST_DB = env('REPLICA_TEST_DB', default='')
+if REPLICA_TEST_DB:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_TEST_DB,
+        'TEST': {'NAME': REPLICA_TEST_DB, 'MIGRATE': False},
+    }
+
+DATABASE_ROUTERS = ['hasker.replicas.PrimaryReplicaRouter']
+# Seconds a user reads from the primary database after a write. Also
+# the TTL of fragments rendered from replica data: a lagging replica
+# could render stale HTML under a fresh question version, so with
+# replicas most fragments live this long instead of
+# HASKER_QUESTION_CACHE_TIMEOUT (see README).
+HASKER_REPLICA_STICKY_SECONDS = 10
+
 DEFAULT_AUTO_FIELD='django.db.models.AutoField'
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# The local memory cache is per-process: use a shared cache
+# (memcached, redis, database) when running several workers.
+
+CACHES = {'default': env.cache('CACHE_URL', default='locmemcache://')}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -128,6 +199,49 @@ vars().update(EMAIL_CONFIG)
 HASKER_QUESTION_LIST_PAGE = 20  # Question list page size
 HASKER_ANSWER_LIST_PAGE = 25    # Answers list page size
 HASKER_TRENDING_SIZE = 5        # Trending list size
+HASKER_TRENDING_TIMEOUT = 300   # Trending list cache TTL, seconds
+HASKER_TAG_AUTOCOMPLETE_SIZE = 10   # Max tags in autocomplete response
+HASKER_QUESTION_CACHE_TIMEOUT = 3600  # Question page fragments TTL, seconds
+HASKER_VOTE_BATCH_SIZE = 100    # Max operations in a batch vote request
+
+# Question events (server-sent events, ASGI only): keep-alive comment
+# interval and client reconnect delay in seconds, per-connection queue
+HASKER_EVENTS_KEEPALIVE = 15
+HASKER_EVENTS_RETRY = 5
+HASKER_EVENTS_QUEUE_SIZE = 100
+
+# Avatar thumbnails: square sizes in pixels (twice the CSS size for
+# high-DPI screens) and image format ('WEBP' or 'JPEG')
+HASKER_AVATAR_SIZES = {'small': 50, 'large': 100}
+HASKER_AVATAR_FORMAT = 'WEBP'
+# Failed thumbnail builds per avatar before it is skipped (corrupt or
+# oversized uploads would otherwise be retried on every pass)
+HASKER_AVATAR_MAX_ATTEMPTS = 3
+# Browser/proxy cache lifetime of uploaded files, seconds. The files
+# are stored under content hashes and never change.
+HASKER_MEDIA_MAX_AGE = 365 * 24 * 3600
+
+# Per-request SQL and template timings in the Server-Timing header and
+# the 'stackoverflow.instrumentation' log
+HASKER_INSTRUMENTATION = env.bool('HASKER_INSTRUMENTATION', default=False)
+
+# Prometheus metrics at /metrics (see hasker.metrics)
+HASKER_METRICS = env.bool('HASKER_METRICS', default=False)
+
+# Async read views running in a bounded thread pool (enabled by
+# stackoverflow/asgi.py, see hasker.async_views)
+HASKER_ASYNC_VIEWS = env.bool('HASKER_ASYNC_VIEWS', default=False)
+HASKER_ASYNC_THREADS = env.int('HASKER_ASYNC_THREADS', default=8)
+
+# Keyset (cursor) pagination of question lists instead of page numbers
+HASKER_KEYSET_PAGINATION = env.bool('HASKER_KEYSET_PAGINATION', default=False)
 
 # Sending e-mail "from" address
 HASKER_SEND_MAIL_FROM = "hasker-admin@hasker.com"
+# Outgoing e-mail queue: attempts per e-mail and first retry delay
+# in seconds (doubled on every next attempt)
+HASKER_MAIL_MAX_ATTEMPTS = 5
+HASKER_MAIL_RETRY_DELAY = 60
+# Seconds a claimed batch of e-mails is hidden from other queue
+# workers; unsent e-mails are retried after it expires
+HASKER_MAIL_LEASE = 600
@@ -5,10 +5,12 @@
 https://docs.djangoproject.com/en/3.1/topics/http/urls/
 """
 
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from hasker.metrics import metrics_view
+from users.views import serve_media
+
 from . import settings
 
 
@@ -16,4 +18,13 @@ urlpatterns = [
     path('hasker/', include('hasker.urls')),
     path('users/', include('users.urls')),
     path('admin/', admin.site.urls),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Метрики в формате Prometheus.
+    path('metrics', metrics_view, name='metrics'),
+]
+
+if settings.DEBUG:
+    # Загруженные файлы с неизменяемыми (по хэшу содержимого) именами.
+    # В рабочем режиме MEDIA_ROOT отдает веб-сервер или CDN.
+    urlpatterns.append(
+        path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', serve_media,
+             name='media'))
@@ -1,5 +1,7 @@
 // Подключает "autocomplete" к полю ввода `inp`.
-// Для "подсказок" используется список строк `arr`.
+// Для "подсказок" используется список строк `arr` или функция
+// `arr(text, callback)`, передающая в `callback` список подсказок
+// для введенного текста (см. remoteSuggestions).
 function autocomplete(inp, arr, getTextFunc, setTextFunc) {
   // На каком элементе списка находится фокус.
   var currentFocus;
@@ -23,43 +25,59 @@ function autocomplete(inp, arr, getTextFunc, setTextFunc) {
   // Обработчик ввода текста в поле.
   inp.addEventListener("input", function(e) {
     var text = getTextFunc(e.target);
-    if (!text)
-      return false;
 
     closeAllMenus();
 
-    currentFocus = -1;
+    if (!text)
+      return false;
 
-    var items = [];
-    for (i = 0; i < arr.length; i++) {
-      // Заполняем массив `items` элементами,
-      // начало которых совпадает с введенным текстом.
-      var prefix = arr[i].substr(0, text.length);
-      if (prefix.toUpperCase() == text.toUpperCase()) {
-        items.push(arr[i]);
+    if (typeof arr === "function") {
+      arr(text, function(items) {
+        // Пока ждали ответа, текст мог измениться.
+        if (getTextFunc(inp) === text)
+          showMenu(text, items);
+      });
+    } else {
+      var items = [];
+      for (i = 0; i < arr.length; i++) {
+        // Заполняем массив `items` элементами,
+        // начало которых совпадает с введенным текстом.
+        var prefix = arr[i].substr(0, text.length);
+        if (prefix.toUpperCase() == text.toUpperCase()) {
+          items.push(arr[i]);
+        }
       }
+      showMenu(text, items);
     }
+  });
+
+  // Создает выпадающее меню с элементами `items`.
+  function showMenu(text, items) {
+    closeAllMenus();
+
+    currentFocus = -1;
 
     if (items.length == 0)
-        return false;
+        return;
 
     // Создаем выпадающее меню.
     menuList = document.createElement("ul");
     menuList.setAttribute("class", "dropdown-menu");
-    menuList.setAttribute("id", this.id + "-dropdown-menu");
+    menuList.setAttribute("id", inp.id + "-dropdown-menu");
 
-    this.parentNode.insertBefore(menuList, this.nextSibling);
+    inp.parentNode.insertBefore(menuList, inp.nextSibling);
 
     for (i = 0; i < items.length; i++) {
       // Заполняем выпадающее меню.
-      var prefix = items[i].substr(0, text.length);
-
       menuItem = document.createElement("li");
       menuItem.setAttribute("class", "dropdown-item");
       menuItem.setAttribute("value", items[i]);
 
-      menuItem.innerHTML = "<strong>" + prefix + "</strong>";
-      menuItem.innerHTML += items[i].substr(text.length);
+      var strong = document.createElement("strong");
+      strong.textContent = items[i].substr(0, text.length);
+      menuItem.appendChild(strong);
+      menuItem.appendChild(
+        document.createTextNode(items[i].substr(text.length)));
 
       menuItem.addEventListener("click", function(e) {
         // При клике по элементу, переносим его содержимое
@@ -72,7 +90,7 @@ function autocomplete(inp, arr, getTextFunc, setTextFunc) {
     }
 
     menuList.style.display = "block";
-  });
+  }
 
   // Обработчик нажатия кнопок в поле ввода.
   inp.addEventListener("keydown", function(e) {
@@ -168,3 +186,20 @@ function setCurrentTagText(ctrl, value) {
 
   ctrl.value = head + value + tail;
 }
+
+// Возвращает функцию для autocomplete, запрашивающую подсказки
+// у сервера по адресу `url` (параметр запроса `q` - введенный текст).
+function remoteSuggestions(url) {
+  return function(text, callback) {
+    fetch(url + "?q=" + encodeURIComponent(text), {
+          credentials: "same-origin",
+          headers: {'Accept': 'application/json'}})
+      .then(response => {
+        if (!response.ok)
+          throw Error(response);
+        return response.json();
+      })
+      .then(data => callback(data.tags))
+      .catch(error => { console.log(error);/* do nothing on error */ });
+  };
+}
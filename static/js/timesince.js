@@ -0,0 +1,53 @@
+// Единицы времени для timesince: длительность в секундах и название.
+const TIMESINCE_CHUNKS = [
+  [60 * 60 * 24 * 365, 'year'],
+  [60 * 60 * 24 * 30, 'month'],
+  [60 * 60 * 24 * 7, 'week'],
+  [60 * 60 * 24, 'day'],
+  [60 * 60, 'hour'],
+  [60, 'minute'],
+];
+
+// Возвращает количество count единиц name: "1 day", "2 days".
+function pluralizeTime(count, name) {
+  return count + ' ' + name + (count === 1 ? '' : 's');
+}
+
+// Возвращает время, прошедшее от date до now (в миллисекундах),
+// так же, как фильтр timesince Django: "3 days, 2 hours".
+function timesince(date, now) {
+  const seconds = Math.floor((now - date) / 1000);
+
+  for (let i = 0; i < TIMESINCE_CHUNKS.length; i++) {
+    const [size, name] = TIMESINCE_CHUNKS[i];
+    const count = Math.floor(seconds / size);
+    if (count <= 0) {
+      continue;
+    }
+
+    let result = pluralizeTime(count, name);
+    if (i + 1 < TIMESINCE_CHUNKS.length) {
+      const [nextSize, nextName] = TIMESINCE_CHUNKS[i + 1];
+      const nextCount = Math.floor((seconds - count * size) / nextSize);
+      if (nextCount > 0) {
+        result += ', ' + pluralizeTime(nextCount, nextName);
+      }
+    }
+    return result;
+  }
+
+  return pluralizeTime(0, 'minute');
+}
+
+// Заменяет текст тегов <time class="timesince" datetime="..."> на
+// время, прошедшее с момента datetime: "3 days, 2 hours ago".
+// Без скрипта в тегах остается абсолютная дата.
+function showTimesince() {
+  const now = Date.now();
+  for (const element of document.querySelectorAll('time.timesince')) {
+    const date = Date.parse(element.dateTime);
+    if (!isNaN(date)) {
+      element.textContent = timesince(date, now) + ' ago';
+    }
+  }
+}
@@ -124,3 +124,31 @@ function setAnswersVotesHandler(urlVoteUp, urlVoteDown, isAuth) {
     }
   );
 }
+
+// Подписка на события вопроса (server-sent events): обновляет суммы
+// голосов и показывает уведомление о новых ответах и смене верного
+// ответа.
+// url - адрес потока событий вопроса
+function subscribeQuestionEvents(url) {
+  if (!window.EventSource)
+    return;
+
+  const source = new EventSource(url);
+
+  source.addEventListener("vote", e => {
+    const data = JSON.parse(e.data);
+    if (data.target === "question") {
+      document.getElementById("votes-num").textContent = data.votes;
+    } else {
+      const counter = document.querySelector(
+        '.votes-num[data-answer-id="' + data.id + '"]');
+      if (counter)
+        counter.textContent = data.votes;
+    }
+  });
+
+  const showUpdates = () =>
+    document.getElementById("question-updates").classList.remove("d-none");
+  source.addEventListener("answer", showUpdates);
+  source.addEventListener("solution", showUpdates);
+}
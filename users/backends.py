@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Бэкенд аутентификации, загружающий пользователя вместе с аватаркой.
+
+AuthenticationMiddleware получает пользователя запроса через
+get_user бэкенда, которым пользователь вошел. Каждая страница
+аутентифицированного пользователя выводит его аватарку (base.html),
+поэтому UserAvatar загружается тем же запросом, что и User.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class UserAvatarBackend(ModelBackend):
+    """ModelBackend, у которого get_user загружает и UserAvatar."""
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related(
+                'useravatar'
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
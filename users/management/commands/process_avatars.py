@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Команда построения уменьшенных копий аватарок."""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.thumbnails import process_avatars
+
+
+class Command(BaseCommand):
+    help = 'Builds thumbnails for uploaded avatars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Number of avatars processed per pass.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep processing new avatars instead of exiting.')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to sleep when nothing is left or a pass had '
+                 'failures (with --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = process_avatars(options['batch_size'])
+            if done or failed:
+                self.stdout.write(
+                    f'Processed {done}, failed {failed} avatar(s).')
+
+            # Неудачные аватарки повторяются не сразу, а после паузы.
+            if done < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.2 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useravatar',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.2 on 2026-10-17 22:22
+
+from django.db import migrations, models
+import users.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_useravatar_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useravatar',
+            name='avatar',
+            field=models.ImageField(blank=True, storage=users.storage.ContentAddressedStorage(), upload_to='avatars'),
+        ),
+    ]
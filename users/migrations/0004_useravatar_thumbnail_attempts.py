@@ -0,0 +1,18 @@
+# Generated by Django 3.2.2 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_avatar_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useravatar',
+            name='thumbnail_attempts',
+            field=models.SmallIntegerField(default=0),
+        ),
+    ]
@@ -4,37 +4,95 @@
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from django.templatetags.static import static
 
+from .storage import ContentAddressedStorage
+
+
+# Сигнал об изменении картинки аватарки или готовности ее уменьшенных
+# копий, то есть URL-ов аватарки. Параметр: user_id.
+avatar_changed = Signal()
+
+
 class UserAvatar(models.Model):
     """Модель для хранения аватарки пользоывателя.
 
     Класс связан отношением one-to-one со стандартным классом User.
+
+    Поля:
+        avatar: загруженная пользователем картинка (хранится под
+            именем по хэшу содержимого, см. модуль storage)
+        thumbnails_ready: для картинки построены уменьшенные копии
+            размеров HASKER_AVATAR_SIZES (см. модуль thumbnails)
+        thumbnail_attempts: количество неудачных попыток построить
+            копии (после HASKER_AVATAR_MAX_ATTEMPTS попыток картинка
+            больше не обрабатывается)
     """
 
-    avatar = models.ImageField(blank=True, upload_to='avatars')
+    avatar = models.ImageField(
+        blank=True, upload_to='avatars', storage=ContentAddressedStorage())
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    thumbnails_ready = models.BooleanField(default=False)
+    thumbnail_attempts = models.SmallIntegerField(default=0)
+
+    def avatar_url(self, size=None):
+        """Возвращает URL аватарки.
+
+        Параметры:
+            size: имя размера из HASKER_AVATAR_SIZES ('small',
+                'large') или None - оригинал. Пока уменьшенные копии
+                не построены, возвращается URL оригинала.
+        """
 
-    @property
-    def avatar_url(self):
-        if self.avatar:
-            return self.avatar.url
-        return static('img/no-avatar.png')
+        if not self.avatar:
+            return static('img/no-avatar.png')
+        if size is not None and self.thumbnails_ready:
+            from .thumbnails import thumbnail_name
+            return self.avatar.storage.url(
+                thumbnail_name(self.avatar.name, size)
+            )
+        return self.avatar.url
+
+    def set_avatar(self, avatar):
+        """Заменяет картинку аватарки на `avatar` (значение поля
+           формы). Если картинка изменилась, копии строятся заново.
+
+        Возвращает True, если картинка изменилась и аватарку нужно
+        сохранить.
+        """
+
+        if self.avatar != avatar:
+            self.avatar = avatar
+            self.thumbnails_ready = False
+            self.thumbnail_attempts = 0
+            return True
+        return False
 
     def __str__(self):
         return self.user.username
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def update_useravatar_signal(sender, instance, created, **kwargs):
+def create_useravatar_signal(sender, instance, created, **kwargs):
     """Перехватчик создания модели User.
 
     При создании новой модели User для нее создается экземпляр
-    модели UserAvatar.
+    модели UserAvatar. Изменения аватарки сохраняются отдельно
+    (см. UserAvatar.set_avatar), поэтому сохранение существующего
+    пользователя аватарку не трогает.
     """
 
     if created:
         UserAvatar.objects.create(user=instance)
-    instance.useravatar.save()
+
+
+@receiver(post_save, sender=UserAvatar)
+def avatar_saved_signal(sender, instance, created, **kwargs):
+    """Перехватчик сохранения модели UserAvatar: отправляет сигнал
+       avatar_changed (новой аватарке он не нужен).
+    """
+
+    if not created:
+        avatar_changed.send(sender=UserAvatar, user_id=instance.user_id)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Хранилище файлов с именами по хэшу содержимого.
+
+Файл сохраняется под именем, составленным из SHA-256 его содержимого,
+а не из имени, выбранного пользователем. Одинаковые файлы разных
+пользователей хранятся один раз. Содержимое файла по данному URL
+никогда не меняется, поэтому URL можно кэшировать в браузерах и
+прокси навсегда (см. users.views.serve_media).
+"""
+
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+class _AlreadyStored(Exception):
+    """Файл с таким именем (а значит, и содержимым) уже сохранен."""
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище в MEDIA_ROOT с именами файлов по хэшу содержимого.
+
+    Каталог и расширение берутся из исходного имени:
+    'avatars/Me.PNG' -> 'avatars/<sha256>.png'.
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest.hexdigest() + extension)
+        return self.save_as(name, content, max_length)
+
+    def save_as(self, name, content, max_length=None):
+        """Сохраняет файл под именем `name`, если такого файла еще нет.
+
+        Используется для файлов, имя которых уже определяется
+        содержимым, например, для уменьшенных копий аватарок.
+        """
+
+        try:
+            return super().save(name, content, max_length)
+        except _AlreadyStored:
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        """Вместо подбора свободного имени сообщает, что файл уже есть.
+
+        Вызывается и перед записью, и при FileExistsError, если файл
+        с тем же именем одновременно записал другой процесс. Имя
+        определяется содержимым, поэтому такая запись - успех, а не
+        повод сохранить копию под именем с суффиксом.
+        """
+
+        if self.exists(name):
+            raise _AlreadyStored(name)
+        return super().get_available_name(name, max_length)
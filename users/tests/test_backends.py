@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Тесты для бэкенда аутентификации."""
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from users.backends import UserAvatarBackend
+
+
+class UserAvatarBackendTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            'john', 'john@example.com', '123')
+
+    def test_get_user_with_avatar(self):
+        with self.assertNumQueries(1):
+            user = UserAvatarBackend().get_user(self.user.id)
+            self.assertIn('no-avatar', user.useravatar.avatar_url('large'))
+
+    def test_missing_or_inactive_user(self):
+        self.assertIsNone(UserAvatarBackend().get_user(self.user.id + 1))
+
+        User.objects.filter(pk=self.user.id).update(is_active=False)
+        self.assertIsNone(UserAvatarBackend().get_user(self.user.id))
+
+    def test_login(self):
+        self.assertTrue(self.client.login(username='john', password='123'))
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(self.user, response.context['user'])
+        self.assertContains(response, 'no-avatar')
+
+        session = self.client.session
+        self.assertEqual(
+            'users.backends.UserAvatarBackend', session[BACKEND_SESSION_KEY])
+
+    def test_session_with_model_backend(self):
+        # Сессия, созданная до подключения UserAvatarBackend.
+        self.client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend')
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(self.user, response.context['user'])
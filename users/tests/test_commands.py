@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Тесты для команд manage.py."""
+
+import io
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from users import models
+from users.thumbnails import process_avatars, thumbnail_name
+
+
+def make_image(name='avatar.png', size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(
+    HASKER_AVATAR_SIZES={'small': 50, 'large': 100},
+    HASKER_AVATAR_FORMAT='WEBP'
+)
+class ProcessAvatarsTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user('john', 'john@example.com', '123')
+        self.user.useravatar.set_avatar(make_image())
+        self.user.useravatar.save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_thumbnails(self):
+        useravatar = models.UserAvatar.objects.get(user=self.user)
+        self.assertFalse(useravatar.thumbnails_ready)
+        self.assertEqual(useravatar.avatar.url, useravatar.avatar_url('small'))
+
+        call_command('process_avatars', stdout=io.StringIO())
+
+        useravatar = models.UserAvatar.objects.get(user=self.user)
+        self.assertTrue(useravatar.thumbnails_ready)
+        for size, pixels in (('small', 50), ('large', 100)):
+            name = thumbnail_name(useravatar.avatar.name, size)
+            self.assertTrue(useravatar.avatar_url(size).endswith(
+                name.split('/')[-1]))
+            with useravatar.avatar.storage.open(name) as thumbnail:
+                image = Image.open(thumbnail)
+                self.assertEqual('WEBP', image.format)
+                self.assertEqual((pixels, pixels), image.size)
+
+        # Оригинал не изменяется.
+        self.assertEqual(useravatar.avatar.url, useravatar.avatar_url())
+
+    def test_thumbnails_send_avatar_changed(self):
+        received = []
+
+        def receiver(sender, user_id, **kwargs):
+            received.append(user_id)
+
+        models.avatar_changed.connect(receiver)
+        try:
+            call_command('process_avatars', stdout=io.StringIO())
+        finally:
+            models.avatar_changed.disconnect(receiver)
+        self.assertEqual([self.user.id], received)
+
+    def test_new_avatar_resets_thumbnails(self):
+        call_command('process_avatars', stdout=io.StringIO())
+
+        useravatar = models.UserAvatar.objects.get(user=self.user)
+        useravatar.set_avatar(useravatar.avatar)
+        self.assertTrue(useravatar.thumbnails_ready)
+
+        useravatar.set_avatar(make_image('other.png'))
+        self.assertFalse(useravatar.thumbnails_ready)
+
+    @override_settings(HASKER_AVATAR_MAX_ATTEMPTS=2)
+    def test_failed_avatar_skipped(self):
+        self.user.useravatar.set_avatar(
+            SimpleUploadedFile('bad.png', b'not an image', 'image/png'))
+        self.user.useravatar.save()
+        other = User.objects.create_user('jane', 'jane@example.com', '123')
+        other.useravatar.set_avatar(make_image('other.png'))
+        other.useravatar.save()
+
+        # Испорченная аватарка - первая в очереди.
+        with self.assertLogs('users.thumbnails', 'ERROR'):
+            for _ in range(2):
+                self.assertEqual((0, 1), process_avatars(1))
+        self.assertEqual((1, 0), process_avatars(1))
+        self.assertEqual((0, 0), process_avatars(1))
+
+        useravatar = models.UserAvatar.objects.get(user=self.user)
+        self.assertEqual(2, useravatar.thumbnail_attempts)
+        self.assertFalse(useravatar.thumbnails_ready)
+
+        # Новая картинка обрабатывается заново.
+        useravatar.set_avatar(make_image('new.png'))
+        self.assertEqual(0, useravatar.thumbnail_attempts)
@@ -16,6 +16,20 @@ class UserAvatarTest(TestCase):
         self.assertEqual(1, len(avatars))
         self.assertFalse(avatars[0].avatar)
 
+    def test_user_save_without_avatar_update(self):
+        user = User.objects.create_user('john', 'john@example.com', '123')
+
+        user.first_name = 'John'
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_set_avatar_result(self):
+        user = User.objects.create_user('john', 'john@example.com', '123')
+
+        self.assertFalse(user.useravatar.set_avatar(user.useravatar.avatar))
+        self.assertTrue(user.useravatar.set_avatar('avatars/new.png'))
+        self.assertFalse(user.useravatar.thumbnails_ready)
+
     def test_avatar_removing_on_user_removing(self):
         user = User.objects.create_user('john', 'john@example.com', '123')
 
@@ -26,3 +40,9 @@ class UserAvatarTest(TestCase):
 
         avatars = models.UserAvatar.objects.all()
         self.assertEqual(0, len(avatars))
+
+    def test_avatar_url_without_avatar(self):
+        user = User.objects.create_user('john', 'john@example.com', '123')
+
+        self.assertIn('no-avatar', user.useravatar.avatar_url())
+        self.assertIn('no-avatar', user.useravatar.avatar_url('small'))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Тесты для хранилища аватарок и их отдачи."""
+
+import hashlib
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from users import models
+from users.storage import ContentAddressedStorage
+from users.views import serve_media
+from .test_commands import make_image
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_hashed_name(self):
+        name = self.storage.save('avatars/Me.PNG', ContentFile(b'data'))
+        self.assertEqual(
+            'avatars/' + hashlib.sha256(b'data').hexdigest() + '.png', name
+        )
+        with self.storage.open(name) as f:
+            self.assertEqual(b'data', f.read())
+
+    def test_deduplication(self):
+        first = self.storage.save('avatars/a.png', ContentFile(b'data'))
+        second = self.storage.save('avatars/b.png', ContentFile(b'data'))
+        other = self.storage.save('avatars/a.png', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(2, len(self.storage.listdir('avatars')[1]))
+
+    def test_concurrent_save(self):
+        name = self.storage.save('avatars/a.png', ContentFile(b'data'))
+
+        # Другой процесс записал файл между проверкой и записью:
+        # проверки перед записью файла не видят.
+        exists = self.storage.exists
+        checks = iter([False, False])
+        with mock.patch.object(self.storage, 'exists',
+                               lambda name: next(checks, exists(name))):
+            second = self.storage.save('avatars/b.png', ContentFile(b'data'))
+
+        self.assertEqual(name, second)
+        self.assertEqual(1, len(self.storage.listdir('avatars')[1]))
+
+
+class ServeMediaTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def get(self, path):
+        request = RequestFactory().get('/media/' + path)
+        return serve_media(request, path)
+
+    def test_immutable_avatar(self):
+        user = User.objects.create_user('john', 'john@example.com', '123')
+        user.useravatar.set_avatar(make_image())
+        user.useravatar.save()
+
+        useravatar = models.UserAvatar.objects.get(user=user)
+        response = self.get(useravatar.avatar.name)
+        self.assertEqual(200, response.status_code)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertTrue(response.has_header('Expires'))
+
+    def test_missing_file(self):
+        with self.assertRaises(Http404):
+            self.get('avatars/missing.png')
+
+    def test_not_routed_without_debug(self):
+        response = self.client.get('/media/avatars/missing.png')
+        self.assertEqual(404, response.status_code)
+        self.assertFalse(response.has_header('Expires'))
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Построение уменьшенных копий аватарок.
+
+Загруженная пользователем картинка обрезается до квадрата и
+уменьшается до каждого из размеров HASKER_AVATAR_SIZES в формате
+HASKER_AVATAR_FORMAT. Копии сохраняются в хранилище файлов рядом
+с оригиналом под именами, которые вычисляются по имени оригинала
+(см. thumbnail_name), поэтому в базе хранится только признак
+UserAvatar.thumbnails_ready.
+
+Имя оригинала - хэш его содержимого (см. модуль storage), а в имя
+копии входят размер в пикселях и формат. Поэтому содержимое копии
+по данному имени тоже никогда не меняется, и уже построенные копии
+(например, для одинаковых аватарок разных пользователей) повторно
+не строятся.
+
+Обработка выполняется вне запроса пользователя командой
+process_avatars. Пока копии не построены, выводится оригинал.
+Неудачные попытки учитываются в UserAvatar.thumbnail_attempts:
+после HASKER_AVATAR_MAX_ATTEMPTS попыток картинка (например,
+испорченный файл) больше не обрабатывается и не занимает место
+в пачках новых аватарок.
+"""
+
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .models import UserAvatar, avatar_changed
+
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def thumbnail_name(name, size):
+    """Возвращает имя файла копии размера `size` для оригинала `name`."""
+
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    pixels = settings.HASKER_AVATAR_SIZES[size]
+    extension = _EXTENSIONS[settings.HASKER_AVATAR_FORMAT]
+    return posixpath.join(
+        directory, 'thumbs', f'{stem}-{pixels}.{extension}'
+    )
+
+
+def make_thumbnails(useravatar):
+    """Строит и сохраняет копии всех размеров для аватарки
+       `useravatar`.
+    """
+
+    storage = useravatar.avatar.storage
+    name = useravatar.avatar.name
+    image_format = settings.HASKER_AVATAR_FORMAT
+
+    sizes = {
+        size: pixels
+        for size, pixels in settings.HASKER_AVATAR_SIZES.items()
+        if not storage.exists(thumbnail_name(name, size))
+    }
+    if not sizes:
+        return
+
+    with storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    for size, pixels in sizes.items():
+        thumbnail = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, image_format, quality=85)
+        storage.save_as(
+            thumbnail_name(name, size), ContentFile(buffer.getvalue())
+        )
+
+
+def process_avatars(batch_size):
+    """Строит копии для аватарок, у которых их еще нет.
+
+    Обрабатывается не больше `batch_size` аватарок. Возвращает пару
+    (количество обработанных аватарок, количество ошибок).
+    """
+
+    avatars = UserAvatar.objects.filter(
+        thumbnails_ready=False,
+        thumbnail_attempts__lt=settings.HASKER_AVATAR_MAX_ATTEMPTS,
+    ).exclude(
+        avatar=''
+    ).order_by('id')[:batch_size]
+
+    done = failed = 0
+    for useravatar in avatars:
+        try:
+            make_thumbnails(useravatar)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception('Avatar %s processing failed',
+                             useravatar.avatar.name)
+            UserAvatar.objects.filter(
+                pk=useravatar.pk, avatar=useravatar.avatar.name
+            ).update(thumbnail_attempts=F('thumbnail_attempts') + 1)
+            failed += 1
+            continue
+
+        # Пока копии строились, пользователь мог загрузить
+        # другую аватарку: тогда признак не устанавливается.
+        if UserAvatar.objects.filter(
+            pk=useravatar.pk, avatar=useravatar.avatar.name
+        ).update(thumbnails_ready=True):
+            avatar_changed.send(sender=UserAvatar, user_id=useravatar.user_id)
+        done += 1
+
+    return done, failed
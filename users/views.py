@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 """Обработчики запросов."""
 
+import time
+
 from django import urls
+from django.conf import settings
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.static import serve
 from django.views.generic.edit import FormView
 
 from .forms import LoginForm, SignUpForm, SettingsForm
@@ -29,9 +35,8 @@ class SignupFormView(FormView):
     def form_valid(self, form):
         # Create new user
         user = form.save()
-        user.refresh_from_db()
-        user.useravatar.avatar = form.cleaned_data.get('avatar')
-        user.save()
+        if user.useravatar.set_avatar(form.cleaned_data.get('avatar')):
+            user.useravatar.save()
         password = form.cleaned_data.get('password1')
         # Login new user
         user = authenticate(username=user.username, password=password)
@@ -47,9 +52,9 @@ class SettingsFormView(LoginRequiredMixin, FormView):
     success_url = urls.reverse_lazy('index')
 
     def form_valid(self, form):
-        user = form.save(commit=False)
-        user.useravatar.avatar = form.cleaned_data.get('avatar')
-        user.save()
+        user = form.save()
+        if user.useravatar.set_avatar(form.cleaned_data.get('avatar')):
+            user.useravatar.save()
         return super().form_valid(form)
 
     def get_form_kwargs(self):
@@ -57,3 +62,22 @@ class SettingsFormView(LoginRequiredMixin, FormView):
         kwargs['instance'] = self.request.user
         kwargs['initial'] = {'avatar': self.request.user.useravatar.avatar}
         return kwargs
+
+
+def serve_media(request, path):
+    """Отдача загруженного файла (аватарки) из MEDIA_ROOT при DEBUG.
+
+    Имена файлов вычисляются по их содержимому (см. модуль storage),
+    поэтому ответ разрешается кэшировать на HASKER_MEDIA_MAX_AGE
+    секунд без перепроверки. В рабочем режиме файлы отдает веб-сервер
+    или CDN с теми же заголовками (см. README).
+    """
+
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200:
+        max_age = settings.HASKER_MEDIA_MAX_AGE
+        patch_cache_control(
+            response, public=True, max_age=max_age, immutable=True
+        )
+        response['Expires'] = http_date(time.time() + max_age)
+    return response